@@ -0,0 +1,397 @@
+import collections
+import itertools
+import json
+
+from CalculatorErrors import TOO_MANY_DIGITS_MESSAGE, ArithmeticEvaluationError, formatValue
+from EvaluationResult import EvaluationResult
+from ExpressionCache import ExpressionCache
+from InputParser import InputParser
+from RunningStatistics import RunningStatistics
+
+# The BatchEvaluator of a worker process, created once by _initializeWorker().
+_workerEvaluator = None
+
+
+def _parserArguments(inputParser):
+    """
+    Returns the keyword arguments of an InputParser that compiles and evaluates like
+    inputParser, so a worker process can build its own. Its caches and instrumentation
+    are left out, since every worker keeps its own cache and what a worker records could
+    not be seen by the process that owns inputParser.
+    """
+    persistentCache = inputParser.persistentCache
+    return {"optimizer": inputParser.optimizer, "backend": inputParser.backend, "registry": inputParser.registry,
+            "limits": inputParser.limits,
+            "persistentCachePath": persistentCache.path if persistentCache is not None else None}
+
+
+def _initializeWorker(cacheSize, parserArguments):
+    """
+    Creates the BatchEvaluator (and with it the InputParser) that a worker process
+    reuses for every chunk it evaluates.
+
+    Parameters
+    ----------
+    cacheSize : int
+        The maximum size of the cache of compiled expressions, or 0 for no cache.
+    parserArguments : dict
+        The optimizer, backend, registry and limits of the InputParser, as returned by
+        _parserArguments(), and the "persistentCachePath" of the PersistentExpressionCache
+        the worker opens (or None for none). The workers map the same file, so its pages
+        are shared between them.
+    """
+    global _workerEvaluator
+    parserArguments = dict(parserArguments)
+    persistentCachePath = parserArguments.pop("persistentCachePath")
+    persistentCache = None
+    if persistentCachePath is not None:
+        from PersistentExpressionCache import PersistentExpressionCache
+
+        persistentCache = PersistentExpressionCache(persistentCachePath)
+    _workerEvaluator = BatchEvaluator(InputParser(persistentCache=persistentCache, **parserArguments),
+                                      cache=ExpressionCache(cacheSize) if cacheSize else None)
+
+
+def _evaluateChunk(expressions):
+    """
+    Evaluates a chunk of expressions in a worker process.
+
+    Parameters
+    ----------
+    expressions : list
+        The arithmetic expressions to evaluate.
+
+    Returns
+    ------
+    results : list
+        A (value, errorCode, errorPosition, errorMessage) tuple for every expression,
+        which is cheaper to send back than an EvaluationResult. The expressions
+        themselves are not sent back, since the parent process still has them.
+    """
+    return [(result.value, result.errorCode, result.errorPosition, result.errorMessage)
+            for expression, result in _workerEvaluator.evaluate(expressions)]
+
+
+def _aggregateChunk(expressions):
+    """
+    Evaluates a chunk of expressions in a worker process and only sends back their
+    statistics.
+
+    Parameters
+    ----------
+    expressions : list
+        The arithmetic expressions to evaluate.
+
+    Returns
+    ------
+    statistics : RunningStatistics
+        The statistics of the values and errors of the chunk.
+    """
+    return _workerEvaluator.aggregate(expressions)
+
+
+class BatchEvaluator:
+    """
+    Evaluates a stream of newline-delimited expressions without any prompts. Every step
+    is a generator, so expressions are read, evaluated and written one chunk at a time
+    and the memory used does not depend on the size of the input.
+
+    ...
+
+    Attributes
+    ----------
+    inputParser : InputParser
+        The parser used to compile the expressions.
+    cache : ExpressionCache
+        An optional cache of compiled expressions, so repeated expressions are parsed once.
+    workers : int
+        The number of worker processes evaluate() shards the expressions across.
+    chunkSize : int
+        The number of expressions sent to a worker process at once.
+
+    Methods
+    -------
+    readExpressions(lines)
+        Yields the expressions in an iterable of lines.
+
+    evaluate(expressions)
+        Yields the result of evaluating every expression.
+
+    evaluateInParallel(expressions)
+        Yields the result of evaluating every expression in a pool of worker processes.
+
+    aggregate(expressions, statistics)
+        Evaluates every expression and only keeps running statistics of the results.
+
+    formatResults(results, jsonLines)
+        Yields every result as one line of output.
+
+    writeLines(lines, output, chunkSize)
+        Writes the lines to output in chunks.
+
+    run(lines, output, jsonLines, chunkSize)
+        Reads, evaluates and writes a whole stream of expressions.
+
+    """
+
+    def __init__(self, inputParser=None, cache=None, workers=1, chunkSize=1024):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        inputParser : InputParser
+            The parser used to compile the expressions. A new one is created if left out.
+        cache : ExpressionCache
+            An optional cache of compiled expressions. With more than one worker, every
+            worker process keeps its own cache of the same maximum size.
+        workers : int
+            The number of worker processes evaluate() shards the expressions across. With
+            1 (the default), everything is evaluated in the current process.
+        chunkSize : int
+            The number of expressions sent to a worker process at once. Bigger chunks
+            spread the cost of sending them between processes over more expressions.
+        """
+        if workers < 1:
+            raise ValueError("The number of workers has to be at least 1.")
+        self.inputParser = inputParser if inputParser is not None else InputParser()
+        self.cache = cache
+        self.workers = workers
+        self.chunkSize = chunkSize
+
+    def readExpressions(self, lines):
+        """
+        Yields the expressions in an iterable of lines (e.g. an open file), without their
+        line endings.
+
+        Parameters
+        ----------
+        lines : iterable
+            Lines of text with one expression per line.
+
+        Yields
+        ------
+        expression : str
+            The expression on each line.
+        """
+        for line in lines:
+            yield line.rstrip("\r\n")
+
+    def evaluate(self, expressions):
+        """
+        Compiles and evaluates every expression. Errors are not printed but returned
+        along with the expression they belong to. If there is more than one worker, the
+        expressions are evaluated in parallel by evaluateInParallel(). If the inputParser
+        has an Instrumentation, the "evaluate" stage is recorded in it as well (only in
+        the current process).
+
+        Parameters
+        ----------
+        expressions : iterable
+            The arithmetic expressions to evaluate.
+
+        Yields
+        ------
+        result : tuple
+            An (expression, EvaluationResult) tuple for every expression, in order.
+        """
+        if self.workers > 1:
+            yield from self.evaluateInParallel(expressions)
+            return
+
+        evaluateExpression = self._evaluateExpression
+        for expression in expressions:
+            try:
+                yield expression, EvaluationResult(evaluateExpression(expression))
+            except Exception as error:
+                yield expression, EvaluationResult.fromError(error)
+
+    def _evaluateExpression(self, expression):
+        """
+        Compiles an expression (or takes it from the cache) and evaluates it, recording
+        the "evaluate" stage in the instrumentation of the inputParser. Errors are raised
+        for evaluate() and aggregate() to handle.
+        """
+        cache = self.cache
+        if cache is None:
+            compiledExpression = self.inputParser.compile(expression)
+        else:
+            compiledExpression = cache.get(expression)
+            if compiledExpression is None:
+                compiledExpression = self.inputParser.compile(expression)
+                cache.put(expression, compiledExpression)
+        instrumentation = self.inputParser.instrumentation
+        if instrumentation is None:
+            return compiledExpression.evaluate()
+        return instrumentation.measure("evaluate", compiledExpression.evaluate)
+
+    def evaluateInParallel(self, expressions):
+        """
+        Evaluates the expressions in a pool of worker processes, so parsing and evaluation
+        are not limited to one core. The expressions are sent to the workers in chunks
+        of chunkSize and only a few chunks per worker are in flight at any time, so the
+        memory used still does not depend on the size of the input. Every worker builds
+        a parser with the same registry, optimizer, backend and limits as inputParser,
+        but its instrumentation only records what runs in the current process.
+
+        Parameters
+        ----------
+        expressions : iterable
+            The arithmetic expressions to evaluate.
+
+        Yields
+        ------
+        result : tuple
+            An (expression, EvaluationResult) tuple for every expression, in input order.
+        """
+        for chunk, fields in self._mapChunks(_evaluateChunk, expressions):
+            for expression, resultFields in zip(chunk, fields):
+                yield expression, EvaluationResult(*resultFields)
+
+    def _mapChunks(self, function, expressions):
+        """
+        Calls function on chunks of the expressions in a pool of worker processes and
+        yields every chunk with what function returned for it, in input order.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        expressions = iter(expressions)
+        chunkSize = self.chunkSize
+        maxPendingChunks = 2 * self.workers
+        cacheSize = self.cache.maxSize if self.cache is not None else 0
+        with ProcessPoolExecutor(self.workers, initializer=_initializeWorker,
+                                 initargs=(cacheSize, _parserArguments(self.inputParser))) as executor:
+            pendingChunks = collections.deque()
+            while True:
+                chunk = list(itertools.islice(expressions, chunkSize))
+                if chunk:
+                    pendingChunks.append((chunk, executor.submit(function, chunk)))
+                if pendingChunks and (len(pendingChunks) >= maxPendingChunks or not chunk):
+                    chunk, future = pendingChunks.popleft()
+                    yield chunk, future.result()
+                elif not chunk:
+                    break
+
+    def aggregate(self, expressions, statistics=None):
+        """
+        Evaluates every expression like evaluate(), but only folds the values and errors
+        into running statistics instead of returning a result for every expression, so
+        the memory used stays the same however many expressions there are. With more than
+        one worker, every worker process sends back the statistics of its chunks only.
+
+        Parameters
+        ----------
+        expressions : iterable
+            The arithmetic expressions to evaluate.
+        statistics : RunningStatistics
+            The statistics to add the results to (new ones if left out).
+
+        Returns
+        ------
+        statistics : RunningStatistics
+            The statistics of the values and the number of errors of every kind.
+        """
+        statistics = statistics if statistics is not None else RunningStatistics()
+        if self.workers > 1:
+            for chunk, chunkStatistics in self._mapChunks(_aggregateChunk, expressions):
+                statistics.merge(chunkStatistics)
+            return statistics
+
+        evaluateExpression = self._evaluateExpression
+        add = statistics.add
+        for expression in expressions:
+            try:
+                value = evaluateExpression(expression)
+            except Exception as error:
+                # The same code EvaluationResult.fromError() would give it.
+                statistics.addError(getattr(error, "code", "UNEXPECTED_ERROR"))
+            else:
+                add(value)
+        return statistics
+
+    def formatResults(self, results, jsonLines=False):
+        """
+        Yields every result as one line of output.
+
+        Parameters
+        ----------
+        results : iterable
+            The (expression, EvaluationResult) tuples returned by evaluate().
+        jsonLines : bool
+            Whether each line should be a JSON object with the keys "expression", "value",
+            "error", "errorCode" and "errorPosition" instead of just the value (or
+            "Error: " and the error message). Values that JSON has no type for, like
+            Decimals, are written as strings so they stay exact. A value that has too
+            many digits to be written out is written as an error of its own line.
+
+        Yields
+        ------
+        line : str
+            The line for every result, ending with a newline.
+        """
+        if jsonLines:
+            dumps = json.dumps
+
+            def toJson(expression, result):
+                return dumps({"expression": expression, "value": result.value, "error": result.errorMessage,
+                              "errorCode": result.errorCode, "errorPosition": result.errorPosition}, default=str)
+
+            for expression, result in results:
+                try:
+                    line = toJson(expression, result)
+                except ValueError:
+                    # json writes ints with str(), which refuses ints with too many digits.
+                    line = toJson(expression, EvaluationResult.fromError(
+                        ArithmeticEvaluationError(TOO_MANY_DIGITS_MESSAGE)))
+                yield line + "\n"
+        else:
+            for expression, result in results:
+                if result.errorCode is None:
+                    try:
+                        line = formatValue(result.value)
+                    except ArithmeticEvaluationError as error:
+                        line = "Error: " + str(error)
+                else:
+                    line = "Error: " + result.errorMessage
+                yield line + "\n"
+
+    def writeLines(self, lines, output, chunkSize=4096):
+        """
+        Writes the lines to output with one write call per chunk of lines, instead of
+        one call per line.
+
+        Parameters
+        ----------
+        lines : iterable
+            The lines to write.
+        output : file
+            A file-like object opened for writing text.
+        chunkSize : int
+            The number of lines written at once.
+        """
+        lines = iter(lines)
+        while True:
+            chunk = "".join(itertools.islice(lines, chunkSize))
+            if not chunk:
+                break
+            output.write(chunk)
+        output.flush()
+
+    def run(self, lines, output, jsonLines=False, chunkSize=4096):
+        """
+        Reads the expressions in lines, evaluates them and writes one result per line
+        to output.
+
+        Parameters
+        ----------
+        lines : iterable
+            Lines of text with one expression per line.
+        output : file
+            A file-like object opened for writing text.
+        jsonLines : bool
+            Whether the results should be written as JSON objects (see formatResults()).
+        chunkSize : int
+            The number of lines written at once.
+        """
+        results = self.evaluate(self.readExpressions(lines))
+        self.writeLines(self.formatResults(results, jsonLines), output, chunkSize)
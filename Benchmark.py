@@ -0,0 +1,388 @@
+"""
+This file benchmarks the stages an expression goes through in the calculator.
+Every stage is timed on its own, for several generated corpora of expressions, and the
+results can be stored as a baseline that later runs are compared against, e.g.
+
+    python3 Benchmark.py --save-baseline benchmark_baseline.json
+    python3 Benchmark.py --baseline benchmark_baseline.json
+
+The second command exits with status 1 if any stage got slower than the baseline by
+more than the allowed threshold.
+
+With --startup, the time a new process takes to answer a single query is measured
+instead, together with the modules it imports (from -X importtime), e.g.
+
+    python3 Benchmark.py --startup --max-startup-imports 10
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from Calculator import Calculator
+from InputParser import InputParser
+
+
+def generateShortExpressions(count, randomGenerator):
+    """
+    Generates short expressions of a few operands, like the ones typed in by hand.
+    """
+    expressions = []
+    for i in range(count):
+        terms = [str(randomGenerator.randint(0, 999)) for j in range(randomGenerator.randint(2, 6))]
+        expression = terms[0]
+        for term in terms[1:]:
+            expression += " " + randomGenerator.choice("+-*") + " " + term
+        expressions.append(expression)
+    return expressions
+
+
+def generateNestedExpressions(count, randomGenerator, depth=200):
+    """
+    Generates expressions that nest parentheses depth levels deep, e.g. "((1 + 2) * 3)".
+    """
+    expressions = []
+    for i in range(count):
+        parts = ["("] * depth
+        parts.append(str(randomGenerator.randint(1, 9)))
+        for j in range(depth):
+            parts.append(randomGenerator.choice("+-*"))
+            parts.append(str(randomGenerator.randint(1, 9)))
+            parts.append(")")
+        expressions.append("".join(parts))
+    return expressions
+
+
+def generateFlatChains(count, randomGenerator, length=5000):
+    """
+    Generates very long expressions without parentheses, like machine-generated formulas.
+    """
+    expressions = []
+    for i in range(count):
+        parts = [str(randomGenerator.randint(1, 999))]
+        for j in range(length):
+            parts.append(randomGenerator.choice("+-*/"))
+            parts.append(str(randomGenerator.randint(1, 999)))
+        expressions.append(" ".join(parts))
+    return expressions
+
+
+def generateSignedDecimalExpressions(count, randomGenerator, length=20):
+    """
+    Generates expressions where every operand is a signed decimal, e.g. "-.32 * +4.5 - -0.75".
+    """
+    expressions = []
+    for i in range(count):
+        parts = []
+        for j in range(length):
+            if j > 0:
+                parts.append(randomGenerator.choice("+-*/"))
+            digits = str(randomGenerator.randint(0, 99)) if randomGenerator.random() < 0.5 else ""
+            parts.append(randomGenerator.choice("+-") + digits + "." + str(randomGenerator.randint(1, 999)))
+        expressions.append("".join(parts))
+    return expressions
+
+
+CORPORA = {
+    "short": (generateShortExpressions, 2000),
+    "nested": (generateNestedExpressions, 50),
+    "flat": (generateFlatChains, 5),
+    "signedDecimals": (generateSignedDecimalExpressions, 500),
+}
+
+STAGES = ["checkForInvalidInput", "checkForSyntaxError", "prettifyInputExpression", "infixToPostfix",
+          "evaluatePostfixExp", "tokenize", "tokensToPostfix", "compile", "evaluate"]
+
+
+def prepareStageInputs(expressions, inputParser):
+    """
+    Computes the input of every stage for every expression, so that each stage can be
+    timed on its own.
+
+    Returns
+    ------
+    stageInputs : dict
+        Maps the name of every stage to the list of arguments it is called with.
+    """
+    prettyExpressions = [inputParser.prettifyInputExpression(expression) for expression in expressions]
+    tokenLists = [inputParser.tokenize(expression) for expression in expressions]
+    return {
+        "checkForInvalidInput": expressions,
+        "checkForSyntaxError": expressions,
+        "prettifyInputExpression": expressions,
+        "infixToPostfix": prettyExpressions,
+        "evaluatePostfixExp": [inputParser.infixToPostfix(expression) for expression in prettyExpressions],
+        "tokenize": expressions,
+        "tokensToPostfix": tokenLists,
+        "compile": expressions,
+        "evaluate": [inputParser.compile(expression) for expression in expressions],
+    }
+
+
+def getStageFunctions(inputParser, calculator):
+    """
+    Returns the function that runs every stage on one input.
+    """
+    return {
+        "checkForInvalidInput": inputParser.checkForInvalidInput,
+        "checkForSyntaxError": inputParser.checkForSyntaxError,
+        "prettifyInputExpression": inputParser.prettifyInputExpression,
+        "infixToPostfix": inputParser.infixToPostfix,
+        "evaluatePostfixExp": calculator.evaluatePostfixExp,
+        "tokenize": inputParser.tokenize,
+        "tokensToPostfix": inputParser.tokensToPostfix,
+        "compile": inputParser.compile,
+        "evaluate": lambda compiledExpression: compiledExpression.evaluate(),
+    }
+
+
+def percentile(sortedValues, fraction):
+    """
+    Returns the value below which the given fraction of the sorted values lies (nearest rank).
+    """
+    index = min(len(sortedValues) - 1, max(0, int(round(fraction * len(sortedValues))) - 1))
+    return sortedValues[index]
+
+
+def timeStage(function, inputs, repeat):
+    """
+    Calls function once for every input, repeat times, and measures every call.
+
+    Returns
+    ------
+    statistics : dict
+        "throughput" in calls per second and the "p50" and "p99" latency in microseconds.
+    """
+    clock = time.perf_counter_ns
+    latencies = []
+    for i in range(repeat):
+        for argument in inputs:
+            start = clock()
+            function(argument)
+            latencies.append(clock() - start)
+    latencies.sort()
+    totalSeconds = sum(latencies) / 1e9
+    return {
+        "throughput": len(latencies) / totalSeconds if totalSeconds > 0 else float("inf"),
+        "p50": percentile(latencies, 0.50) / 1000,
+        "p99": percentile(latencies, 0.99) / 1000,
+    }
+
+
+def runBenchmark(corpora=None, stages=None, scale=1.0, repeat=3, seed=0):
+    """
+    Generates every corpus and times every stage on it.
+
+    Parameters
+    ----------
+    corpora : list
+        The names of the corpora to use (all of CORPORA if left out).
+    stages : list
+        The names of the stages to time (all of STAGES if left out).
+    scale : float
+        Multiplies the number of expressions generated for every corpus.
+    repeat : int
+        How often every stage is run over its corpus.
+    seed : int
+        The seed of the random generator, so corpora are the same in every run.
+
+    Returns
+    ------
+    results : dict
+        Maps every corpus to a dictionary that maps every stage to its statistics (see
+        timeStage()).
+    """
+    inputParser = InputParser()
+    calculator = Calculator()
+    stageFunctions = getStageFunctions(inputParser, calculator)
+    results = {}
+    for corpus in corpora or list(CORPORA):
+        generator, count = CORPORA[corpus]
+        expressions = generator(max(1, int(count * scale)), random.Random(seed))
+        stageInputs = prepareStageInputs(expressions, inputParser)
+        results[corpus] = {stage: timeStage(stageFunctions[stage], stageInputs[stage], repeat)
+                           for stage in stages or STAGES}
+    return results
+
+
+def compareToBaseline(results, baseline, threshold=1.25):
+    """
+    Compares the results against a baseline and finds the stages that got slower.
+
+    Parameters
+    ----------
+    results : dict
+        The results of runBenchmark().
+    baseline : dict
+        Results of an earlier run of runBenchmark().
+    threshold : float
+        How many times slower than the baseline (in p50 latency) a stage may get.
+
+    Returns
+    ------
+    regressions : list
+        A (corpus, stage, ratio) tuple for every stage that got slower than allowed,
+        where ratio is the p50 latency divided by the one of the baseline.
+    """
+    regressions = []
+    for corpus, stageResults in results.items():
+        for stage, statistics in stageResults.items():
+            baselineStatistics = baseline.get(corpus, {}).get(stage)
+            if baselineStatistics is None or baselineStatistics["p50"] <= 0:
+                continue
+            ratio = statistics["p50"] / baselineStatistics["p50"]
+            if ratio > threshold:
+                regressions.append((corpus, stage, ratio))
+    return regressions
+
+
+def formatResults(results, baseline=None):
+    """
+    Returns the results as a table, with the change of the p50 latency against the
+    baseline if there is one.
+    """
+    lines = ["%-16s %-24s %14s %12s %12s %9s" % ("corpus", "stage", "throughput/s", "p50 (us)", "p99 (us)",
+                                                 "vs base")]
+    for corpus, stageResults in results.items():
+        for stage, statistics in stageResults.items():
+            change = ""
+            if baseline is not None and stage in baseline.get(corpus, {}):
+                change = "%.2fx" % (statistics["p50"] / baseline[corpus][stage]["p50"])
+            lines.append("%-16s %-24s %14.1f %12.2f %12.2f %9s" % (corpus, stage, statistics["throughput"],
+                                                                  statistics["p50"], statistics["p99"], change))
+    return "\n".join(lines)
+
+
+# The command line of RunMe.py that --startup measures.
+STARTUP_ARGUMENTS = ["calculate", "1 + 2"]
+
+
+def parseImportTimes(output):
+    """
+    Reads the output of python -X importtime.
+
+    Parameters
+    ----------
+    output : str
+        What the process wrote to stderr.
+
+    Returns
+    ------
+    imports : list
+        A (name, cumulative microseconds, nesting level) tuple for every imported module,
+        in the order they were imported.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or line.endswith("| imported package"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        name = fields[2].rstrip()
+        imports.append((name.lstrip(), int(fields[1]), (len(name) - len(name.lstrip())) // 2))
+    return imports
+
+
+def measureStartup(arguments=None, repeat=5):
+    """
+    Runs RunMe.py in new processes with -X importtime and measures the fastest run.
+
+    Parameters
+    ----------
+    arguments : list
+        The command line arguments of RunMe.py (STARTUP_ARGUMENTS if left out).
+    repeat : int
+        How many processes are started.
+
+    Returns
+    ------
+    startup : dict
+        The "wall" time of the process and its "imports" time in total in milliseconds,
+        the "calculatorImports" time of the modules imported after the interpreter's
+        own start-up (after site) and the names of those "modules".
+    """
+    import os
+    import subprocess
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RunMe.py")
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", script]
+                                   + list(arguments if arguments is not None else STARTUP_ARGUMENTS),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wall = (time.perf_counter() - start) * 1e3
+        imports = parseImportTimes(completed.stderr)
+        # A module is listed after the modules it imports, so everything after site was
+        # imported by the calculator.
+        names = [name for name, cumulative, level in imports]
+        afterSite = names.index("site") + 1 if "site" in names else 0
+        startup = {"wall": wall,
+                   "imports": sum([cumulative for name, cumulative, level in imports if level == 0]) / 1e3,
+                   "calculatorImports": sum([cumulative for name, cumulative, level in imports[afterSite:]
+                                             if level == 0]) / 1e3,
+                   "modules": names[afterSite:]}
+        if best is None or startup["wall"] < best["wall"]:
+            best = startup
+    return best
+
+
+def formatStartup(startup, arguments=None):
+    return "Startup of RunMe.py %s: %.1f ms, %.1f ms importing (%.1f ms for %d modules after site)\n%s" % (
+        " ".join(arguments if arguments is not None else STARTUP_ARGUMENTS), startup["wall"], startup["imports"],
+        startup["calculatorImports"], len(startup["modules"]), " ".join(startup["modules"]))
+
+
+def main(arguments=None):
+    argumentParser = argparse.ArgumentParser(description="Benchmarks the stages of the calculator.")
+    argumentParser.add_argument("--corpus", action="append", choices=list(CORPORA),
+                                help="a corpus to run (can be repeated, all by default)")
+    argumentParser.add_argument("--stage", action="append", choices=STAGES,
+                                help="a stage to time (can be repeated, all by default)")
+    argumentParser.add_argument("--scale", type=float, default=1.0,
+                                help="multiplies the number of expressions in every corpus")
+    argumentParser.add_argument("--repeat", type=int, default=3, help="how often every stage runs over a corpus")
+    argumentParser.add_argument("--seed", type=int, default=0, help="the seed used to generate the corpora")
+    argumentParser.add_argument("--baseline", help="a JSON file with results to compare against")
+    argumentParser.add_argument("--save-baseline", help="store the results as a baseline in this JSON file")
+    argumentParser.add_argument("--threshold", type=float, default=1.25,
+                                help="how many times slower than the baseline a stage may get")
+    argumentParser.add_argument("--startup", action="store_true",
+                                help="measure how fast a new process answers a single query instead")
+    argumentParser.add_argument("--max-startup-imports", type=float, metavar="MS",
+                                help="with --startup, fail if the modules after site take longer to import")
+    parsedArguments = argumentParser.parse_args(arguments)
+
+    if parsedArguments.startup:
+        startup = measureStartup(repeat=parsedArguments.repeat)
+        print(formatStartup(startup))
+        if parsedArguments.max_startup_imports is not None \
+                and startup["calculatorImports"] > parsedArguments.max_startup_imports:
+            print("Regression: the calculator takes %.1f ms to import." % startup["calculatorImports"])
+            return 1
+        return 0
+
+    results = runBenchmark(parsedArguments.corpus, parsedArguments.stage, parsedArguments.scale,
+                           parsedArguments.repeat, parsedArguments.seed)
+    baseline = None
+    if parsedArguments.baseline:
+        with open(parsedArguments.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+    print(formatResults(results, baseline))
+
+    if parsedArguments.save_baseline:
+        with open(parsedArguments.save_baseline, "w") as baselineFile:
+            json.dump(results, baselineFile, indent=2)
+
+    if baseline is not None:
+        regressions = compareToBaseline(results, baseline, parsedArguments.threshold)
+        for corpus, stage, ratio in regressions:
+            print("Regression: %s on %s is %.2fx slower than the baseline." % (stage, corpus, ratio))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
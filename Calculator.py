@@ -1,31 +1,109 @@
+# threading.local, without importing threading (and collections and functools with it)
+# at startup.
+from _thread import _local as threadLocal
+
+from CalculatorErrors import ExpressionSyntaxError, InvalidInputError, UnboundVariableError
+from NumericBackend import defaultBackend
+from OperatorRegistry import defaultRegistry
+
+
+# The operators whose rows with a zero divisor are flagged by evaluateBatch() (besides 0 ^ -1).
+_DIVISIONS = ("/", "//", "%")
+
+
 class Calculator:
     """
     Main class that evaluates user's input.
+
+    The lookup tables of the calculator are built once, when it is created, and every
+    thread reuses its own operand stack, so evaluating does not create temporary tables
+    or lists. A calculator without a cache and instrumentation can be shared by any
+    number of threads; its backend and registry should not be changed after it is
+    created.
+
     ...
 
     Attributes
     ----------
     operands : str
         A string that lists all allowed operands (the decimal digits in this case).
+    operatorFunctions : dict
+        Maps the name of every operator and function of the default registry to the
+        function that applies it.
+    registry : OperatorRegistry
+        The operators and functions the postfix expressions can use.
+    cache : ExpressionCache
+        The cache that evaluatePostfixExp() keeps its results in (None if there is none).
+    instrumentation : Instrumentation
+        Records the latency and errors of evaluatePostfixExp() (None if nothing is recorded).
+    backend : NumericBackend
+        Converts the numbers and applies the operators in evaluatePostfixExp() (None for
+        ints and floats).
 
     Methods
     -------
     isOperand(token)
         Checks if a given token is an operand or not.
 
+    isVariable(token)
+        Checks if a given token is the name of a variable.
+
     applyOperator(operand1, operand2, operator)
         Takes the input operator and applies it to the two operands.
 
-    evaluatePostfixExp(postfixExpression)
-        Evaluates the given postfixExpression.
+    applyFunction(name, operands)
+        Applies an operator or function of the registry to its operands.
+
+    evaluatePostfixExp(postfixExpression, bindings)
+        Evaluates the given postfixExpression with the given values of its variables.
 
     evaluateExpression(userExpression):
         Calls the evaluatePostfixExp() method with user input as the parameter.
 
+    evaluateBatch(compiledExpression, columns)
+        Evaluates a CompiledExpression over whole NumPy arrays of operand values at once.
+
     """
 
-    def __init__(self):
+    operatorFunctions = defaultRegistry.operatorFunctions
+
+    def __init__(self, cache=None, instrumentation=None, backend=None, registry=None, limits=None):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        cache : ExpressionCache
+            An optional cache that evaluatePostfixExp() keeps its results in.
+        instrumentation : Instrumentation
+            An optional Instrumentation that records the "evaluate" stage of
+            evaluatePostfixExp().
+        backend : NumericBackend
+            An optional numeric backend, e.g. DecimalBackend to evaluate decimals exactly.
+        registry : OperatorRegistry
+            The operators and functions the expressions can use (the default ones if
+            left out).
+        limits : ResourceLimits
+            Optional budgets for untrusted expressions. A result that gets bigger than
+            their maxMagnitude fails the expression (the other limits are checked by the
+            InputParser that creates the postfix expressions).
+        """
         self.operands = "0123456789."
+        self.cache = cache
+        self.instrumentation = instrumentation
+        self.backend = backend
+        self.registry = registry if registry is not None else defaultRegistry
+        self._operandCharacters = frozenset(self.operands)
+        self._signedOperandCharacters = frozenset(self.operands + "+-")
+        if backend is not None:
+            self._operatorFunctions = self.registry.functionsFor(backend.operatorFunctions)
+            self._convert = backend.convert
+        else:
+            self._operatorFunctions = self.registry.operatorFunctions
+            self._convert = defaultBackend.convert
+        if limits is not None:
+            self._operatorFunctions = limits.guard(self._operatorFunctions)
+        self._local = threadLocal()
 
     def isOperand(self, token):
         """
@@ -44,14 +122,28 @@ class Calculator:
             If token is not operand.
         """
         if len(token) == 1:
-            if token in self.operands:
+            if token in self._operandCharacters:
                 return True
         elif len(token) > 1:
-            validChars = self.operands + '+-'
-            for eachChar in token:
-                if eachChar not in validChars:
-                    return False
-            return True
+            return self._signedOperandCharacters.issuperset(token)
+
+    def isVariable(self, token):
+        """
+        Check if a given token is the name of a variable.
+
+        Parameters
+        ----------
+        token : str
+            A string that can either be an operand, a variable or an operator.
+
+        Returns
+        ------
+        True : bool
+            If token is the name of a variable.
+        False: bool
+            If token is not the name of a variable.
+        """
+        return token.isidentifier()
 
     def applyOperator(self, operand1, operand2, operator):
         """
@@ -72,16 +164,29 @@ class Calculator:
                 The result of applying the operator to the two operands.
         """
 
-        if operator == "*":
-            return operand1 * operand2
-        elif operator == "/":
-            return operand1 / operand2
-        elif operator == "+":
-            return operand1 + operand2
-        else:
-            return operand1 - operand2
+        return self.registry.operatorFunctions[operator](operand1, operand2)
 
-    def evaluatePostfixExp(self, postfixExpr):
+    def applyFunction(self, name, operands):
+        """
+        Applies an operator or function of the registry (or of the backend, if the
+        calculator has one) to its operands, with a single lookup in the table of
+        functions.
+
+        Parameters
+        ----------
+        name : str
+            The name of the operator or function in postfix notation, e.g. "^", "u-" or "max".
+        operands : list
+            As many operands as the operator or function takes.
+
+        Returns
+        ------
+            Result : Integer or Float
+                The result of applying the operator or function to the operands.
+        """
+        return self._operatorFunctions[name](*operands)
+
+    def evaluatePostfixExp(self, postfixExpr, bindings=None):
         """
         Evaluates an expression that's given in postfix notation. This code is
         adapted from an online tutorial (https://cutt.ly/czfwRLw). The online version
@@ -91,48 +196,124 @@ class Calculator:
         3) Changed the stack to use the standard python list data structure rather than a proprietary
          data structure that was originally used.
 
+        If the calculator has a cache, the result of a postfixExpr that was evaluated
+        before (without bindings) is returned from it. If it has a backend, the numbers
+        are converted and the operators applied by the backend.
+
         Parameters
         ----------
         postfixExpr : str
             An arithmetic expression in postfix notation that needs to be evaluated.
+        bindings : Mapping
+            Maps the name of every variable in postfixExpr to its value. Can be left out
+            if the expression has no variables.
 
 
         Returns
         ------
             Result : Integer or Float
-                The result of evaluating the arithmetic expression.
+                The result of evaluating the arithmetic expression, or None if applying
+                an operator failed (e.g. division by zero). Nothing is printed.
+
+        Raises
+        ------
+        UnboundVariableError
+            If a variable of the expression has no value in bindings.
+        InvalidInputError
+            If a number of the expression has more digits than Python converts to an int
+            (see sys.set_int_max_str_digits()).
         """
 
-        operandStack = []
+        cache = self.cache if bindings is None else None
+        if cache is not None:
+            result = cache.get(postfixExpr)
+            if result is not None:
+                return result
+
+        if self.instrumentation is None:
+            result = self._runPostfixExp(postfixExpr, bindings)
+        else:
+            result = self.instrumentation.measure("evaluate", self._runPostfixExp, postfixExpr, bindings)
+        if cache is not None and result is not None:
+            cache.put(postfixExpr, result)
+        return result
+
+    def _runPostfixExp(self, postfixExpr, bindings):
+        """
+        Runs the stack machine of evaluatePostfixExp() on postfixExpr.
+
+        Returns
+        ------
+            Result : Integer or Float
+                The result of evaluating the arithmetic expression, or None if applying
+                an operator failed.
+        """
+        local = self._local
+        # The stack of the thread is taken while it is in use, so an operator that
+        # evaluates with this calculator again (in the same thread) gets a new one.
+        try:
+            operandStack = local.operandStack
+        except AttributeError:
+            operandStack = None
+        if operandStack is None:
+            operandStack = []
+        else:
+            local.operandStack = None
         tokenList = postfixExpr.split(" ")
+        arities = self.registry.arities
+        operatorFunctions = self._operatorFunctions
+        # Without any decimal point every number is an int, so none of them has to be checked.
+        convert = int if "." not in postfixExpr else self._convert
+
+        try:
+            result = self._runTokens(tokenList, operandStack, arities, operatorFunctions, convert, bindings)
+        finally:
+            operandStack.clear()
+            local.operandStack = operandStack
+        return result
 
+    def _runTokens(self, tokenList, operandStack, arities, operatorFunctions, convert, bindings):
+        """
+        Runs the tokens of a postfix expression on the (empty) operandStack.
+        """
+        push = operandStack.append
+        pop = operandStack.pop
         for token in tokenList:
-            if self.isOperand(token):
-                if "." in token:
-                    token = float(token)
+            arity = arities.get(token)
+            if arity is None:
+                if self.isOperand(token):
+                    try:
+                        push(convert(token))
+                    except ValueError:
+                        raise InvalidInputError("The number " + token[:20] + "... has too many digits.") from None
+                elif self.isVariable(token):
+                    if bindings is None or token not in bindings:
+                        raise UnboundVariableError("Variable \"" + token + "\" has no value.")
+                    push(bindings[token])
                 else:
-                    token = int(token)
-                operandStack.append(token)
-            else:  # token is an operator
-                operand2 = operandStack.pop()
-                operand1 = operandStack.pop()
+                    raise ExpressionSyntaxError("Syntax error. Please enter a valid arithmetic expression.")
+            else:  # token is an operator or a function
                 try:
-                    result = self.applyOperator(operand1, operand2, token)
+                    if arity == 2:
+                        operand2 = pop()
+                        result = operatorFunctions[token](pop(), operand2)
+                    elif arity == 1:
+                        result = operatorFunctions[token](pop())
+                    else:
+                        operands = operandStack[-arity:]
+                        del operandStack[-arity:]
+                        result = operatorFunctions[token](*operands)
                 except Exception as error:
-                    print("Invalid input. Please enter a valid arithmetic expression.")  # Most likely division by
-                    # zero error.
-                    return
-                operandStack.append(result)
-        return operandStack.pop()
+                    if self.instrumentation is not None:
+                        self.instrumentation.recordError("evaluate", "DIVISION_BY_ZERO" if isinstance(
+                            error, ZeroDivisionError) else getattr(error, "code", "ARITHMETIC_ERROR"))
+                    return  # Most likely division by zero error.
+                push(result)
+        return pop()
 
     def evaluateExpression(self, userExpression):
         """
         Evaluates the arithmetic expression input by the user.
-        Does not currently support unary arithmetic operators.
-        So expressions like "--2" which are actually "-1 * -2", cannot be
-        evaluated. Support for this feature can be added by changing the
-        applyOperator method. Its parameters could be relaxed to have more than
-        one operator instead of having just one operator and two operands.
 
         Parameters
         ----------
@@ -145,3 +326,95 @@ class Calculator:
                 The result from evaluatePostfixExp() method.
         """
         return self.evaluatePostfixExp(userExpression)
+
+    def evaluateBatch(self, compiledExpression, columns):
+        """
+        Evaluates a compiled expression for many rows of operand values at once. Runs the
+        same stack machine as evaluatePostfixExp(), but every operand can be a NumPy array
+        (a column) and every operator is applied to whole columns in one go, so the work
+        per opcode is done by NumPy instead of once per row in Python.
+
+        A division by zero (by /, // or %, or 0 raised to a negative power) does not drop
+        the whole result. Only the rows that divide by zero are flagged in the returned
+        error mask and their value is NaN. Functions like sqrt and ^ return NaN for the
+        rows they are not defined for. Powers are always computed in floats.
+
+        Parameters
+        ----------
+        compiledExpression : CompiledExpression
+            The expression to evaluate, as returned by InputParser.compile().
+        columns : sequence or Mapping
+            Either one entry per operand (number or variable) of the expression, in the
+            order the operands appear in it, or a mapping from the name of every variable
+            of the expression to its entry. An entry is an array (or anything
+            numpy.asarray() accepts) of values for that operand. In a sequence, None keeps
+            the number written in the expression. Scalars and arrays are broadcast against
+            each other.
+
+        Returns
+        ------
+        values : numpy.ndarray
+            The result of the expression for every row.
+        errorMask : numpy.ndarray
+            A boolean array that is True for every row that divides by zero.
+        """
+        import numpy
+        from collections.abc import Mapping
+        from InputParser import NUMBER, OPERATOR, VARIABLE
+
+        postfix = compiledExpression.postfix
+        if isinstance(columns, Mapping):
+            missingVariables = [name for name in compiledExpression.variables if name not in columns]
+            if missingVariables:
+                raise UnboundVariableError("Variable \"" + missingVariables[0] + "\" has no value.")
+            columns = [columns[token[1]] if token[0] == VARIABLE else None
+                       for token in postfix if token[0] == NUMBER or token[0] == VARIABLE]
+        elif len(columns) != sum(1 for token in postfix if token[0] == NUMBER or token[0] == VARIABLE):
+            raise ValueError("Expected one column for every operand of the expression.")
+
+        arrayFunctions = self.registry.arrayFunctions
+        arities = self.registry.arities
+        operandStack = []
+        errorMask = numpy.False_
+        nextColumn = iter(columns).__next__
+        with numpy.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for kind, value, position in postfix:
+                if kind == NUMBER:
+                    column = nextColumn()
+                    operandStack.append(value if column is None else numpy.asarray(column))
+                elif kind == VARIABLE:
+                    column = nextColumn()
+                    if column is None:
+                        raise UnboundVariableError("Variable \"" + value + "\" has no value.", position)
+                    operandStack.append(numpy.asarray(column))
+                elif kind == OPERATOR:
+                    operand2 = operandStack.pop()
+                    operand1 = operandStack.pop()
+                    if value in _DIVISIONS:
+                        zeroDivisor = operand2 == 0
+                        if numpy.any(zeroDivisor):
+                            errorMask = errorMask | zeroDivisor
+                            operand2 = numpy.where(zeroDivisor, 1, operand2)
+                    elif value == "^":
+                        # 0 ^ -1 divides by zero as well.
+                        zeroDivisor = (operand1 == 0) & (operand2 < 0)
+                        if numpy.any(zeroDivisor):
+                            errorMask = errorMask | zeroDivisor
+                            operand1 = numpy.where(zeroDivisor, 1, operand1)
+                    operandStack.append(arrayFunctions[value](operand1, operand2))
+                else:
+                    arity = arities[value]
+                    operands = operandStack[-arity:]
+                    del operandStack[-arity:]
+                    operandStack.append(arrayFunctions[value](*operands))
+
+        values = numpy.asarray(operandStack.pop())
+        shape = numpy.broadcast_shapes(values.shape, numpy.shape(errorMask))
+        values = numpy.broadcast_to(values, shape)
+        errorMask = numpy.broadcast_to(errorMask, shape).copy()
+        if errorMask.any():
+            values = values.astype(numpy.float64)
+            values[errorMask] = numpy.nan
+        else:
+            values = values.copy()
+        return values, errorMask
@@ -0,0 +1,156 @@
+"""
+The errors the calculator raises. Every error is a CalculatorError with a short code
+that tells the kind of error apart, and the position in the expression it was found at
+(None if the error does not belong to one place). Each error also derives from the
+built-in exception that was raised for it before, so existing except clauses still work.
+"""
+
+
+class CalculatorError(Exception):
+    """
+    Base class of all errors raised by the calculator.
+
+    ...
+
+    Attributes
+    ----------
+    code : str
+        A short name for the kind of error.
+    position : int
+        The index in the expression where the error was found, or None.
+
+    """
+
+    code = "CALCULATOR_ERROR"
+
+    def __init__(self, message, position=None):
+        super().__init__(message)
+        self.position = position
+
+
+class EmptyExpressionError(CalculatorError, ValueError):
+    """
+    Raised for an empty input.
+    """
+
+    code = "EMPTY_EXPRESSION"
+
+
+class InvalidInputError(CalculatorError, ValueError):
+    """
+    Raised if the expression contains a character that is not allowed.
+    """
+
+    code = "INVALID_INPUT"
+
+
+class ExpressionSyntaxError(CalculatorError, SyntaxError):
+    """
+    Raised if the expression is not in correct infix notation.
+    """
+
+    code = "SYNTAX_ERROR"
+
+
+class UnboundVariableError(CalculatorError, NameError):
+    """
+    Raised if a variable of the expression has no value.
+    """
+
+    code = "UNBOUND_VARIABLE"
+
+
+class DivisionByZeroError(CalculatorError, ZeroDivisionError):
+    """
+    Raised if the expression divides by zero.
+    """
+
+    code = "DIVISION_BY_ZERO"
+
+
+class ArithmeticEvaluationError(CalculatorError, ArithmeticError):
+    """
+    Raised if applying an operator fails for any other arithmetic reason (e.g. a result
+    that is too large to be converted to a float).
+    """
+
+    code = "ARITHMETIC_ERROR"
+
+
+class ResourceLimitError(CalculatorError):
+    """
+    Raised if the expression exceeds one of the ResourceLimits of the parser or the
+    calculator (e.g. it is too long, nested too deeply or its numbers grow too big).
+
+    ...
+
+    Attributes
+    ----------
+    limit : str
+        The name of the limit that was exceeded, e.g. "maxLength".
+
+    """
+
+    code = "RESOURCE_LIMIT_EXCEEDED"
+
+    def __init__(self, message, position=None, limit=None):
+        super().__init__(message, position)
+        self.limit = limit
+
+
+# The messages of the arithmetic errors whose own message is not readable, like the ones
+# of the decimal module ("[<class 'decimal.InvalidOperation'>]"), by the name of their class.
+_ARITHMETIC_ERROR_MESSAGES = {"InvalidOperation": "Math domain error.", "Overflow": "Numerical result out of range.",
+                              "OverflowError": "Numerical result out of range."}
+
+
+def arithmeticErrorMessage(error):
+    """
+    Returns the message of an ArithmeticEvaluationError for an error raised by an operator
+    or function, so that e.g. the square root of a negative number gives "Math domain
+    error." with every numeric backend.
+
+    Parameters
+    ----------
+    error : ArithmeticError or ValueError
+        The error raised by the operator or function.
+
+    Returns
+    ------
+    message : str
+        The message, capitalized and ending with a period.
+    """
+    for errorClass in type(error).__mro__:
+        message = _ARITHMETIC_ERROR_MESSAGES.get(errorClass.__name__)
+        if message is not None:
+            return message
+    return str(error).capitalize() + "."
+
+
+TOO_MANY_DIGITS_MESSAGE = "The result has too many digits to be written out."
+
+
+def formatValue(value):
+    """
+    Returns the text of a value, like str(value).
+
+    Parameters
+    ----------
+    value : Integer or Float
+        The result of an expression.
+
+    Returns
+    ------
+    text : str
+        The value written out.
+
+    Raises
+    ------
+    ArithmeticEvaluationError
+        If the value is an int with more digits than Python converts to a string (see
+        sys.set_int_max_str_digits()), e.g. the result of 10 ^ 5000.
+    """
+    try:
+        return str(value)
+    except ValueError:
+        raise ArithmeticEvaluationError(TOO_MANY_DIGITS_MESSAGE) from None
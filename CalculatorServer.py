@@ -0,0 +1,280 @@
+"""
+A long-lived server for the calculator that speaks a simple line protocol over TCP or a
+Unix socket: every line a client sends is an expression and the server answers every
+line, in order, with the value of the expression or "Error: " and the error message.
+Clients can send many lines without waiting for the answers (pipelining), e.g.
+
+    python3 CalculatorServer.py --port 8765 --workers 4
+    printf '1 + 2\n(4-2)*3.5\n' | nc localhost 8765
+"""
+
+import argparse
+import asyncio
+import itertools
+
+from BatchEvaluator import BatchEvaluator, _evaluateChunk, _initializeWorker, _parserArguments
+from CalculatorErrors import ArithmeticEvaluationError, formatValue
+from ExpressionCache import ExpressionCache
+from InputParser import InputParser
+
+
+class CalculatorServer:
+    """
+    Serves the calculator to many concurrent clients from one asyncio event loop.
+
+    Every connection reads the lines that arrive in chunks and hands each chunk to the
+    evaluation right away, while it keeps reading, so pipelined requests are evaluated
+    as they come in. With workers, chunks are evaluated in a pool of processes;
+    otherwise they are evaluated in the event loop. Answers are always written in the
+    order of the requests. Each connection only keeps a bounded number of chunks in
+    flight and waits for its answers to be sent, so a client that sends faster than
+    it reads is slowed down instead of filling up the memory of the server.
+
+    ...
+
+    Attributes
+    ----------
+    workers : int
+        The number of worker processes, or 0 to evaluate in the event loop.
+    chunkSize : int
+        The maximum number of lines evaluated together.
+    maxPendingChunks : int
+        The maximum number of chunks per connection that are evaluated or waiting to be
+        sent at the same time.
+    maxLineLength : int
+        The maximum length of a line in bytes. Connections that send longer lines are
+        closed.
+    limits : ResourceLimits
+        The budgets every expression is checked against, or None for none, so that one
+        pathological expression cannot keep the server busy.
+
+    Methods
+    -------
+    start(host, port)
+        Starts serving on a TCP socket.
+
+    startUnix(path)
+        Starts serving on a Unix socket.
+
+    close()
+        Stops serving and shuts the worker processes down.
+
+    """
+
+    def __init__(self, workers=0, chunkSize=256, maxPendingChunks=8, maxLineLength=1 << 20, cacheSize=4096,
+                 backlog=1024, limits=None):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        workers : int
+            The number of worker processes, or 0 to evaluate in the event loop.
+        chunkSize : int
+            The maximum number of lines evaluated together.
+        maxPendingChunks : int
+            The maximum number of chunks per connection in flight at the same time.
+        maxLineLength : int
+            The maximum length of a line in bytes.
+        cacheSize : int
+            The maximum size of the cache of compiled expressions (per worker process),
+            or 0 for no cache.
+        backlog : int
+            The maximum number of connections waiting to be accepted.
+        limits : ResourceLimits
+            The budgets every expression is checked against, or None for none.
+        """
+        self.workers = workers
+        self.chunkSize = chunkSize
+        self.maxPendingChunks = maxPendingChunks
+        self.maxLineLength = maxLineLength
+        self.backlog = backlog
+        self._cacheSize = cacheSize
+        self._executor = None
+        self.limits = limits
+        self._batchEvaluator = BatchEvaluator(InputParser(limits=limits),
+                                              cache=ExpressionCache(cacheSize) if cacheSize else None)
+        self._servers = []
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Starts serving on a TCP socket.
+
+        Parameters
+        ----------
+        host : str
+            The address to listen on.
+        port : int
+            The port to listen on, or 0 to pick a free one.
+
+        Returns
+        ------
+        server : asyncio.Server
+            The server, whose sockets tell the address it listens on.
+        """
+        self._startWorkers()
+        server = await asyncio.start_server(self._handleConnection, host, port, limit=self.maxLineLength,
+                                            backlog=self.backlog)
+        self._servers.append(server)
+        return server
+
+    async def startUnix(self, path):
+        """
+        Starts serving on a Unix socket.
+
+        Parameters
+        ----------
+        path : str
+            The path of the socket.
+
+        Returns
+        ------
+        server : asyncio.Server
+            The server.
+        """
+        self._startWorkers()
+        server = await asyncio.start_unix_server(self._handleConnection, path, limit=self.maxLineLength,
+                                                 backlog=self.backlog)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        """
+        Stops serving and shuts the worker processes down.
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _startWorkers(self):
+        if self.workers > 0 and self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            parserArguments = _parserArguments(self._batchEvaluator.inputParser)
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_initializeWorker,
+                                                 initargs=(self._cacheSize, parserArguments))
+
+    def _evaluate(self, expressions):
+        """
+        Starts evaluating a chunk of expressions.
+
+        Returns
+        ------
+        future : asyncio.Future
+            Resolves to a (value, errorCode, errorPosition, errorMessage) tuple for every
+            expression.
+        """
+        loop = asyncio.get_running_loop()
+        if self._executor is not None:
+            return loop.run_in_executor(self._executor, _evaluateChunk, expressions)
+        future = loop.create_future()
+        future.set_result([(result.value, result.errorCode, result.errorPosition, result.errorMessage)
+                           for expression, result in self._batchEvaluator.evaluate(expressions)])
+        return future
+
+    async def _readRequests(self, reader, pendingChunks):
+        """
+        Reads lines from a connection in chunks and starts evaluating every chunk. A
+        None is put into pendingChunks once the client is done sending.
+        """
+        chunkSize = self.chunkSize
+        remainder = b""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                lines = (remainder + data).split(b"\n")
+                remainder = lines.pop()
+                for start in range(0, len(lines), chunkSize):
+                    expressions = [line.decode("utf-8", "replace").rstrip("\r")
+                                   for line in itertools.islice(lines, start, start + chunkSize)]
+                    await pendingChunks.put(self._evaluate(expressions))
+                if len(remainder) > self.maxLineLength:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result([(None, "LINE_TOO_LONG", None, "Line too long.")])
+                    await pendingChunks.put(future)
+                    remainder = b""
+                    break
+            if remainder:
+                await pendingChunks.put(self._evaluate([remainder.decode("utf-8", "replace").rstrip("\r")]))
+        except ConnectionError:
+            pass
+        finally:
+            await pendingChunks.put(None)
+
+    async def _handleConnection(self, reader, writer):
+        """
+        Serves one connection: answers its requests in order until the client is done.
+        """
+        pendingChunks = asyncio.Queue(self.maxPendingChunks)
+        readerTask = asyncio.create_task(self._readRequests(reader, pendingChunks))
+        try:
+            while True:
+                future = await pendingChunks.get()
+                if future is None:
+                    break
+                answers = []
+                for value, errorCode, errorPosition, errorMessage in await future:
+                    if errorCode is None:
+                        try:
+                            answers.append(formatValue(value))
+                        except ArithmeticEvaluationError as error:
+                            # Only the answer to this line, not the connection, fails.
+                            answers.append("Error: " + str(error))
+                    else:
+                        answers.append("Error: " + errorMessage)
+                answers.append("")
+                writer.write("\n".join(answers).encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            readerTask.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(host, port, unixSocket, workers, limits=None):
+    calculatorServer = CalculatorServer(workers=workers, limits=limits)
+    if unixSocket:
+        server = await calculatorServer.startUnix(unixSocket)
+    else:
+        server = await calculatorServer.start(host, port)
+    try:
+        await server.serve_forever()
+    finally:
+        await calculatorServer.close()
+
+
+def main(arguments=None):
+    argumentParser = argparse.ArgumentParser(description="Serves the calculator over a line protocol.")
+    argumentParser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    argumentParser.add_argument("--port", type=int, default=8765, help="the TCP port to listen on")
+    argumentParser.add_argument("--unix-socket", help="listen on this Unix socket instead of TCP")
+    argumentParser.add_argument("--workers", type=int, default=0,
+                                help="the number of processes evaluating the expressions (0 for none)")
+    argumentParser.add_argument("--no-limits", action="store_true",
+                                help="accept expressions beyond the default ResourceLimits")
+    parsedArguments = argumentParser.parse_args(arguments)
+    limits = None
+    if not parsedArguments.no_limits:
+        from ResourceLimits import ResourceLimits
+
+        limits = ResourceLimits()
+    try:
+        asyncio.run(serve(parsedArguments.host, parsedArguments.port, parsedArguments.unix_socket,
+                          parsedArguments.workers, limits))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Evaluates a formula for every row of numeric columns that are stored in files, e.g.
+
+    python3 ColumnarEvaluator.py "price * quantity - discount" --column price=price.npy \
+        --column quantity=quantity.bin:int32 --column discount=0.5 --output total.npy
+
+The columns are .npy files or raw binary files of a single type. They are mapped into
+memory instead of read, so they can be bigger than the memory of the machine.
+"""
+
+import argparse
+import mmap
+import sys
+
+import numpy
+
+from Calculator import Calculator
+from InputParser import InputParser
+
+
+def openColumn(path, dtype=None):
+    """
+    Maps a column of numbers in a file into memory, read only.
+
+    Parameters
+    ----------
+    path : str
+        The path of a .npy file or of a raw binary file.
+    dtype : str or numpy.dtype
+        The type of the numbers of a raw file (float64 if left out). A .npy file stores
+        its own type.
+
+    Returns
+    ------
+    column : numpy.memmap
+        The numbers of the file. The pages are only read when the numbers are used.
+    """
+    if path.endswith(".npy"):
+        column = numpy.load(path, mmap_mode="r")
+        if dtype is not None and column.dtype != numpy.dtype(dtype):
+            raise ValueError(path + " holds " + str(column.dtype) + ", not " + str(numpy.dtype(dtype)) + ".")
+    else:
+        column = numpy.memmap(path, dtype=dtype if dtype is not None else numpy.float64, mode="r")
+    if column.ndim != 1:
+        raise ValueError(path + " does not hold a single column.")
+    return column
+
+
+def _release(array, start, stop):
+    """
+    Tells the kernel that the rows from start to stop of a memory-mapped array are not
+    needed anymore, so their pages do not count towards the memory of the process. Pages
+    of the output have to be flushed first. Does nothing for arrays that are not mapped
+    or on systems without madvise().
+    """
+    # The buffer of a numpy.memmap (and of numpy.load(mmap_mode=...)) is its mmap.
+    mapping = array.base
+    if not isinstance(mapping, mmap.mmap) or not hasattr(mapping, "madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    # The mapping starts at a multiple of the allocation granularity before the array.
+    base = array.offset % mmap.ALLOCATIONGRANULARITY
+    first = (base + start * array.itemsize + mmap.PAGESIZE - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+    last = (base + stop * array.itemsize) // mmap.PAGESIZE * mmap.PAGESIZE
+    if last > first:
+        mapping.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+
+class ColumnarEvaluator:
+    """
+    Evaluates a compiled expression for every row of columns that are too big to be
+    held in memory at once. The rows are evaluated in chunks of a fixed size with
+    Calculator.evaluateBatch(), so every operator is applied to a whole chunk by NumPy,
+    and the results are written to a memory-mapped .npy file chunk by chunk. Once a
+    chunk is written, the pages of its input and output are given back to the kernel,
+    so the memory of the process is bounded by the chunk size and not by the number of
+    rows.
+
+    A row that divides by zero gets NaN, like in Calculator.evaluateBatch(), and can be
+    flagged in a separate .npy file of booleans.
+
+    ...
+
+    Attributes
+    ----------
+    calculator : Calculator
+        The calculator that evaluates the chunks.
+    chunkSize : int
+        The number of rows evaluated at once.
+
+    Methods
+    -------
+    evaluateChunks(compiledExpression, columns)
+        Yields the start row, values and error mask of every chunk.
+
+    evaluateToFile(compiledExpression, columns, outputPath, errorsPath, dtype)
+        Writes the value of every row to a .npy file.
+
+    """
+
+    def __init__(self, calculator=None, chunkSize=65536):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        calculator : Calculator
+            The calculator that evaluates the chunks (a new one if left out).
+        chunkSize : int
+            The number of rows evaluated at once.
+        """
+        if chunkSize < 1:
+            raise ValueError("The chunk size has to be at least 1.")
+        self.calculator = calculator if calculator is not None else Calculator()
+        self.chunkSize = chunkSize
+
+    def _rowCount(self, compiledExpression, columns):
+        """
+        Returns the number of rows of the columns the expression uses, which all have to
+        be of the same length. Numbers are used for every row.
+        """
+        lengths = {len(columns[name]) for name in compiledExpression.variables
+                   if name in columns and numpy.ndim(columns[name]) > 0}
+        if len(lengths) > 1:
+            raise ValueError("All columns have to have the same number of rows.")
+        return lengths.pop() if lengths else 1
+
+    def evaluateChunks(self, compiledExpression, columns, release=False):
+        """
+        Evaluates the expression one chunk of rows at a time.
+
+        Parameters
+        ----------
+        compiledExpression : CompiledExpression
+            The expression to evaluate, as returned by InputParser.compile().
+        columns : Mapping
+            Maps the name of every variable of the expression to a column (e.g. returned by
+            openColumn()) or to a number that is used for every row.
+        release : bool
+            Whether the pages of the columns are given back to the kernel after every
+            chunk.
+
+        Yields
+        ------
+        start : int
+            The first row of the chunk.
+        values : numpy.ndarray
+            The value of every row of the chunk.
+        errorMask : numpy.ndarray
+            A boolean array that is True for every row of the chunk that divides by zero.
+        """
+        rows = self._rowCount(compiledExpression, columns)
+        mappedColumns = [columns[name] for name in compiledExpression.variables
+                         if name in columns and numpy.ndim(columns[name]) > 0]
+        for start in range(0, rows, self.chunkSize):
+            stop = min(start + self.chunkSize, rows)
+            chunk = {name: column[start:stop] if numpy.ndim(column) > 0 else column
+                     for name, column in columns.items()}
+            values, errorMask = self.calculator.evaluateBatch(compiledExpression, chunk)
+            if values.shape != (stop - start,):
+                # The expression does not use any column.
+                values = numpy.broadcast_to(values, (stop - start,))
+                errorMask = numpy.broadcast_to(errorMask, (stop - start,))
+            yield start, values, errorMask
+            if release:
+                for column in mappedColumns:
+                    _release(column, start, stop)
+
+    def evaluateToFile(self, compiledExpression, columns, outputPath, errorsPath=None, dtype=numpy.float64):
+        """
+        Evaluates the expression for every row and writes the values to a .npy file,
+        which is mapped into memory and filled one chunk at a time.
+
+        Parameters
+        ----------
+        compiledExpression : CompiledExpression
+            The expression to evaluate, as returned by InputParser.compile().
+        columns : Mapping
+            Maps the name of every variable of the expression to a column (e.g. returned by
+            openColumn()) or to a number that is used for every row.
+        outputPath : str
+            The path of the .npy file the values are written to.
+        errorsPath : str
+            The path of a .npy file of booleans that flags the rows that divide by zero,
+            or None to not write one.
+        dtype : str or numpy.dtype
+            The type of the values in the output file.
+
+        Returns
+        ------
+        statistics : dict
+            The number of "rows", the number of "chunks" and the number of rows with
+            "errors".
+        """
+        rows = self._rowCount(compiledExpression, columns)
+        output = numpy.lib.format.open_memmap(outputPath, mode="w+", dtype=dtype, shape=(rows,))
+        errors = None
+        if errorsPath is not None:
+            errors = numpy.lib.format.open_memmap(errorsPath, mode="w+", dtype=numpy.bool_, shape=(rows,))
+        statistics = {"rows": rows, "chunks": 0, "errors": 0}
+        for start, values, errorMask in self.evaluateChunks(compiledExpression, columns, release=True):
+            stop = start + len(values)
+            output[start:stop] = values
+            statistics["chunks"] += 1
+            statistics["errors"] += int(numpy.count_nonzero(errorMask))
+            output.flush()
+            _release(output, start, stop)
+            if errors is not None:
+                errors[start:stop] = errorMask
+                errors.flush()
+                _release(errors, start, stop)
+        del output, errors
+        return statistics
+
+
+def _parseColumn(argument):
+    """
+    Reads a NAME=PATH[:DTYPE] or NAME=NUMBER argument of the command line.
+    """
+    name, separator, source = argument.partition("=")
+    if not separator or not name or not source:
+        raise argparse.ArgumentTypeError("expected NAME=PATH[:DTYPE] or NAME=NUMBER, not " + repr(argument))
+    try:
+        return name, float(source)
+    except ValueError:
+        pass
+    path, separator, dtype = source.rpartition(":")
+    if separator:
+        try:
+            return name, (path, numpy.dtype(dtype))
+        except TypeError:
+            pass
+    return name, (source, None)
+
+
+def main(arguments=None):
+    argumentParser = argparse.ArgumentParser(description="Evaluates a formula for every row of columns in files.")
+    argumentParser.add_argument("expression", help="the formula, e.g. \"price * quantity\"")
+    argumentParser.add_argument("--column", action="append", type=_parseColumn, default=[],
+                                metavar="NAME=PATH[:DTYPE]",
+                                help="a variable of the formula and the .npy or raw file (float64 unless "
+                                     "a type is given) with its values, or a number used for every row")
+    argumentParser.add_argument("--output", required=True, help="the .npy file the values are written to")
+    argumentParser.add_argument("--errors", help="a .npy file that flags the rows that divide by zero")
+    argumentParser.add_argument("--chunk-size", type=int, default=65536, help="the number of rows evaluated at once")
+    parsedArguments = argumentParser.parse_args(arguments)
+
+    columns = {}
+    for name, source in parsedArguments.column:
+        columns[name] = source if isinstance(source, float) else openColumn(*source)
+    compiledExpression = InputParser().compile(parsedArguments.expression)
+    statistics = ColumnarEvaluator(chunkSize=parsedArguments.chunk_size).evaluateToFile(
+        compiledExpression, columns, parsedArguments.output, parsedArguments.errors)
+    print("Evaluated %d rows in %d chunks (%d divided by zero)" % (statistics["rows"], statistics["chunks"],
+                                                                  statistics["errors"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
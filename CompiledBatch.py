@@ -0,0 +1,278 @@
+"""
+Many formulas that are evaluated with the same values of their variables, compiled
+together so that the subexpressions they have in common are computed only once, e.g.
+
+    batch = InputParser().compileBatch(["(a - b) * c + 1", "(a - b) * c / 2", "c * (a - b)"])
+    batch.evaluate({"a": 5, "b": 3, "c": 4})  # [9, 4.0, 8]
+"""
+
+from CalculatorErrors import CalculatorError
+from EvaluationResult import EvaluationResult
+from InputParser import NUMBER, OPERATOR, VARIABLE
+from NumericBackend import defaultBackend
+from OperatorRegistry import defaultRegistry
+
+BINARY = 0
+UNARY = 1
+CALL = 2
+
+
+class _Failed:
+    """
+    The value of a subexpression that could not be computed. Every operation on it is
+    skipped and fails as well.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<failed>"
+
+
+_FAILED = _Failed()
+
+
+class CompiledBatch:
+    """
+    Formulas compiled into one directed acyclic graph, in which every subexpression that
+    appears in several formulas (or several times in one) is a single node. Nodes are
+    found by hash-consing: a node is identified by its operator and the nodes of its
+    operands, so building the graph takes one dictionary lookup per token of the postfix
+    tuples. The operands of commutative operators (+ and * in the default registry, see
+    OperatorRegistry.registerOperator()) are put in a fixed order first, so c * (a - b)
+    and (a - b) * c are the same node. Evaluating the batch applies every operator of the
+    graph once, so the cost grows with the number of different subexpressions instead of
+    the total length of the formulas. Instances are created by InputParser.compileBatch().
+
+    A subexpression that fails (e.g. divides by zero) only fails the formulas that use
+    it. Their errors are found by evaluating those formulas again on their own, so the
+    error and its position are the same that CompiledExpression.evaluate() gives.
+
+    ...
+
+    Attributes
+    ----------
+    expressions : tuple
+        The CompiledExpression of every formula, in order.
+    variables : tuple
+        The names of the variables used by any of the formulas, in the order they first appear.
+    backend : NumericBackend
+        The numeric backend the formulas were compiled with.
+    operationCount : int
+        The number of operators and functions in all formulas together.
+    uniqueOperationCount : int
+        The number of operators and functions in the graph, which is the number applied
+        per evaluation.
+
+    Methods
+    -------
+    evaluate(bindings)
+        Returns the value of every formula with the given values of the variables.
+
+    evaluateMany(bindingsSequence)
+        Evaluates the formulas once for every mapping of values in bindingsSequence.
+
+    evaluateToResults(bindings)
+        Returns an EvaluationResult for every formula instead of raising errors.
+
+    statistics()
+        Returns the sizes of the batch as a dictionary.
+
+    """
+
+    def __init__(self, compiledExpressions, registry=None, limits=None):
+        """
+        Builds the graph of the formulas.
+
+        Parameters
+        ----------
+        compiledExpressions : iterable
+            The CompiledExpression of every formula. All of them have to use the same
+            numeric backend.
+        registry : OperatorRegistry
+            The registry the formulas were compiled with (the default one if left out).
+        limits : ResourceLimits
+            The limits the formulas were compiled with, whose maxMagnitude the results
+            of the graph are checked against as well (None for no limits).
+        """
+        registry = registry if registry is not None else defaultRegistry
+        self.expressions = tuple(compiledExpressions)
+        backends = {id(compiledExpression.backend) for compiledExpression in self.expressions}
+        if len(backends) > 1:
+            raise ValueError("All formulas of a batch have to use the same numeric backend.")
+        backend = self.expressions[0].backend if self.expressions else None
+        self.backend = backend if backend is not None else defaultBackend
+        operatorFunctions = registry.functionsFor(self.backend.operatorFunctions)
+        if limits is not None:
+            operatorFunctions = limits.guard(operatorFunctions)
+        arities = registry.arities
+        commutativeOperators = registry.commutativeOperators
+
+        nodes = {}
+        template = []
+        loads = []
+        program = []
+        roots = []
+        variables = {}
+        operationCount = 0
+        for compiledExpression in self.expressions:
+            stack = []
+            for kind, value, position in compiledExpression.postfix:
+                if kind == NUMBER:
+                    # The type and repr tell apart numbers that compare equal, like 1 and 1.0.
+                    key = (NUMBER, type(value), repr(value))
+                elif kind == VARIABLE:
+                    key = (VARIABLE, value)
+                else:
+                    operationCount += 1
+                    arity = arities[value]
+                    operands = tuple(stack[-arity:])
+                    del stack[-arity:]
+                    if kind == OPERATOR and value in commutativeOperators:
+                        operands = tuple(sorted(operands))
+                    key = (kind, value, operands)
+                slot = nodes.get(key)
+                if slot is None:
+                    slot = nodes[key] = len(template)
+                    template.append(value if kind == NUMBER else None)
+                    if kind == VARIABLE:
+                        loads.append((slot, value))
+                        variables.setdefault(value, None)
+                    elif kind != NUMBER:
+                        function = operatorFunctions[value]
+                        if arity == 2:
+                            program.append((BINARY, slot, function, operands[0], operands[1]))
+                        elif arity == 1:
+                            program.append((UNARY, slot, function, operands[0], None))
+                        else:
+                            program.append((CALL, slot, function, operands, None))
+                stack.append(slot)
+            roots.append(stack[0])
+
+        self.variables = tuple(variables)
+        self.operationCount = operationCount
+        self.uniqueOperationCount = len(program)
+        self._template = template
+        self._loads = tuple(loads)
+        self._program = tuple(program)
+        self._roots = tuple(roots)
+
+    def __len__(self):
+        return len(self.expressions)
+
+    def __repr__(self):
+        return "CompiledBatch(" + str(len(self.expressions)) + " formulas, " + str(self.uniqueOperationCount) \
+            + " of " + str(self.operationCount) + " operations)"
+
+    def _run(self, bindings):
+        """
+        Computes every node of the graph and returns the value of every formula, or
+        _FAILED for the formulas that failed.
+        """
+        values = self._template[:]
+        for slot, name in self._loads:
+            try:
+                values[slot] = bindings[name]
+            except (KeyError, TypeError):
+                values[slot] = _FAILED
+        for opcode, slot, function, operand1, operand2 in self._program:
+            if opcode == BINARY:
+                operands = (values[operand1], values[operand2])
+            elif opcode == UNARY:
+                operands = (values[operand1],)
+            else:
+                operands = [values[operand] for operand in operand1]
+            if _FAILED in operands:
+                values[slot] = _FAILED
+                continue
+            try:
+                values[slot] = function(*operands)
+            except (CalculatorError, ArithmeticError, ValueError):
+                # The errors CompiledExpression.evaluate() raises again for the formula.
+                values[slot] = _FAILED
+        return [values[root] for root in self._roots]
+
+    def evaluate(self, bindings=None):
+        """
+        Returns the value of every formula.
+
+        Parameters
+        ----------
+        bindings : Mapping
+            Maps the name of every variable of the formulas to its value. Can be left out
+            if they have no variables.
+
+        Returns
+        ------
+        values : list
+            The value of every formula, in order.
+
+        Raises
+        ------
+        CalculatorError
+            The error of the first formula that fails, just like
+            CompiledExpression.evaluate() raises it.
+        """
+        values = self._run(bindings)
+        for index, value in enumerate(values):
+            if value is _FAILED:
+                # Raises the error of the formula (or returns its value, if only an
+                # operand that the formula does not need failed).
+                values[index] = self.expressions[index].evaluate(bindings)
+        return values
+
+    def evaluateMany(self, bindingsSequence):
+        """
+        Evaluates the formulas once for every mapping of values in bindingsSequence.
+
+        Parameters
+        ----------
+        bindingsSequence : iterable
+            Mappings from the names of the variables to their values.
+
+        Yields
+        ------
+        values : list
+            The value of every formula with each mapping, in order.
+        """
+        evaluate = self.evaluate
+        for bindings in bindingsSequence:
+            yield evaluate(bindings)
+
+    def evaluateToResults(self, bindings=None):
+        """
+        Evaluates the formulas like evaluate(), but returns errors as part of the results
+        instead of raising them, so one failing formula does not hide the others.
+
+        Parameters
+        ----------
+        bindings : Mapping
+            Maps the name of every variable of the formulas to its value.
+
+        Returns
+        ------
+        results : list
+            An EvaluationResult for every formula, in order.
+        """
+        results = []
+        for index, value in enumerate(self._run(bindings)):
+            if value is _FAILED:
+                results.append(self.expressions[index].evaluateToResult(bindings))
+            else:
+                results.append(EvaluationResult(value))
+        return results
+
+    def statistics(self):
+        """
+        Returns the sizes of the batch.
+
+        Returns
+        ------
+        statistics : dict
+            The number of "formulas", the number of "operations" in all of them, the
+            number of "uniqueOperations" in the graph and the number of operations
+            "shared" between the formulas.
+        """
+        return {"formulas": len(self.expressions), "operations": self.operationCount,
+                "uniqueOperations": self.uniqueOperationCount,
+                "shared": self.operationCount - self.uniqueOperationCount}
@@ -0,0 +1,236 @@
+# threading.local, without importing threading (and collections and functools with it)
+# at startup.
+from _thread import _local as threadLocal
+
+from CalculatorErrors import ArithmeticEvaluationError, CalculatorError, DivisionByZeroError, UnboundVariableError, \
+    arithmeticErrorMessage
+from EvaluationResult import EvaluationResult
+from InputParser import FUNCTION, NUMBER, OPERATOR, VARIABLE
+from OperatorRegistry import defaultRegistry
+
+PUSH = 0
+LOAD = 1
+APPLY = 2
+APPLY_UNARY = 3
+CALL = 4
+
+
+class CompiledExpression:
+    """
+    An arithmetic expression that has already been parsed, so that it can be evaluated
+    as often as needed without paying for the parsing again. Instances are immutable
+    and are created by InputParser.compile().
+
+    The stack depth at every instruction is known when the expression is compiled, so
+    every instruction reads and writes fixed slots of a register list instead of
+    pushing and popping. Every thread keeps one register list per expression and
+    reuses it, so evaluating allocates nothing but the results of the operators, and an
+    instance can be shared by any number of threads (also without the global
+    interpreter lock).
+
+    ...
+
+    Attributes
+    ----------
+    postfix : tuple
+        The expression in postfix notation as (kind, value, position) tuples. The value
+        of a NUMBER is already an int or a float and the value of a VARIABLE, an
+        OPERATOR, a UNARY_OPERATOR or a FUNCTION is its name (see OperatorRegistry).
+    variables : tuple
+        The names of the variables used in the expression, in the order they first appear.
+    backend : NumericBackend
+        The numeric backend the numbers were converted with and the operators apply.
+    registry : OperatorRegistry
+        The registry of the operators and functions of the expression.
+
+    Methods
+    -------
+    evaluate(bindings)
+        Evaluates the expression with the given values of its variables.
+
+    evaluateMany(bindingsSequence)
+        Evaluates the expression once for every mapping of values in bindingsSequence.
+
+    evaluateToResult(bindings)
+        Evaluates the expression and returns an EvaluationResult instead of raising errors.
+
+    """
+
+    __slots__ = ("postfix", "variables", "backend", "registry", "_program", "_registerCount", "_blankRegisters",
+                 "_local")
+
+    def __init__(self, postfix, operatorFunctions, backend=None, registry=None):
+        """
+        Builds the program that evaluate() runs from the postfix tuples.
+
+        Parameters
+        ----------
+        postfix : tuple
+            The (kind, value, position) tuples of the expression in postfix order.
+        operatorFunctions : Mapping
+            Maps the name of every operator and function to the function that applies it.
+        backend : NumericBackend
+            The numeric backend operatorFunctions belong to.
+        registry : OperatorRegistry
+            The registry that tells how many arguments the functions take (the default
+            one if left out).
+        """
+        registry = registry if registry is not None else defaultRegistry
+        arities = registry.arities
+        # Every instruction is (opcode, argument, slot, slot + 1, position): the result goes
+        # to the slot of its first operand, which is the depth of the stack before it.
+        program = []
+        variables = []
+        depth = 0
+        registerCount = 0
+        for kind, value, position in postfix:
+            if kind == NUMBER:
+                program.append((PUSH, value, depth, depth + 1, position))
+                depth += 1
+            elif kind == VARIABLE:
+                program.append((LOAD, value, depth, depth + 1, position))
+                depth += 1
+                if value not in variables:
+                    variables.append(value)
+            elif kind == OPERATOR:
+                depth -= 1
+                program.append((APPLY, operatorFunctions[value], depth - 1, depth, position))
+            elif kind == FUNCTION and arities[value] != 1:
+                # Functions of two arguments run like operators.
+                arity = arities[value]
+                depth -= arity - 1
+                program.append((APPLY if arity == 2 else CALL, operatorFunctions[value], depth - 1,
+                                depth - 1 + arity if arity != 2 else depth, position))
+            else:
+                program.append((APPLY_UNARY, operatorFunctions[value], depth - 1, depth, position))
+            registerCount = max(registerCount, depth)
+        object.__setattr__(self, "postfix", postfix)
+        object.__setattr__(self, "variables", tuple(variables))
+        object.__setattr__(self, "backend", backend)
+        object.__setattr__(self, "registry", registry)
+        object.__setattr__(self, "_program", tuple(program))
+        object.__setattr__(self, "_registerCount", registerCount)
+        object.__setattr__(self, "_blankRegisters", (None,) * registerCount)
+        object.__setattr__(self, "_local", threadLocal())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledExpression objects are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledExpression objects are immutable.")
+
+    def __repr__(self):
+        return "CompiledExpression(" + repr(" ".join([str(token[1]) for token in self.postfix])) + ")"
+
+    def evaluate(self, bindings=None):
+        """
+        Evaluates the expression. Runs the same stack machine as
+        Calculator.evaluatePostfixExp(), but the operands are already numbers and the
+        operators are already the functions that apply them, so nothing is parsed here.
+
+        Parameters
+        ----------
+        bindings : Mapping
+            Maps the name of every variable of the expression to its value. Can be left
+            out if the expression has no variables.
+
+        Returns
+        ------
+            Result : Integer or Float
+                The result of evaluating the arithmetic expression (a number of the type
+                of the backend, e.g. a Decimal).
+
+        Raises
+        ------
+        UnboundVariableError
+            If a variable of the expression has no value in bindings.
+        DivisionByZeroError
+            If the expression divides by zero.
+        ArithmeticEvaluationError
+            If applying an operator or a function fails for another arithmetic reason
+            (e.g. the square root of a negative number).
+        ResourceLimitError
+            If the expression was compiled with limits and a result gets bigger than
+            their maxMagnitude.
+        """
+        local = self._local
+        # The registers of the thread are taken while they are in use, so an operator
+        # that evaluates this expression again (in the same thread) gets new ones.
+        try:
+            registers = local.registers
+        except AttributeError:
+            registers = None
+        if registers is None:
+            registers = [None] * self._registerCount
+        else:
+            local.registers = None
+        opcode = argument = position = None
+        try:
+            for opcode, argument, slot, nextSlot, position in self._program:
+                if opcode == APPLY:
+                    registers[slot] = argument(registers[slot], registers[nextSlot])
+                elif opcode == PUSH:
+                    registers[slot] = argument
+                elif opcode == LOAD:
+                    registers[slot] = bindings[argument]
+                elif opcode == APPLY_UNARY:
+                    registers[slot] = argument(registers[slot])
+                else:
+                    registers[slot] = argument(*registers[slot:nextSlot])
+        except CalculatorError as error:
+            # E.g. a ResourceLimitError of a guarded operator, which does not know where it is.
+            if error.position is None:
+                error.position = position
+            raise
+        except ZeroDivisionError:
+            raise DivisionByZeroError("Division by zero.", position) from None
+        except (ArithmeticError, ValueError) as error:
+            raise ArithmeticEvaluationError(arithmeticErrorMessage(error), position) from None
+        except (KeyError, TypeError):
+            if opcode != LOAD:
+                raise
+            raise UnboundVariableError("Variable \"" + argument + "\" has no value.", position) from None
+        result = registers[0]
+        # Do not keep the operands alive until the next evaluation.
+        registers[:] = self._blankRegisters
+        local.registers = registers
+        return result
+
+    def evaluateMany(self, bindingsSequence):
+        """
+        Evaluates the expression once for every mapping of values in bindingsSequence,
+        so one parsed template serves any number of inputs.
+
+        Parameters
+        ----------
+        bindingsSequence : iterable
+            Mappings from the names of the variables to their values.
+
+        Yields
+        ------
+            Result : Integer or Float
+                The result of evaluating the expression with each mapping, in order.
+        """
+        evaluate = self.evaluate
+        for bindings in bindingsSequence:
+            yield evaluate(bindings)
+
+    def evaluateToResult(self, bindings=None):
+        """
+        Evaluates the expression like evaluate(), but returns errors as part of the result
+        instead of raising them.
+
+        Parameters
+        ----------
+        bindings : Mapping
+            Maps the name of every variable of the expression to its value.
+
+        Returns
+        ------
+        result : EvaluationResult
+            The value of the expression, or the code, position and message of the error.
+        """
+        try:
+            return EvaluationResult(self.evaluate(bindings))
+        except Exception as error:
+            return EvaluationResult.fromError(error)
@@ -0,0 +1,481 @@
+"""
+This file generates random arithmetic expressions and checks that every way of
+evaluating them gives the same result as InputParser.parseInput() followed by
+Calculator.evaluatePostfixExp(), and as Python's own arithmetic, e.g.
+
+    python3 DifferentialFuzzer.py --cases 1000000 --seed 7
+
+Every expression that gives different results is shrunk to a small expression that
+still does, and the throughput of every way of evaluating is reported as well.
+"""
+
+import argparse
+import ast
+import math
+import operator
+import random
+import sys
+import time
+
+from Calculator import Calculator
+from CalculatorErrors import CalculatorError
+from CompiledBatch import CompiledBatch
+from ExpressionOptimizer import ExpressionOptimizer
+from IncrementalParser import IncrementalParser
+from InputParser import InputParser
+from PostfixBytecode import PostfixBytecode
+
+# The precedences of the operators, which are the same in the calculator and in Python
+# (^ is ** in Python). A minus in front of an operand binds less tightly than ^ but more
+# tightly than * in both, and numbers, groups and calls bind the tightest.
+_PRECEDENCES = {"+": 1, "-": 1, "*": 2, "/": 2, "//": 2, "%": 2, "^": 4}
+_NEGATE_PRECEDENCE = 3
+_ATOM_PRECEDENCE = 5
+_FUNCTION_ARITIES = {"abs": (1, 1), "sqrt": (1, 1), "min": (1, 3), "max": (1, 3)}
+
+
+def _generateNumber(randomGenerator, exponent=False):
+    """
+    Generates the text of a number, e.g. "42", "-3.25", "+.5" or "-.32". The exponents
+    of ^ are kept small, so that powers of powers stay computable.
+    """
+    sign = randomGenerator.choice(["", "", "", "-", "+"])
+    if exponent:
+        return sign + randomGenerator.choice(["0", "1", "2", "3", ".5", "0.5", "1.5"])
+    shape = randomGenerator.random()
+    if shape < 0.4:
+        digits = str(randomGenerator.choice([randomGenerator.randint(0, 9), randomGenerator.randint(10, 999),
+                                             randomGenerator.randint(1000, 10 ** 12)]))
+    elif shape < 0.7:
+        digits = str(randomGenerator.randint(0, 99)) + "." + str(randomGenerator.randint(0, 999)).zfill(
+            randomGenerator.randint(1, 3))
+    else:
+        digits = "." + str(randomGenerator.randint(0, 9999)).zfill(randomGenerator.randint(1, 4))
+    return sign + digits
+
+
+def generateTree(randomGenerator, depth=4):
+    """
+    Generates a random expression as a tree, which can be written in the syntax of the
+    calculator and in the syntax of Python by toText().
+
+    Parameters
+    ----------
+    randomGenerator : random.Random
+        The source of randomness, so that the same seed gives the same expression.
+    depth : int
+        The maximum number of nested operations.
+
+    Returns
+    ------
+    tree : tuple
+        One of ("number", text), ("binary", symbol, left, right, spaced),
+        ("negate", operand), ("group", child) and ("call", name, arguments).
+    """
+    if depth <= 0 or randomGenerator.random() < 0.25:
+        return ("number", _generateNumber(randomGenerator))
+    choice = randomGenerator.random()
+    if choice < 0.6:
+        symbol = randomGenerator.choice(["+", "-", "-", "*", "/", "/", "//", "%"])
+        return ("binary", symbol, generateTree(randomGenerator, depth - 1), generateTree(randomGenerator, depth - 1),
+                randomGenerator.random() < 0.7)
+    if choice < 0.72:
+        exponent = ("number", _generateNumber(randomGenerator, exponent=True))
+        if randomGenerator.random() < 0.2:
+            exponent = ("negate", exponent)
+        return ("binary", "^", generateTree(randomGenerator, depth - 1), exponent, randomGenerator.random() < 0.7)
+    if choice < 0.82:
+        return ("negate", generateTree(randomGenerator, depth - 1))
+    if choice < 0.9:
+        return ("group", generateTree(randomGenerator, depth - 1))
+    name = randomGenerator.choice(sorted(_FUNCTION_ARITIES))
+    arity = randomGenerator.randint(*_FUNCTION_ARITIES[name])
+    return ("call", name, tuple([generateTree(randomGenerator, depth - 1) for i in range(arity)]))
+
+
+def _precedence(tree):
+    kind = tree[0]
+    if kind == "binary":
+        return _PRECEDENCES[tree[1]]
+    if kind == "negate" or kind == "number" and tree[1][0] in "+-":
+        # A sign binds like a minus in front of an operand, e.g. -2 ^ 2 is -(2 ^ 2).
+        return _NEGATE_PRECEDENCE
+    return _ATOM_PRECEDENCE
+
+
+def toText(tree, python=False):
+    """
+    Writes an expression tree with as few parentheses as its syntax needs, so that the
+    parser has to get the precedences right on its own.
+
+    Parameters
+    ----------
+    tree : tuple
+        The expression, as returned by generateTree().
+    python : bool
+        Whether to write it in the syntax of Python instead of the calculator.
+
+    Returns
+    ------
+    text : str
+        The expression.
+    """
+    kind = tree[0]
+    if kind == "number":
+        return tree[1]
+    if kind == "group":
+        return "(" + toText(tree[1], python) + ")"
+    if kind == "call":
+        return tree[1] + "(" + ", ".join([toText(argument, python) for argument in tree[2]]) + ")"
+    if kind == "negate":
+        operand = toText(tree[1], python)
+        # In the calculator, a minus right before a number would become its sign.
+        if _precedence(tree[1]) < _NEGATE_PRECEDENCE or not python and operand[0] in "0123456789.+":
+            operand = "(" + operand + ")"
+        return "-" + operand
+    symbol, left, right, spaced = tree[1:]
+    leftText = toText(left, python)
+    rightText = toText(right, python)
+    precedence = _PRECEDENCES[symbol]
+    if symbol == "^":
+        wrapLeft = _precedence(left) < _ATOM_PRECEDENCE
+        wrapRight = _precedence(right) < _NEGATE_PRECEDENCE
+    else:
+        wrapLeft = _precedence(left) < precedence
+        wrapRight = _precedence(right) <= precedence
+    if wrapLeft:
+        leftText = "(" + leftText + ")"
+    if wrapRight:
+        rightText = "(" + rightText + ")"
+    if python and symbol == "^":
+        symbol = "**"
+    return leftText + (" " + symbol + " " if spaced else symbol) + rightText
+
+
+_PYTHON_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+                     ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow}
+_PYTHON_UNARY_OPERATORS = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+# min(x) and max(x) are x in the calculator, but expect an iterable in Python.
+_PYTHON_FUNCTIONS = {"abs": abs, "sqrt": math.sqrt, "min": lambda *values: min(values),
+                     "max": lambda *values: max(values)}
+
+
+def _evaluateNode(node):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _PYTHON_OPERATORS:
+        value = _PYTHON_OPERATORS[type(node.op)](_evaluateNode(node.left), _evaluateNode(node.right))
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in _PYTHON_UNARY_OPERATORS:
+        value = _PYTHON_UNARY_OPERATORS[type(node.op)](_evaluateNode(node.operand))
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _PYTHON_FUNCTIONS \
+            and not node.keywords:
+        value = _PYTHON_FUNCTIONS[node.func.id](*[_evaluateNode(argument) for argument in node.args])
+    else:
+        raise TypeError("Unsupported syntax: " + ast.dump(node))
+    if isinstance(value, complex):
+        raise ValueError("The result is a complex number.")
+    return value
+
+
+def evaluatePythonExpression(source):
+    """
+    Evaluates an arithmetic expression in the syntax of Python with Python's own
+    arithmetic, by walking the tree that ast.parse() returns. Only numbers, the operators
+    + - * / // % ** and calls of abs, sqrt, min and max are allowed.
+
+    Parameters
+    ----------
+    source : str
+        The expression in the syntax of Python.
+
+    Returns
+    ------
+    value : int or float
+        The value of the expression, or None if it cannot be computed (e.g. it divides
+        by zero or its result is a complex number).
+    """
+    try:
+        return _evaluateNode(ast.parse(source, mode="eval").body)
+    except (ArithmeticError, ValueError):
+        return None
+
+
+def getPaths(inputParser=None, calculator=None):
+    """
+    Returns every way of evaluating expressions that is compared. Every path takes a list
+    of (calculator text, Python text) cases and returns the value of every case, or None
+    where it fails.
+
+    Parameters
+    ----------
+    inputParser : InputParser
+        The parser of the paths (a new one if left out).
+    calculator : Calculator
+        The calculator of the reference path (a new one if left out).
+
+    Returns
+    ------
+    paths : dict
+        Maps the name of every path to its function. The first one is the reference.
+    """
+    inputParser = inputParser if inputParser is not None else InputParser()
+    calculator = calculator if calculator is not None else Calculator()
+    optimizingParser = InputParser(optimizer=ExpressionOptimizer(Calculator.operatorFunctions))
+    incrementalParser = IncrementalParser(inputParser)
+
+    def reference(cases):
+        values = []
+        for text, pythonText in cases:
+            postfix = inputParser.parseInput(text)
+            values.append(calculator.evaluatePostfixExp(postfix) if postfix is not None else None)
+        return values
+
+    def compileExpressions(parser, cases):
+        compiledExpressions = []
+        for text, pythonText in cases:
+            try:
+                compiledExpressions.append(parser.compile(text))
+            except CalculatorError:
+                compiledExpressions.append(None)
+        return compiledExpressions
+
+    def evaluateEach(evaluables):
+        values = []
+        for evaluable in evaluables:
+            try:
+                values.append(evaluable.evaluate() if evaluable is not None else None)
+            except CalculatorError:
+                values.append(None)
+        return values
+
+    def compiled(cases):
+        return evaluateEach(compileExpressions(inputParser, cases))
+
+    def optimized(cases):
+        return evaluateEach(compileExpressions(optimizingParser, cases))
+
+    def bytecode(cases):
+        return evaluateEach([PostfixBytecode.fromCompiledExpression(compiledExpression)
+                             if compiledExpression is not None else None
+                             for compiledExpression in compileExpressions(inputParser, cases)])
+
+    def batch(cases):
+        compiledExpressions = compileExpressions(inputParser, cases)
+        results = iter(CompiledBatch([compiledExpression for compiledExpression in compiledExpressions
+                                      if compiledExpression is not None]).evaluateToResults())
+        values = []
+        for compiledExpression in compiledExpressions:
+            result = next(results) if compiledExpression is not None else None
+            values.append(result.value if result is not None and result.errorCode is None else None)
+        return values
+
+    def incremental(cases):
+        # Every case is an edit of the one before it, so the edits are compared as well.
+        values = []
+        state = None
+        for text, pythonText in cases:
+            state = incrementalParser.parse(text) if state is None else incrementalParser.update(state, text)
+            values.append(state.result.value if state.result.errorCode is None else None)
+        return values
+
+    def python(cases):
+        return [evaluatePythonExpression(pythonText) for text, pythonText in cases]
+
+    return {"reference": reference, "compiled": compiled, "optimized": optimized, "bytecode": bytecode,
+            "batch": batch, "incremental": incremental, "python": python}
+
+
+def isSame(value1, value2):
+    """
+    Returns whether two results are the same: both failed, or both are numbers of the
+    same type and value.
+    """
+    if value1 is None or value2 is None:
+        return value1 is None and value2 is None
+    return type(value1) is type(value2) and (value1 == value2 or value1 != value1 and value2 != value2)
+
+
+def _differences(paths, cases, index=0, values=None):
+    """
+    Returns the names of the paths that do not give the same result as the reference for
+    the case at index.
+    """
+    if values is None:
+        values = {name: path(cases) for name, path in paths.items()}
+    referenceName = next(iter(paths))
+    return [name for name in paths if not isSame(values[name][index], values[referenceName][index])]
+
+
+def _simplerNumbers(text):
+    """
+    Yields numbers that are simpler than text. Every one comes before text in the order
+    of (length, text), so shrinking always ends.
+    """
+    digits = text.lstrip("+-")
+    candidates = ["0", "1", digits, text[:-1]]
+    if "." in digits and digits[0] != ".":
+        candidates.append(text[:text.index(".")])
+    for candidate in candidates:
+        candidateDigits = candidate.lstrip("+-")
+        if (len(candidate), candidate) < (len(text), text) and candidateDigits not in ("", ".") \
+                and candidate[-1] != "." and not (candidateDigits[0] == "0" and candidateDigits[1:2].isdigit()):
+            yield candidate
+
+
+def _smallerTrees(tree):
+    """
+    Yields the trees that are one step smaller than tree: a node replaced by one of its
+    operands, a number made simpler or an argument of min or max left out.
+    """
+    kind = tree[0]
+    if kind == "number":
+        for text in _simplerNumbers(tree[1]):
+            yield ("number", text)
+        return
+    if kind == "binary":
+        yield tree[2]
+        yield tree[3]
+        for left in _smallerTrees(tree[2]):
+            yield ("binary", tree[1], left, tree[3], tree[4])
+        for right in _smallerTrees(tree[3]):
+            yield ("binary", tree[1], tree[2], right, tree[4])
+    elif kind == "negate" or kind == "group":
+        yield tree[1]
+        for operand in _smallerTrees(tree[1]):
+            yield (kind, operand)
+    else:
+        name, arguments = tree[1:]
+        yield from arguments
+        if len(arguments) > _FUNCTION_ARITIES[name][0]:
+            for index in range(len(arguments)):
+                yield ("call", name, arguments[:index] + arguments[index + 1:])
+        for index, argument in enumerate(arguments):
+            for smaller in _smallerTrees(argument):
+                yield ("call", name, arguments[:index] + (smaller,) + arguments[index + 1:])
+
+
+def shrink(tree, isFailing):
+    """
+    Makes a failing expression as small as possible, by replacing it with smaller trees
+    as long as they still fail.
+
+    Parameters
+    ----------
+    tree : tuple
+        The failing expression, as returned by generateTree().
+    isFailing : callable
+        Returns whether a tree still fails.
+
+    Returns
+    ------
+    tree : tuple
+        The smallest failing expression found.
+    """
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for smaller in _smallerTrees(tree):
+            if isFailing(smaller):
+                tree = smaller
+                shrunk = True
+                break
+    return tree
+
+
+def fuzz(cases=10000, seed=0, depth=4, paths=None, chunkSize=1000, maxFailures=10):
+    """
+    Generates random expressions, evaluates them with every path and shrinks the ones
+    that give different results.
+
+    Parameters
+    ----------
+    cases : int
+        The number of expressions.
+    seed : int
+        The seed of the random expressions.
+    depth : int
+        The maximum number of nested operations of an expression.
+    paths : dict
+        The paths to compare, as returned by getPaths() (those if left out).
+    chunkSize : int
+        The number of expressions every path evaluates at once.
+    maxFailures : int
+        The maximum number of failing expressions that are shrunk and reported.
+
+    Returns
+    ------
+    report : dict
+        The number of "cases", the number of "mismatches", the shrunk "failures" (with
+        the "expression", the "pythonExpression", the "original" expression, the one
+        "before" it and the "values" of every path) and the "throughput" of every path
+        in expressions per second.
+    """
+    paths = paths if paths is not None else getPaths()
+    randomGenerator = random.Random(seed)
+    seconds = dict.fromkeys(paths, 0.0)
+    report = {"cases": 0, "mismatches": 0, "failures": []}
+
+    def isFailing(tree):
+        return bool(_differences(paths, [(toText(tree), toText(tree, python=True))]))
+
+    while report["cases"] < cases:
+        trees = [generateTree(randomGenerator, depth) for i in range(min(chunkSize, cases - report["cases"]))]
+        chunk = [(toText(tree), toText(tree, python=True)) for tree in trees]
+        values = {}
+        for name, path in paths.items():
+            start = time.perf_counter()
+            values[name] = path(chunk)
+            seconds[name] += time.perf_counter() - start
+        for index, tree in enumerate(trees):
+            if not _differences(paths, chunk, index, values):
+                continue
+            report["mismatches"] += 1
+            if len(report["failures"]) < maxFailures:
+                if isFailing(tree):
+                    tree = shrink(tree, isFailing)
+                text = toText(tree)
+                pythonText = toText(tree, python=True)
+                report["failures"].append({
+                    "expression": text, "pythonExpression": pythonText, "original": chunk[index][0],
+                    "before": chunk[index - 1][0] if index > 0 else None,
+                    "values": {name: path([(text, pythonText)])[0] for name, path in paths.items()}})
+        report["cases"] += len(trees)
+    report["throughput"] = {name: report["cases"] / seconds[name] if seconds[name] else float("inf")
+                            for name in paths}
+    return report
+
+
+def formatReport(report):
+    """
+    Returns the report of fuzz() as text.
+    """
+    throughput = report["throughput"]
+    referenceThroughput = next(iter(throughput.values()))
+    lines = ["%d expressions, %d mismatches" % (report["cases"], report["mismatches"]), "",
+             "%-12s %14s %9s" % ("path", "expressions/s", "relative")]
+    for name, value in throughput.items():
+        lines.append("%-12s %14.0f %8.2fx" % (name, value, value / referenceThroughput))
+    for failure in report["failures"]:
+        lines.append("")
+        lines.append("Mismatch: " + failure["expression"] + "   (Python: " + failure["pythonExpression"] + ")")
+        lines.append("  shrunk from: " + failure["original"])
+        for name, value in failure["values"].items():
+            lines.append("  %-12s %r" % (name, value))
+    return "\n".join(lines)
+
+
+def main(arguments=None):
+    argumentParser = argparse.ArgumentParser(
+        description="Compares every way of evaluating random expressions with each other and with Python.")
+    argumentParser.add_argument("--cases", type=int, default=100000, help="the number of random expressions")
+    argumentParser.add_argument("--seed", type=int, default=0, help="the seed of the random expressions")
+    argumentParser.add_argument("--depth", type=int, default=4,
+                                help="the maximum number of nested operations of an expression")
+    parsedArguments = argumentParser.parse_args(arguments)
+    report = fuzz(parsedArguments.cases, parsedArguments.seed, parsedArguments.depth)
+    print(formatReport(report))
+    return 1 if report["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
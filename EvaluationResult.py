@@ -0,0 +1,72 @@
+class EvaluationResult:
+    """
+    The outcome of evaluating one expression: either its value or the kind of error that
+    prevented it. A lightweight alternative to catching the errors in CalculatorErrors,
+    e.g. for batch evaluation.
+
+    ...
+
+    Attributes
+    ----------
+    value : Integer or Float
+        The result of the expression, or None if there was an error.
+    errorCode : str
+        The code of the error (see CalculatorErrors), or None if there was none.
+    errorPosition : int
+        The index in the expression where the error was found, or None.
+    errorMessage : str
+        The message of the error, or None if there was none.
+
+    Methods
+    -------
+    fromError(error)
+        Creates the result for an exception.
+
+    """
+
+    __slots__ = ("value", "errorCode", "errorPosition", "errorMessage")
+
+    def __init__(self, value=None, errorCode=None, errorPosition=None, errorMessage=None):
+        self.value = value
+        self.errorCode = errorCode
+        self.errorPosition = errorPosition
+        self.errorMessage = errorMessage
+
+    def __repr__(self):
+        if self.errorCode is None:
+            return "EvaluationResult(value=" + repr(self.value) + ")"
+        return "EvaluationResult(errorCode=" + repr(self.errorCode) + ", errorPosition=" \
+            + repr(self.errorPosition) + ")"
+
+    def __eq__(self, other):
+        if not isinstance(other, EvaluationResult):
+            return NotImplemented
+        return (self.value, self.errorCode, self.errorPosition, self.errorMessage) == \
+            (other.value, other.errorCode, other.errorPosition, other.errorMessage)
+
+    __hash__ = None
+
+    @property
+    def isError(self):
+        """
+        Whether the expression could not be evaluated.
+        """
+        return self.errorCode is not None
+
+    @classmethod
+    def fromError(cls, error):
+        """
+        Creates the result for an exception raised while parsing or evaluating.
+
+        Parameters
+        ----------
+        error : Exception
+            The exception. Errors that are not a CalculatorError get the code
+            "UNEXPECTED_ERROR".
+
+        Returns
+        ------
+        result : EvaluationResult
+            A result without a value.
+        """
+        return cls(None, getattr(error, "code", "UNEXPECTED_ERROR"), getattr(error, "position", None), str(error))
@@ -0,0 +1,166 @@
+from collections import OrderedDict
+
+
+class ExpressionCache:
+    """
+    A bounded cache that remembers the most recently used results of parsing or
+    evaluating expressions. When it is full, the least recently used entry is evicted.
+
+    ...
+
+    Attributes
+    ----------
+    maxSize : int
+        The maximum number of entries the cache holds.
+    hits : int
+        The number of lookups that found an entry.
+    misses : int
+        The number of lookups that did not find an entry.
+    evictions : int
+        The number of entries that were evicted to make room for new ones.
+
+    Methods
+    -------
+    normalize(expression)
+        Returns the key under which an infix expression is cached.
+
+    get(key, default)
+        Returns the entry stored under key and marks it as most recently used.
+
+    put(key, value)
+        Stores value under key, evicting the least recently used entry if needed.
+
+    clear()
+        Removes all entries and resets the counters.
+
+    statistics()
+        Returns the size of the cache and its counters as a dictionary.
+
+    """
+
+    def __init__(self, maxSize=1024):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        maxSize : int
+            The maximum number of entries the cache holds.
+        """
+        if maxSize < 1:
+            raise ValueError("The maximum size of the cache has to be at least 1.")
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def normalize(expression):
+        """
+        Returns the key under which an infix expression is cached. Whitespaces are
+        removed where they cannot change how the expression is tokenized. A whitespace
+        between two letters, digits or points (as in "ab s(1)") or between two operator
+        characters (as in "4 / / 2") separates tokens, so a single one is kept there.
+
+        Parameters
+        ----------
+        expression : str
+            An arithmetic expression in infix notation.
+
+        Returns
+        ------
+        key : str
+            The expression without the whitespaces that carry no meaning.
+        """
+        if " " not in expression:
+            return expression
+        parts = [part for part in expression.split(" ") if part]
+        key = parts[:1]
+        for part in parts[1:]:
+            kind = _characterKind(part[0])
+            if kind and kind == _characterKind(key[-1][-1]):
+                key.append(" ")
+            key.append(part)
+        return "".join(key)
+
+    def get(self, key, default=None):
+        """
+        Returns the entry stored under key and marks it as most recently used.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        default : object
+            The value to return if there is no entry for key.
+
+        Returns
+        ------
+        value : object
+            The entry stored under key, or default if there is none.
+        """
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """
+        Stores value under key. If the cache is full, the least recently used entry
+        is evicted first.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        value : object
+            The value to store.
+        """
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.maxSize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = value
+
+    def clear(self):
+        """
+        Removes all entries and resets the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def statistics(self):
+        """
+        Returns the size of the cache and its counters.
+
+        Returns
+        ------
+        statistics : dict
+            The keys are "size", "maxSize", "hits", "misses" and "evictions".
+        """
+        return {"size": len(self._entries), "maxSize": self.maxSize, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+def _characterKind(character):
+    """
+    Returns 1 for the characters of numbers and names, 2 for the characters of operators
+    and 0 for parentheses and commas, which never become part of another token.
+    """
+    if character.isalnum() or character in "._":
+        return 1
+    return 0 if character in "()," else 2
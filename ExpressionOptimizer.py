@@ -0,0 +1,213 @@
+"""
+This file simplifies expressions in postfix notation before they are evaluated. It can
+also report how much it simplifies a file of expressions (one per line), e.g.
+
+    python3 ExpressionOptimizer.py formulas.txt
+"""
+
+import sys
+
+from InputParser import FUNCTION, NUMBER, OPERATOR, UNARY_OPERATOR
+from OperatorRegistry import defaultRegistry
+
+
+class ExpressionOptimizer:
+    """
+    Simplifies the postfix tuples of a compiled expression once, so that the work is not
+    repeated every time the expression is evaluated. Operators and functions whose
+    operands are all numbers are folded into a number (e.g. "(2*3.5+1) * x" becomes
+    "8.0 * x" and "sqrt(2) * x" becomes "1.4142135623730951 * x") and
+    operations that leave their other operand unchanged are removed (x * 1, 1 * x, x + 0,
+    0 + x and x - 0). Postfix notation has no parentheses, so redundant groups
+    need no extra work: they are gone by the time the optimizer runs.
+
+    Operations that would raise an error (e.g. 1 / 0) are not folded, so the error is
+    still raised when the expression is evaluated. Only integer identities are removed,
+    because x + 0.0 turns an integer x into a float. For the same reason x / 1 is kept:
+    it turns an integer x into a float (or a Fraction).
+
+    ...
+
+    Attributes
+    ----------
+    registry : OperatorRegistry
+        Tells how many operands every operator and function takes.
+    expressions : int
+        The number of expressions optimized.
+    operationsBefore : int
+        The number of operations in the expressions before they were optimized.
+    operationsAfter : int
+        The number of operations in the expressions after they were optimized.
+
+    Methods
+    -------
+    optimize(postfix, operatorFunctions)
+        Returns the simplified postfix tuples of an expression.
+
+    statistics()
+        Returns the counters as a dictionary.
+
+    reset()
+        Sets the counters back to zero.
+
+    """
+
+    leftIdentities = {"*": 1, "+": 0}
+    rightIdentities = {"*": 1, "+": 0, "-": 0}
+
+    def __init__(self, operatorFunctions, registry=None):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        operatorFunctions : dict
+            Maps the name of every operator and function to the function that applies it.
+        registry : OperatorRegistry
+            The registry of the operators and functions (the default one if left out).
+        """
+        self.operatorFunctions = operatorFunctions
+        self.registry = registry if registry is not None else defaultRegistry
+        self.expressions = 0
+        self.operationsBefore = 0
+        self.operationsAfter = 0
+
+    def optimize(self, postfix, operatorFunctions=None):
+        """
+        Folds constant operations and removes identities in a single pass over the postfix
+        tuples. Every operand on the stack is a contiguous run of the output, so only the
+        start of every run and whether it is a number have to be tracked.
+
+        Parameters
+        ----------
+        postfix : sequence
+            The (kind, value, position) tuples of the expression in postfix order, as
+            stored in CompiledExpression.postfix.
+        operatorFunctions : dict
+            The functions the expression is evaluated with (see NumericBackend), so
+            numbers are folded the same way. The ones of the optimizer are used if left out.
+
+        Returns
+        ------
+        postfix : tuple
+            The simplified (kind, value, position) tuples.
+        """
+        if operatorFunctions is None:
+            operatorFunctions = self.operatorFunctions
+        leftIdentities = self.leftIdentities
+        rightIdentities = self.rightIdentities
+        arities = self.registry.arities
+        output = []
+        # (start of the operand in output, whether the operand is a single number)
+        operandStack = []
+        operationsBefore = 0
+        for token in postfix:
+            kind = token[0]
+            if kind not in _OPERATIONS:
+                operandStack.append((len(output), kind == NUMBER))
+                output.append(token)
+                continue
+            operationsBefore += 1
+            symbol = token[1]
+            if kind != OPERATOR:
+                # Operators in front of their operand and functions are only folded.
+                arity = arities[symbol]
+                operands = operandStack[-arity:]
+                start = operands[0][0]
+                del operandStack[len(operandStack) - arity + 1:]
+                if all([isNumber for operandStart, isNumber in operands]):
+                    try:
+                        value = operatorFunctions[symbol](*[output[operandStart][1]
+                                                            for operandStart, isNumber in operands])
+                    except (ArithmeticError, ValueError):
+                        pass
+                    else:
+                        output[start:] = [(NUMBER, value, output[start][2])]
+                        operandStack[-1] = (start, True)
+                        continue
+                output.append(token)
+                operandStack[-1] = (start, False)
+                continue
+            rightStart, rightIsNumber = operandStack.pop()
+            leftStart, leftIsNumber = operandStack[-1]
+            if leftIsNumber and rightIsNumber:
+                left = output[leftStart]
+                try:
+                    value = operatorFunctions[symbol](left[1], output[rightStart][1])
+                except (ArithmeticError, ValueError):
+                    pass
+                else:
+                    output[leftStart:] = [(NUMBER, value, left[2])]
+                    continue
+            if rightIsNumber and _isIdentity(output[rightStart][1], rightIdentities.get(symbol)):
+                del output[rightStart]
+            elif leftIsNumber and _isIdentity(output[leftStart][1], leftIdentities.get(symbol)):
+                del output[leftStart]
+                operandStack[-1] = (leftStart, rightIsNumber)
+            else:
+                output.append(token)
+                operandStack[-1] = (leftStart, False)
+
+        self.expressions += 1
+        self.operationsBefore += operationsBefore
+        self.operationsAfter += sum([1 for token in output if token[0] in _OPERATIONS])
+        return tuple(output)
+
+    def statistics(self):
+        """
+        Returns the counters of the optimizer.
+
+        Returns
+        ------
+        statistics : dict
+            The number of "expressions" optimized, the number of operations before and
+            after optimizing them and the number of operations "eliminated".
+        """
+        return {"expressions": self.expressions, "operationsBefore": self.operationsBefore,
+                "operationsAfter": self.operationsAfter,
+                "eliminated": self.operationsBefore - self.operationsAfter}
+
+    def reset(self):
+        """
+        Sets the counters back to zero.
+        """
+        self.expressions = 0
+        self.operationsBefore = 0
+        self.operationsAfter = 0
+
+
+# The kinds of tokens that take their operands from the stack.
+_OPERATIONS = frozenset([OPERATOR, UNARY_OPERATOR, FUNCTION])
+
+
+def _isIdentity(value, identity):
+    return identity is not None and type(value) is int and value == identity
+
+
+def main(arguments=None):
+    from Calculator import Calculator
+    from CalculatorErrors import CalculatorError
+    from InputParser import InputParser
+    from RunMe import readLines
+
+    optimizer = ExpressionOptimizer(Calculator.operatorFunctions)
+    inputParser = InputParser(optimizer=optimizer)
+    failures = 0
+    for line in readLines(sys.argv[1:] if arguments is None else arguments):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            inputParser.compile(line)
+        except CalculatorError:
+            failures += 1
+    statistics = optimizer.statistics()
+    print("Expressions: %d (%d could not be parsed)" % (statistics["expressions"], failures))
+    print("Operations:  %d before, %d after, %d eliminated" % (statistics["operationsBefore"],
+                                                                statistics["operationsAfter"],
+                                                                statistics["eliminated"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,726 @@
+"""
+Incremental parsing for editors and interactive sessions, where an expression changes a
+little at a time. After an edit, only the terms around the edited text are parsed again
+and only the values of the parenthesized groups around it are computed again, e.g.
+
+    incrementalParser = IncrementalParser()
+    state = incrementalParser.parse("(1 + 2) * 3.5")
+    state = incrementalParser.edit(state, 5, 1, "4")  # "(1 + 4) * 3.5"
+    state.evaluate()  # 17.5
+
+Expressions that use operators other than +, -, * and / (with the same precedence), or
+functions, are parsed and evaluated as a whole instead.
+"""
+
+import bisect
+import itertools
+import operator
+
+from CalculatorErrors import ArithmeticEvaluationError, CalculatorError, DivisionByZeroError, \
+    EmptyExpressionError, InvalidInputError, UnboundVariableError, arithmeticErrorMessage
+from EvaluationResult import EvaluationResult
+from InputParser import InputParser, LEFT_PARENTHESIS, NUMBER, OPERATOR, RIGHT_PARENTHESIS, VARIABLE
+from NumericBackend import defaultBackend
+
+
+class _Term:
+    """
+    A product like "2 * x / (1 + y)": factors joined by * and /. Every factor is a
+    (kind, value, offset) tuple, where kind is NUMBER, VARIABLE or LEFT_PARENTHESIS (for a
+    parenthesized _Group) and offset is the position of the factor in its piece of text.
+    A term that could not be parsed has no factors and a syntaxFailure instead.
+    """
+
+    __slots__ = ("factors", "operators", "lengths", "value", "failure", "syntaxFailure")
+
+
+class _Group:
+    """
+    A sum like "a - 2 * b + 1" (the whole expression or the inside of a pair of
+    parentheses): terms joined by + and -. lengths holds the length of the text of every
+    term, so the operator after term i is at sum(lengths[:i + 1]) + i.
+    """
+
+    __slots__ = ("terms", "operators", "lengths", "length", "value", "failure", "syntaxFailure")
+
+
+class _Whole:
+    """
+    An expression that cannot be split into terms and factors (e.g. because it uses ^
+    or functions), parsed and evaluated as a whole. postfix is None if it could not be
+    parsed.
+    """
+
+    __slots__ = ("postfix", "value", "failure", "syntaxFailure")
+
+
+class _UnsupportedSyntax(Exception):
+    """
+    Raised by _parseRegion() for tokens that terms and factors cannot hold.
+    """
+
+
+class _Frame:
+    """
+    An open group while _parseRegion() reads the tokens inside it.
+    """
+
+    __slots__ = ("terms", "termOperators", "termLengths", "termStart", "factors", "factorOperators",
+                 "factorLengths", "factorStart", "parenthesisOffset")
+
+    def __init__(self, start, parenthesisOffset=None):
+        self.terms, self.termOperators, self.termLengths = [], [], []
+        self.factors, self.factorOperators, self.factorLengths = [], [], []
+        self.termStart = self.factorStart = start
+        self.parenthesisOffset = parenthesisOffset
+
+
+def _brokenTerm(error):
+    """
+    Returns a term for text that could not be parsed because of error.
+    """
+    term = _Term()
+    term.factors = term.operators = term.lengths = term.value = term.failure = None
+    term.syntaxFailure = (type(error), str(error), error.position)
+    return term
+
+
+def _shift(failure, offset):
+    """
+    Moves the position of a failure (an (errorClass, message, position) tuple) by offset.
+    """
+    return failure[0], failure[1], failure[2] + offset
+
+
+class ParseState:
+    """
+    An expression parsed by an IncrementalParser, together with its result. Instances are
+    immutable and share everything that an edit did not change with the state they were
+    edited from, so older states stay valid (e.g. for undo).
+
+    ...
+
+    Attributes
+    ----------
+    text : str
+        The expression.
+    result : EvaluationResult
+        The value of the expression without any variables, or the first error in it.
+
+    Methods
+    -------
+    evaluate(bindings)
+        Returns the value of the expression or raises its error.
+
+    postfix()
+        Returns the expression in postfix notation as (kind, value, position) tuples.
+
+    compile()
+        Returns the expression as a CompiledExpression.
+
+    """
+
+    __slots__ = ("text", "result", "_root", "_incrementalParser", "_compiledExpression")
+
+    def __init__(self, text, root, incrementalParser):
+        self.text = text
+        self._root = root
+        self._incrementalParser = incrementalParser
+        self._compiledExpression = None
+        failure = self._failure()
+        if failure is None:
+            self.result = EvaluationResult(root.value)
+        else:
+            self.result = EvaluationResult(None, failure[0].code, failure[2], failure[1])
+
+    def __repr__(self):
+        return "ParseState(" + repr(self.text) + ", " + repr(self.result) + ")"
+
+    def _failure(self):
+        if not self.text:
+            return EmptyExpressionError, "Empty expression. Please enter a valid arithmetic expression.", None
+        root = self._root
+        return root.syntaxFailure if root.syntaxFailure is not None else root.failure
+
+    def evaluate(self, bindings=None):
+        """
+        Returns the value of the expression. Without bindings, the value was already
+        computed by the edit; with bindings, the expression is compiled and evaluated.
+
+        Parameters
+        ----------
+        bindings : Mapping
+            Maps the name of every variable of the expression to its value.
+
+        Returns
+        ------
+            Result : Integer or Float
+                The result of evaluating the arithmetic expression.
+
+        Raises
+        ------
+        CalculatorError
+            The first error in the expression, just like InputParser.compile() and
+            CompiledExpression.evaluate() would raise it.
+        """
+        if bindings is not None and self._root.syntaxFailure is None and self.text:
+            return self.compile().evaluate(bindings)
+        failure = self._failure()
+        if failure is not None:
+            raise failure[0](failure[1], failure[2])
+        return self._root.value
+
+    def postfix(self):
+        """
+        Returns the expression in postfix notation, assembled from the parsed groups
+        without running the shunting yard algorithm again.
+
+        Returns
+        ------
+        postfix : tuple
+            (kind, value, position) tuples like CompiledExpression.postfix.
+
+        Raises
+        ------
+        CalculatorError
+            If the expression is empty or cannot be parsed.
+        """
+        syntaxFailure = self._root.syntaxFailure if self.text else self._failure()
+        if syntaxFailure is not None:
+            raise syntaxFailure[0](syntaxFailure[1], syntaxFailure[2])
+        if self._root.__class__ is _Whole:
+            return self._root.postfix
+        postfix = []
+        # Nodes are expanded from an explicit stack, so any nesting depth works.
+        stack = [(self._root, 0)]
+        while stack:
+            item = stack.pop()
+            node = item[0]
+            if node.__class__ is _Group:
+                start = item[1]
+                starts = [start]
+                for length in node.lengths:
+                    start += length + 1
+                    starts.append(start)
+                for i in range(len(node.terms) - 1, 0, -1):
+                    stack.append((OPERATOR, node.operators[i - 1], starts[i] - 1))
+                    stack.append((node.terms[i], starts[i]))
+                stack.append((node.terms[0], starts[0]))
+            elif node.__class__ is _Term:
+                start = item[1]
+                items = []
+                for k, (kind, value, offset) in enumerate(node.factors):
+                    if k > 0:
+                        items.append((OPERATOR, node.operators[k - 1], start - 1))
+                    if kind == LEFT_PARENTHESIS:
+                        items.append((value, start + offset + 1))
+                    else:
+                        items.append((kind, value, start + offset))
+                    start += node.lengths[k] + 1
+                # Every operator follows its right operand, so swap each one with it.
+                for k in range(1, len(items) - 1, 2):
+                    items[k], items[k + 1] = items[k + 1], items[k]
+                stack.extend(reversed(items))
+            else:
+                postfix.append(item)
+        return tuple(postfix)
+
+    def compile(self):
+        """
+        Returns the expression as a CompiledExpression, e.g. to evaluate it with many
+        bindings.
+
+        Returns
+        ------
+        compiledExpression : CompiledExpression
+            The same expression InputParser.compile() returns for the text.
+        """
+        if self._compiledExpression is None:
+            from CompiledExpression import CompiledExpression
+
+            incrementalParser = self._incrementalParser
+            operatorFunctions = incrementalParser.operatorFunctions
+            postfix = self.postfix()
+            optimizer = incrementalParser.inputParser.optimizer
+            if optimizer is not None:
+                postfix = optimizer.optimize(postfix, operatorFunctions)
+            self._compiledExpression = CompiledExpression(postfix, operatorFunctions, incrementalParser.backend,
+                                                          incrementalParser.inputParser.registry)
+        return self._compiledExpression
+
+
+class IncrementalParser:
+    """
+    Parses an expression once and then keeps it up to date with small edits. The
+    expression is kept as a tree of parenthesized groups, every group as a list of terms
+    joined by + and - and every term as a list of factors joined by * and /, together
+    with the value of every term and group. This is the same structure the shunting
+    yard algorithm builds, since + and - are evaluated after * and /.
+
+    An edit only parses the terms it touches again, inside the innermost group that
+    contains it, and only computes the values of the groups around it again. Edits that
+    add or remove parentheses parse the innermost group around them again, and, as long
+    as the parentheses are not balanced, the whole expression. So an edit takes time in
+    proportion to the number of terms and the depth of the groups around it, not to the
+    length of the expression. Expressions with other operators (like ^ or //) or with
+    functions are parsed as a whole after every edit, and so is every expression if the
+    inputParser has ResourceLimits, which are checked for the whole text. The results
+    are always the same as InputParser.compile() and CompiledExpression.evaluate() give
+    for the new text (which has to be the expression itself, not a "calculate" query).
+
+    ...
+
+    Attributes
+    ----------
+    inputParser : InputParser
+        The parser used to tokenize the edited text.
+    allowVariables : bool
+        Whether the expression may use variables.
+    backend : NumericBackend
+        The numeric backend the expression is evaluated with.
+    operatorFunctions : Mapping
+        The functions the operators are applied with (see OperatorRegistry.functionsFor()).
+
+    Methods
+    -------
+    parse(text)
+        Parses a whole expression.
+
+    edit(state, offset, deletedLength, insertedText)
+        Applies an edit to a parsed expression.
+
+    update(state, text)
+        Applies the edit that turns the text of a parsed expression into text.
+
+    """
+
+    def __init__(self, inputParser=None, allowVariables=True):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        inputParser : InputParser
+            The parser used to tokenize the text. Its numeric backend and optimizer are
+            used as well. A new one is created if left out.
+        allowVariables : bool
+            Whether the expression may use variables.
+        """
+        self.inputParser = inputParser if inputParser is not None else InputParser()
+        self.allowVariables = allowVariables
+        self.backend = self.inputParser.backend if self.inputParser.backend is not None else defaultBackend
+        registry = self.inputParser.registry
+        self.operatorFunctions = registry.functionsFor(self.backend.operatorFunctions)
+        if self.inputParser.limits is not None:
+            self.operatorFunctions = self.inputParser.limits.guard(self.operatorFunctions)
+        # Only operators of one character with the precedence of * (or of +) that are
+        # applied from left to right fit into factors (or terms).
+        self._factorOperators = self._operatorsLike("*", registry)
+        self._termOperators = self._operatorsLike("+", registry)
+
+    def parse(self, text):
+        """
+        Parses a whole expression.
+
+        Parameters
+        ----------
+        text : str
+            The arithmetic expression.
+
+        Returns
+        ------
+        state : ParseState
+            The parsed expression and its result.
+        """
+        if self.inputParser.limits is not None:
+            return ParseState(text, self._parseWhole(text), self)
+        try:
+            return ParseState(text, self._parseGroup(text), self)
+        except _UnsupportedSyntax:
+            return ParseState(text, self._parseWhole(text), self)
+
+    def edit(self, state, offset, deletedLength, insertedText):
+        """
+        Replaces deletedLength characters at offset in the text of state by insertedText.
+
+        Parameters
+        ----------
+        state : ParseState
+            The parsed expression before the edit. It is not changed.
+        offset : int
+            The index of the first character that is replaced.
+        deletedLength : int
+            The number of characters that are replaced.
+        insertedText : str
+            The text that replaces them.
+
+        Returns
+        ------
+        state : ParseState
+            The parsed expression after the edit and its result.
+        """
+        text = state.text
+        editEnd = offset + deletedLength
+        if offset < 0 or deletedLength < 0 or editEnd > len(text):
+            raise ValueError("The edit is outside of the expression.")
+        newText = text[:offset] + insertedText + text[editEnd:]
+        if state._root.__class__ is _Whole:
+            return self.parse(newText)
+        try:
+            return self._editGroups(state, offset, editEnd, newText, insertedText)
+        except _UnsupportedSyntax:
+            return ParseState(newText, self._parseWhole(newText), self)
+
+    def _editGroups(self, state, offset, editEnd, newText, insertedText):
+        """
+        Applies an edit to an expression that is kept as a tree of groups (see edit()).
+        """
+        text = state.text
+        deletedLength = editEnd - offset
+        delta = len(insertedText) - deletedLength
+        changesParentheses = "(" in insertedText or ")" in insertedText or "(" in text[offset:editEnd] \
+            or ")" in text[offset:editEnd]
+
+        # Find the innermost group whose inside contains the whole edit.
+        path = []
+        group = state._root
+        base = 0
+        while True:
+            ends = self._pieceEnds(group.lengths, base)
+            first = bisect.bisect_left(ends, offset)
+            if first == len(ends) or bisect.bisect_left(ends, editEnd) != first:
+                break
+            term = group.terms[first]
+            if term.factors is None:
+                break
+            termStart = ends[first] - group.lengths[first]
+            factorEnds = self._pieceEnds(term.lengths, termStart)
+            k = bisect.bisect_left(factorEnds, offset)
+            kind, child, parenthesisOffset = term.factors[k]
+            if kind != LEFT_PARENTHESIS:
+                break
+            contentStart = factorEnds[k] - term.lengths[k] + parenthesisOffset + 1
+            if offset < contentStart or editEnd > contentStart + child.length:
+                break
+            path.append((group, base, first, k))
+            group = child
+            base = contentStart
+
+        # Parse the edited part of that group again, or the whole group (and the groups
+        # around it, as long as the parentheses are not balanced) if parentheses changed.
+        while True:
+            if not changesParentheses:
+                group = self._reparseTerms(group, ends, newText, offset, editEnd, delta)
+                break
+            content = newText[base:base + group.length + delta]
+            if path and not self._isBalanced(content):
+                group, base = path.pop()[:2]
+                continue
+            group = self._parseGroup(content)
+            break
+
+        # Update the groups around the edit, from the inside out.
+        while path:
+            parent, base, first, k = path.pop()
+            term = parent.terms[first]
+            factors = list(term.factors)
+            factors[k] = (LEFT_PARENTHESIS, group, factors[k][2])
+            lengths = list(term.lengths)
+            lengths[k] += delta
+            terms = list(parent.terms)
+            terms[first] = self._newTerm(factors, term.operators, lengths)
+            termLengths = list(parent.lengths)
+            termLengths[first] += delta
+            group = self._newGroup(terms, parent.operators, termLengths)
+        return ParseState(newText, group, self)
+
+    def update(self, state, text):
+        """
+        Applies the edit that turns the text of state into text. The edit is found by
+        comparing the texts from both ends, so everything between the first and the last
+        changed character is treated as edited.
+
+        Parameters
+        ----------
+        state : ParseState
+            The parsed expression before the edit.
+        text : str
+            The new text of the expression.
+
+        Returns
+        ------
+        state : ParseState
+            The parsed expression for text and its result.
+        """
+        oldText = state.text
+        if text == oldText:
+            return state
+        prefixLength = self._commonLength(oldText, text, False, min(len(oldText), len(text)))
+        suffixLength = self._commonLength(oldText, text, True, min(len(oldText), len(text)) - prefixLength)
+        return self.edit(state, prefixLength, len(oldText) - prefixLength - suffixLength,
+                         text[prefixLength:len(text) - suffixLength])
+
+    @staticmethod
+    def _operatorsLike(symbol, registry):
+        precedence = registry.precedences.get(symbol)
+        return frozenset(other for other, definition in registry.binaryOperators.items()
+                         if len(other) == 1 and definition.precedence == precedence
+                         and not definition.rightAssociative)
+
+    def _parseWhole(self, text):
+        """
+        Parses and evaluates text as a whole, for expressions _parseRegion() cannot split.
+        """
+        from CompiledExpression import CompiledExpression
+
+        whole = _Whole()
+        whole.postfix = whole.value = whole.failure = whole.syntaxFailure = None
+        try:
+            whole.postfix = self.inputParser._convertedPostfix(text, self.allowVariables, self.backend)
+        except CalculatorError as error:
+            whole.syntaxFailure = (type(error), str(error), error.position)
+            return whole
+        try:
+            whole.value = CompiledExpression(whole.postfix, self.operatorFunctions, self.backend,
+                                             self.inputParser.registry).evaluate()
+        except CalculatorError as error:
+            whole.failure = (type(error), str(error), error.position)
+        return whole
+
+    @staticmethod
+    def _commonLength(text1, text2, fromEnd, maxLength):
+        """
+        Returns the length of the longest common prefix (or suffix) of both texts, using
+        a binary search over slice comparisons instead of comparing character by character.
+        """
+        low, high = 0, maxLength
+        while low < high:
+            middle = (low + high + 1) // 2
+            if fromEnd:
+                equal = text1[len(text1) - middle:] == text2[len(text2) - middle:]
+            else:
+                equal = text1[:middle] == text2[:middle]
+            if equal:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    @staticmethod
+    def _pieceEnds(lengths, start):
+        """
+        Returns the index right after every piece of text, where the pieces have the given
+        lengths, start at start and are separated by one operator character.
+        """
+        return list(map(operator.add, itertools.accumulate(lengths), itertools.count(start)))
+
+    @staticmethod
+    def _isBalanced(text):
+        if text.count("(") != text.count(")"):
+            return False
+        depth = 0
+        for character in text:
+            if character == "(":
+                depth += 1
+            elif character == ")":
+                depth -= 1
+                if depth < 0:
+                    return False
+        return True
+
+    def _reparseTerms(self, group, ends, newText, offset, editEnd, delta):
+        """
+        Parses the terms of group that the edit touches again and returns the new group.
+        ends holds the index right after every term of group (see _pieceEnds()).
+        If they cannot be parsed, the terms next to them are parsed along with them, since
+        e.g. a + or - may turn from an operator into a sign. If that fails too, the error
+        is kept as a term of its own, so the rest of the group is still not parsed again.
+        """
+        terms = group.terms
+        first = bisect.bisect_left(ends, offset)
+        last = bisect.bisect_left(ends, editEnd)
+        # Terms that could not be parsed are parsed again along with their neighbors.
+        while first > 0 and terms[first - 1].factors is None:
+            first -= 1
+        while last < len(terms) - 1 and terms[last + 1].factors is None:
+            last += 1
+        for extension in (0, 1):
+            if extension and first == 0 and last == len(terms) - 1:
+                break
+            first = max(first - extension, 0)
+            last = min(last + extension, len(terms) - 1)
+            regionStart = ends[first] - group.lengths[first]
+            region = newText[regionStart:ends[last] + delta]
+            try:
+                regionTerms, regionOperators, regionLengths = self._parseRegion(region)
+                break
+            except CalculatorError as error:
+                regionTerms, regionOperators, regionLengths = [_brokenTerm(error)], [], [len(region)]
+        newTerms = terms[:first] + regionTerms + terms[last + 1:]
+        newOperators = group.operators[:first] + regionOperators + group.operators[last:]
+        newLengths = group.lengths[:first] + regionLengths + group.lengths[last + 1:]
+        return self._newGroup(newTerms, newOperators, newLengths)
+
+    def _parseGroup(self, text):
+        """
+        Parses text as the inside of a group. If it cannot be parsed, the group holds the
+        error as its only term.
+        """
+        try:
+            terms, operators, lengths = self._parseRegion(text)
+        except CalculatorError as error:
+            terms, operators, lengths = [_brokenTerm(error)], [], [len(text)]
+        return self._newGroup(terms, operators, lengths)
+
+    def _parseRegion(self, text):
+        """
+        Tokenizes text, which has to be one or more whole terms, and builds its terms, the
+        operators between them and their lengths. Nested groups are built (and their
+        values computed) as soon as their closing parenthesis is read.
+
+        Raises
+        ------
+        CalculatorError
+            If text is not a valid expression.
+        _UnsupportedSyntax
+            If text uses operators or functions that terms and factors cannot hold.
+        """
+        tokens = self.inputParser.tokenize(text, self.allowVariables)
+        factorOperators = self._factorOperators
+        termOperators = self._termOperators
+        convert = int if "." not in text else self.backend.convert
+        frame = _Frame(0)
+        stack = []
+        for kind, tokenText, position in tokens:
+            if kind == NUMBER:
+                try:
+                    number = convert(tokenText)
+                except ValueError:
+                    raise InvalidInputError("The number " + tokenText[:20] + "... has too many digits.",
+                                            position) from None
+                frame.factors.append((NUMBER, number, position - frame.factorStart))
+            elif kind == VARIABLE:
+                frame.factors.append((VARIABLE, tokenText, position - frame.factorStart))
+            elif kind == OPERATOR:
+                frame.factorLengths.append(position - frame.factorStart)
+                if tokenText in factorOperators:
+                    frame.factorOperators.append(tokenText)
+                elif tokenText not in termOperators:
+                    raise _UnsupportedSyntax(tokenText)
+                else:
+                    frame.terms.append(self._newTerm(frame.factors, frame.factorOperators, frame.factorLengths))
+                    frame.termLengths.append(position - frame.termStart)
+                    frame.termOperators.append(tokenText)
+                    frame.termStart = position + 1
+                    frame.factors, frame.factorOperators, frame.factorLengths = [], [], []
+                frame.factorStart = position + 1
+            elif kind == LEFT_PARENTHESIS:
+                stack.append(frame)
+                frame = _Frame(position + 1, position - frame.factorStart)
+            elif kind != RIGHT_PARENTHESIS:
+                raise _UnsupportedSyntax(tokenText)
+            else:
+                group = self._newGroup(*self._closeFrame(frame, position))
+                parenthesisOffset = frame.parenthesisOffset
+                frame = stack.pop()
+                frame.factors.append((LEFT_PARENTHESIS, group, parenthesisOffset))
+        return self._closeFrame(frame, len(text))
+
+    def _closeFrame(self, frame, end):
+        frame.factorLengths.append(end - frame.factorStart)
+        frame.terms.append(self._newTerm(frame.factors, frame.factorOperators, frame.factorLengths))
+        frame.termLengths.append(end - frame.termStart)
+        return frame.terms, frame.termOperators, frame.termLengths
+
+    def _newTerm(self, factors, operators, lengths):
+        """
+        Creates a term and computes its value, from left to right like the postfix
+        program would, so the first error is the same one.
+        """
+        term = _Term()
+        term.factors, term.operators, term.lengths = factors, operators, lengths
+        term.value = term.failure = term.syntaxFailure = None
+        operatorFunctions = self.operatorFunctions
+        value = None
+        start = 0
+        for k, (kind, operand, offset) in enumerate(factors):
+            if k > 0:
+                start += lengths[k - 1] + 1
+            if kind == LEFT_PARENTHESIS:
+                if operand.syntaxFailure is not None:
+                    term.syntaxFailure = _shift(operand.syntaxFailure, start + offset + 1)
+                    return term
+                if operand.failure is not None:
+                    if term.failure is None:
+                        term.failure = _shift(operand.failure, start + offset + 1)
+                    continue
+                operand = operand.value
+            elif kind == VARIABLE:
+                if term.failure is None:
+                    term.failure = (UnboundVariableError, "Variable \"" + operand + "\" has no value.",
+                                    start + offset)
+                continue
+            if k == 0:
+                value = operand
+            elif term.failure is None:
+                try:
+                    value = operatorFunctions[operators[k - 1]](value, operand)
+                except ZeroDivisionError:
+                    term.failure = (DivisionByZeroError, "Division by zero.", start - 1)
+                except ArithmeticError as error:
+                    term.failure = (ArithmeticEvaluationError, arithmeticErrorMessage(error), start - 1)
+        term.value = value
+        return term
+
+    def _newGroup(self, terms, operators, lengths):
+        """
+        Creates a group and computes its value, from left to right like the postfix
+        program would.
+        """
+        group = _Group()
+        group.terms, group.operators, group.lengths = terms, operators, lengths
+        group.length = sum(lengths) + len(operators)
+        group.value = group.failure = group.syntaxFailure = None
+        if any(map(_getSyntaxFailure, terms)):
+            start = 0
+            for k, term in enumerate(terms):
+                if term.syntaxFailure is not None:
+                    group.syntaxFailure = _shift(term.syntaxFailure, start)
+                    return group
+                start += lengths[k] + 1
+        operatorFunctions = self.operatorFunctions
+        if not any(map(_getFailure, terms)):
+            # The common case, folded without looking at the positions.
+            values = map(_getValue, terms)
+            value = next(values)
+            try:
+                for function, operand in zip(map(operatorFunctions.__getitem__, operators), values):
+                    value = function(value, operand)
+                group.value = value
+                return group
+            except ArithmeticError:
+                pass
+        term = terms[0]
+        if term.failure is not None:
+            group.failure = term.failure
+            return group
+        value = term.value
+        start = lengths[0]
+        for k, symbol in enumerate(operators, 1):
+            term = terms[k]
+            if term.failure is not None:
+                group.failure = _shift(term.failure, start + 1)
+                return group
+            try:
+                value = operatorFunctions[symbol](value, term.value)
+            except ArithmeticError as error:
+                group.failure = (ArithmeticEvaluationError, arithmeticErrorMessage(error), start)
+                return group
+            start += lengths[k] + 1
+        group.value = value
+        return group
+
+
+_getValue = operator.attrgetter("value")
+_getFailure = operator.attrgetter("failure")
+_getSyntaxFailure = operator.attrgetter("syntaxFailure")
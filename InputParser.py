@@ -1,7 +1,29 @@
+from CalculatorErrors import CalculatorError, EmptyExpressionError, ExpressionSyntaxError, InvalidInputError
+from NumericBackend import defaultBackend
+from OperatorRegistry import defaultRegistry
+
+NUMBER = "number"
+VARIABLE = "variable"
+OPERATOR = "operator"
+UNARY_OPERATOR = "unary operator"
+FUNCTION = "function"
+LEFT_PARENTHESIS = "("
+RIGHT_PARENTHESIS = ")"
+COMMA = ","
+
+# Increase whenever the parser accepts other expressions or produces other programs, so
+# persistent caches written by an older version are not used anymore.
+PARSER_VERSION = 3
+
+
 class InputParser:
     """
     A helper class used to parse the user input. Assumes that the user input is in human readable (infix notation).
 
+    The lookup tables of the parser are built once, when it is created, and parsing keeps
+    all its state in local variables. A parser without a cache, instrumentation and
+    optimizer (whose counters are not locked) can be shared by any number of threads.
+
     ...
 
     Attributes
@@ -9,11 +31,26 @@ class InputParser:
     operands : str
         A string that lists all allowed operands (the decimal digits in this case).
     operators : str
-        A string that lists all allowed operators.
+        A string that lists all characters operators are written with.
     specialCharacters: str
-        A string that lists all allowed special characters (parentheses in this case).
+        A string that lists all allowed special characters (parentheses and commas in this case).
     precedence: Dictionary
         A dictionary that stores the precedence order of operators.
+    registry: OperatorRegistry
+        The operators and functions the expressions can use.
+    cache: ExpressionCache
+        The cache that parseInput() keeps its results in (None if there is none).
+    instrumentation: Instrumentation
+        Records the latency and errors of every stage (None if nothing is recorded).
+    optimizer: ExpressionOptimizer
+        Simplifies the expressions returned by compile() (None if they are not simplified).
+    backend: NumericBackend
+        The numeric backend compile() uses unless it is given another one (None for floats).
+    persistentCache: PersistentExpressionCache
+        A cache file of expressions that parseInput() and compile() do not parse again
+        (None if there is none).
+    limits: ResourceLimits
+        The budgets every expression is checked against (None if there are none).
 
 
     Methods
@@ -31,23 +68,76 @@ class InputParser:
     isOperand(token)
         Checks if a given token is an operand or an operator.
 
+    isVariable(token)
+        Checks if a given token is the name of a variable.
+
     infixToPostfix(infixExpression)
         Converts an arithmetic expression from infix to postfix notation.
 
+    tokenize(inputExpression, allowVariables)
+        Validates the inputExpression and splits it into typed tokens in a single pass.
+
+    tokensToPostfix(tokens)
+        Converts a list of typed tokens from infix to postfix order.
+
+    extractExpression(inputExpression)
+        Returns the arithmetic expression out of a query like "calculate \"1 + 2\"".
+
     parseInput(inputExpression)
         Checks the input for all kinds of errors and returns it in postfix notation
         if none are found.
 
+    compile(inputExpression, allowVariables, backend)
+        Parses the input once and returns it as a CompiledExpression, which may use variables.
+
+    compileBatch(inputExpressions, allowVariables, backend)
+        Compiles many expressions into a CompiledBatch that shares their common subexpressions.
+
     """
 
-    def __init__(self):
+    def __init__(self, cache=None, instrumentation=None, optimizer=None, backend=None, persistentCache=None,
+                 registry=None, limits=None):
         """
             Initializes the class variables.
+
+            Parameters
+            ----------
+            cache : ExpressionCache
+                An optional cache that parseInput() keeps its results in.
+            instrumentation : Instrumentation
+                An optional Instrumentation that records the "tokenize" and "toPostfix"
+                stages of parseInput() and compile().
+            optimizer : ExpressionOptimizer
+                An optional optimizer that folds constants and removes identities in the
+                expressions returned by compile().
+            backend : NumericBackend
+                The numeric backend compile() uses by default (floats if left out).
+            persistentCache : PersistentExpressionCache
+                An optional cache file of expressions that were parsed before, e.g. by
+                another process. Expressions found in it are not parsed again.
+            registry : OperatorRegistry
+                The operators and functions the expressions can use (the default ones
+                if left out).
+            limits : ResourceLimits
+                Optional budgets for untrusted expressions, which tokenize() checks and
+                the expressions returned by compile() are evaluated with.
         """
+        self.cache = cache
+        self.instrumentation = instrumentation
+        self.optimizer = optimizer
+        self.backend = backend
+        self.persistentCache = persistentCache
+        self.registry = registry if registry is not None else defaultRegistry
+        self.limits = limits
         self.operands = "0123456789."
-        self.operators = "+-*/"
-        self.specialCharacters = "() "
-        self.precedence = {"*": 3, "/": 3, "+": 2, "-": 2, "(": 1}
+        self.digits = "0123456789"
+        self.operators = self.registry.operatorCharacters
+        self.specialCharacters = "() ,"
+        self.precedence = self.registry.precedences
+        # Built once here instead of on every call of checkForInvalidInput() and isOperand().
+        self._validCharacters = frozenset(self.operators + self.operands + self.specialCharacters)
+        self._operandCharacters = frozenset(self.operands)
+        self._signedOperandCharacters = frozenset(self.operands + "+-")
 
     def checkForInvalidInput(self, inputExpression):
         """
@@ -66,11 +156,7 @@ class InputParser:
             If the inputExpression is valid.
         """
 
-        validCharacters = self.operators + self.operands + self.specialCharacters
-        for eachCharacter in inputExpression:
-            if eachCharacter not in validCharacters:
-                return True
-        return False
+        return not self._validCharacters.issuperset(inputExpression)
 
     def checkForSyntaxError(self, inputExpression):
         """
@@ -90,15 +176,26 @@ class InputParser:
             If the inputExpression does not have a syntax error.
         """
 
-        # Unbalanced parentheses.
-        if inputExpression.count("(") != inputExpression.count(")"):
+        # Empty input.
+        if len(inputExpression) == 0:
+            return True
+        # Unbalanced parentheses, or a closing parenthesis before its opening one.
+        depth = 0
+        for eachCharacter in inputExpression:
+            if eachCharacter == "(":
+                depth += 1
+            elif eachCharacter == ")":
+                depth -= 1
+                if depth < 0:
+                    return True
+        if depth != 0:
             return True
         # Last char is decimal.
         if inputExpression[len(inputExpression) - 1] == ".":
             return True
         else:
             # A digit does not immediately follow a decimal.
-            for i in range(len(inputExpression)):
+            for i in range(len(inputExpression) - 1):
                 if inputExpression[i] == ".":
                     if inputExpression[i + 1] not in "0123456789":
                         return True
@@ -119,7 +216,7 @@ class InputParser:
                     and inputExpression[i + 1] in self.operators:
                 return True
             else:
-                if inputExpression[i] in self.operators:
+                if inputExpression[i] in self.operators and i + 2 < len(inputExpression):
                     # Two operators next to each other but the second is * or /.
                     if inputExpression[i + 1] in "*/":
                         return True
@@ -140,11 +237,9 @@ class InputParser:
 
     def prettifyInputExpression(self, inputExpression):
         """
-        Prepares the input for conversion to postfix notation. Assumes input is valid
-        with no syntax error. Works in three steps 1) Split up whole expression into
-        operators and operands 2) Join + or - with operands to make signed
-        numbers (if any) 3) Concatenate the whole expression with each operator and operand
-        separated by a whitespace.
+        Prepares the input for conversion to postfix notation. The expression is split
+        up into tokens by tokenize() (which joins + or - with operands to make signed
+        numbers) and the tokens are concatenated with a whitespace between each of them.
 
         Parameters
         ----------
@@ -158,50 +253,8 @@ class InputParser:
 
         """
 
-        # removing all the whitespaces. Makes things easy.
-        inputExpression = inputExpression.replace(" ", "")
-        i = 0
-        splitUpInputExpression = []
-        while i < len(inputExpression):
-            # if char is operand then loop till the entire number is read.
-            if inputExpression[i] in self.operands:
-                operand = inputExpression[i]
-                i += 1
-                while i < len(inputExpression):
-                    if inputExpression[i] in self.operands:
-                        operand += inputExpression[i]
-                        i += 1
-                    else:
-                        break
-                splitUpInputExpression.append(operand)
-            else:
-                # else just add the operator as is.
-                splitUpInputExpression.append(inputExpression[i])
-                i += 1
-
-        prettyInputExpression = ""
-        # If first token is + or - then the number that follows is signed.
-        if splitUpInputExpression[0] in "+-":
-            prettyInputExpression += splitUpInputExpression[0]
-            i = 1
-        else:
-            i = 0
-        while i < len(splitUpInputExpression):
-            # If current token is + or - and it succeeds an operator
-            # then the number that follows is signed.
-            if splitUpInputExpression[i] in "+-" and \
-                    splitUpInputExpression[i-1] in self.operators \
-                    and self.isOperand(splitUpInputExpression[i+1]):
-                prettyInputExpression += splitUpInputExpression[i]
-                prettyInputExpression += splitUpInputExpression[i + 1]
-                prettyInputExpression += " "
-                i += 2
-            # Else the token is an operator or an unsigned operand.
-            else:
-                prettyInputExpression += splitUpInputExpression[i] + " "
-                i += 1
-        prettyInputExpression = prettyInputExpression.strip()
-
+        tokens = self.tokenize(inputExpression)
+        prettyInputExpression = " ".join([token[1] for token in tokens])
         return prettyInputExpression
 
     def isOperand(self, token):
@@ -221,19 +274,35 @@ class InputParser:
             If token is not operand.
         """
         if len(token) == 1:
-            if token in self.operands:
+            if token in self._operandCharacters:
                 return True
         elif len(token) > 1:
-            validChars = self.operands + '+-'
-            for eachChar in token:
-                if eachChar not in validChars:
-                    return False
-            return True
+            return self._signedOperandCharacters.issuperset(token)
+
+    def isVariable(self, token):
+        """
+        Check if a given token is the name of a variable. Names follow the same rules as
+        python identifiers (e.g. "price", "unit_cost" or "x2").
+
+        Parameters
+        ----------
+        token : str
+            A string that can either be an operand, a variable or an operator.
+
+        Returns
+        ------
+        True : bool
+            If token is the name of a variable.
+        False: bool
+            If token is not the name of a variable.
+        """
+        return token.isidentifier()
 
     def infixToPostfix(self, infixExpression):
         """
         Converts the inputExpression from infix notation to postfix notation using
-        the shunting yard algorithm. This method is adapted from an online tutorial
+        the shunting yard algorithm of tokensToPostfix(), after telling the kind of
+        every token apart with the registry. This method is adapted from an online tutorial
         (https://cutt.ly/czfwRLw).The online version of this code was very basic and
         I added the following things myself:
         1) Support for decimal numbers.
@@ -246,49 +315,409 @@ class InputParser:
         Parameters
         ----------
         infixExpression : str
-            The arithmetic expression that is input by the user in its infix form.
+            The arithmetic expression that is input by the user in its infix form, with
+            a whitespace between every two tokens (see prettifyInputExpression()).
 
         Returns
         ------
         postfixExpression : str
             The arithmetic expression that is input by the user in its postfix form.
 
+        Raises
+        ------
+        ExpressionSyntaxError
+            If a token is unknown or the parentheses are not balanced.
+        """
+
+        registry = self.registry
+        tokens = []
+        position = 0
+        for token in infixExpression.split(" "):  # prettified expression comes in handy here.
+            if token == "(":
+                kind = LEFT_PARENTHESIS
+            elif token == ")":
+                kind = RIGHT_PARENTHESIS
+            elif token == ",":
+                kind = COMMA
+            elif token in registry.functions:
+                kind = FUNCTION
+            elif token in registry.binaryOperators:
+                kind = OPERATOR
+            elif token in registry.arities:
+                kind = UNARY_OPERATOR
+            elif self.isOperand(token):
+                kind = NUMBER
+            elif self.isVariable(token):
+                kind = VARIABLE
+            else:
+                raise ExpressionSyntaxError("Syntax error. Please enter a valid arithmetic expression.", position)
+            tokens.append((kind, token, position))
+            position += len(token) + 1
+
+        postfixExpression = " ".join([token[1] for token in self.tokensToPostfix(tokens)])
+        return postfixExpression
+
+    def tokenize(self, inputExpression, allowVariables=False):
+        """
+        Splits the inputExpression into typed tokens in a single pass over its characters.
+        Checks for invalid characters and syntax errors on the way and folds a + or - into
+        the number that follows it wherever an operand is expected (e.g. at the start of
+        the expression or right after an operator), so -2 ^ 2 is (-2) ^ 2. Anywhere else
+        where an operand is expected, an operator of the registry that is written in
+        front of its operand is read (e.g. the minus of "-(1 + 2)" or "-x"). Whitespaces
+        are ignored, just like prettifyInputExpression() used to strip them, except that
+        they end a variable name and separate operators like "/ /".
+
+        Parameters
+        ----------
+        inputExpression : str
+            The arithmetic expression that is input by the user.
+        allowVariables : bool
+            Whether names of variables (see isVariable()) may be used as operands. Names
+            of functions can always be used.
+
+        Returns
+        ------
+        tokens : list
+            A list of (kind, text, position) tuples where kind is one of NUMBER, VARIABLE,
+            OPERATOR, UNARY_OPERATOR, FUNCTION, LEFT_PARENTHESIS, RIGHT_PARENTHESIS or
+            COMMA and position is the index of the token in the inputExpression. The text
+            of an operator is its name in postfix notation (see OperatorRegistry).
+
+        Raises
+        ------
+        InvalidInputError
+            If the inputExpression contains a character that is not allowed.
+        ExpressionSyntaxError
+            If the inputExpression is not in correct infix notation (which includes calling
+            a function with the wrong number of arguments). The position of the error is
+            the index of the first character that cannot be accepted.
+        ResourceLimitError
+            If the parser has limits and the inputExpression exceeds one of them.
+        """
+
+        limits = self.limits
+        if limits is not None:
+            limits.checkLength(inputExpression)
+        registry = self.registry
+        binaryOperators = registry.binaryOperators
+        prefixOperators = registry.prefixOperators
+        functions = registry.functions
+        longSymbols = registry.longSymbols
+        operatorCharacters = registry.operatorCharacters
+        digits = self.digits
+        tokens = []
+        length = len(inputExpression)
+        expectOperand = True
+        # One entry for every open parenthesis: None, or [name, number of arguments so far]
+        # if it belongs to a function call.
+        openParentheses = []
+        i = 0
+        while i < length:
+            character = inputExpression[i]
+            if character == " ":
+                i += 1
+            elif expectOperand:
+                if character == "(":
+                    tokens.append((LEFT_PARENTHESIS, character, i))
+                    openParentheses.append(None)
+                    i += 1
+                    continue
+                start = i
+                if character.isalpha() or character == "_":
+                    i += 1
+                    while i < length and (inputExpression[i].isalnum() or inputExpression[i] == "_"):
+                        i += 1
+                    name = inputExpression[start:i]
+                    if name in functions:
+                        while i < length and inputExpression[i] == " ":
+                            i += 1
+                        if i == length or inputExpression[i] != "(":
+                            self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                        tokens.append((FUNCTION, name, start))
+                        tokens.append((LEFT_PARENTHESIS, "(", i))
+                        openParentheses.append([name, 1])
+                        i += 1
+                        continue
+                    if not allowVariables:
+                        self._raiseUnexpectedCharacter(inputExpression, start, allowVariables)
+                    tokens.append((VARIABLE, name, start))
+                    expectOperand = False
+                    continue
+                hasWhitespace = False
+                if character in "+-" or character in prefixOperators:
+                    i += 1
+                    while i < length and inputExpression[i] == " ":
+                        hasWhitespace = True
+                        i += 1
+                    # A sign followed by a number is part of the number; otherwise the
+                    # character has to be an operator in front of its operand.
+                    if character not in "+-" or i == length or inputExpression[i] not in self.operands:
+                        if character not in prefixOperators:
+                            self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                        tokens.append((UNARY_OPERATOR, prefixOperators[character].name, start))
+                        continue
+                elif character not in self.operands:
+                    self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                # Loop till the entire number is read.
+                hasDecimal = False
+                while i < length:
+                    character = inputExpression[i]
+                    if character in digits:
+                        i += 1
+                    elif character == ".":
+                        # A digit has to immediately follow the one and only decimal.
+                        if hasDecimal or i + 1 == length or inputExpression[i + 1] not in digits:
+                            self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                        hasDecimal = True
+                        i += 2
+                    elif character == " ":
+                        hasWhitespace = True
+                        i += 1
+                    else:
+                        break
+                operand = inputExpression[start:i]
+                if hasWhitespace:
+                    operand = operand.replace(" ", "")
+                if operand[0] == "-" and self._bindsTighterThanMinus(inputExpression, i):
+                    # -2 ^ 2 is -(2 ^ 2), just like -x ^ 2, so the minus is not part of the number.
+                    tokens.append((UNARY_OPERATOR, prefixOperators["-"].name, start))
+                    tokens.append((NUMBER, operand[1:], inputExpression.index(operand[1], start + 1)))
+                else:
+                    tokens.append((NUMBER, operand, start))
+                expectOperand = False
+            elif character in operatorCharacters:
+                symbol = character
+                if character in longSymbols:
+                    for candidate in longSymbols[character]:
+                        if inputExpression.startswith(candidate, i):
+                            symbol = candidate
+                            break
+                if symbol not in binaryOperators:
+                    self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                tokens.append((OPERATOR, symbol, i))
+                expectOperand = True
+                i += len(symbol)
+            elif character == ")":
+                if not openParentheses:
+                    self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                call = openParentheses.pop()
+                if call is not None:
+                    function = functions[call[0]]
+                    if call[1] != function.arity and not function.variadic:
+                        self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                tokens.append((RIGHT_PARENTHESIS, character, i))
+                i += 1
+            elif character == ",":
+                # Commas only separate the arguments of a function call.
+                if not openParentheses or openParentheses[-1] is None:
+                    self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+                openParentheses[-1][1] += 1
+                tokens.append((COMMA, character, i))
+                expectOperand = True
+                i += 1
+            else:
+                self._raiseUnexpectedCharacter(inputExpression, i, allowVariables)
+
+        # Input only has whitespaces, ends with an operator or has unclosed parentheses.
+        if expectOperand or openParentheses:
+            self._raiseUnexpectedCharacter(inputExpression, length, allowVariables)
+        if limits is not None:
+            limits.checkTokens(tokens)
+        return tokens
+
+    def _bindsTighterThanMinus(self, inputExpression, position):
+        """
+        Returns whether the operator that follows a negative number at position binds
+        more tightly than a minus in front of an operand (like ^), so that the minus has
+        to be applied to its result instead of being part of the number.
+        """
+        registry = self.registry
+        minus = registry.prefixOperators.get("-")
+        length = len(inputExpression)
+        while position < length and inputExpression[position] == " ":
+            position += 1
+        if minus is None or position == length:
+            return False
+        symbol = inputExpression[position]
+        for candidate in registry.longSymbols.get(symbol, ()):
+            if inputExpression.startswith(candidate, position):
+                symbol = candidate
+                break
+        operator = registry.binaryOperators.get(symbol)
+        return operator is not None and operator.precedence > minus.precedence
+
+    def _raiseUnexpectedCharacter(self, inputExpression, position, allowVariables):
+        """
+        Raises the error for a character that tokenize() cannot accept at the given position.
+
+        Parameters
+        ----------
+        inputExpression : str
+            The arithmetic expression that is input by the user.
+        position : int
+            The index of the offending character (the length of the inputExpression if
+            the expression ended too early).
+        allowVariables : bool
+            Whether names of variables are allowed, which makes letters valid characters.
         """
+        if position < len(inputExpression):
+            character = inputExpression[position]
+            if character not in self.operators and character not in self.operands \
+                    and character not in self.specialCharacters \
+                    and not (allowVariables and (character.isalnum() or character == "_")):
+                raise InvalidInputError("Invalid input. Please enter a valid arithmetic expression.", position)
+        raise ExpressionSyntaxError("Syntax error. Please enter a valid arithmetic expression.", position)
+
+    def tokensToPostfix(self, tokens):
+        """
+        Converts a list of tokens from infix to postfix order using the shunting yard
+        algorithm. Works just like infixToPostfix() but on the typed tokens returned by
+        tokenize(), so no strings have to be split up or classified again. The
+        precedence and associativity of every operator are read from the registry.
+
+        A function call is followed by its arguments in postfix order, except that a
+        variadic function follows every argument after the first one (so max(a, b, c)
+        is "a b max c max" and max(a) is just "a").
+
+        Parameters
+        ----------
+        tokens : list
+            The (kind, text, position) tuples returned by tokenize().
 
+        Returns
+        ------
+        postfixTokens : list
+            The same tuples in postfix order, without the parentheses and commas.
+
+        Raises
+        ------
+        ExpressionSyntaxError
+            If the parentheses are not balanced, which tokenize() already rules out.
+        """
+
+        precedence = self.registry.precedences
+        rightAssociative = self.registry.rightAssociative
+        functions = self.registry.functions
+        # Holds operator and function tokens and, for every run of opening parentheses,
+        # just the number of parentheses in it, so "((((" costs one entry instead of one
+        # per level.
         operatorStack = []
-        postfixList = []
-        tokenList = infixExpression.split(" ")  # prettified expression comes in handy here.
-
-        for token in tokenList:
-            # Token is operand. Push it to the postfix list.
-            if self.isOperand(token):
-                postfixList.append(token)
-            elif token == '(':
-                operatorStack.append(token)
-            elif token == ')':
-                topOperator = operatorStack.pop()
+        postfixTokens = []
+        # The number of arguments read so far for every open function call.
+        argumentCounts = []
+
+        for token in tokens:
+            kind = token[0]
+            if kind == NUMBER or kind == VARIABLE:
+                postfixTokens.append(token)
+            elif kind == LEFT_PARENTHESIS:
+                if operatorStack and type(operatorStack[-1]) is int:
+                    operatorStack[-1] += 1
+                else:
+                    operatorStack.append(1)
+            elif kind == RIGHT_PARENTHESIS or kind == COMMA:
                 # Keep popping operators until opening parentheses is popped.
-                while topOperator != '(':
-                    postfixList.append(topOperator)
-                    topOperator = operatorStack.pop()
-
-            else:  # Token is an operator. Push it on the stack.
-                while (len(operatorStack) > 0) and \
-                        (self.precedence[operatorStack[len(operatorStack) - 1]] >= self.precedence[token]):
-                    postfixList.append(operatorStack.pop())
+                while operatorStack and type(operatorStack[-1]) is not int:
+                    postfixTokens.append(operatorStack.pop())
+                if not operatorStack:
+                    raise ExpressionSyntaxError("Syntax error. Please enter a valid arithmetic expression.",
+                                                token[2])
+                if kind == COMMA:
+                    if operatorStack[-1] != 1 or len(operatorStack) < 2 or operatorStack[-2][0] != FUNCTION:
+                        raise ExpressionSyntaxError("Syntax error. Please enter a valid arithmetic expression.",
+                                                    token[2])
+                    argumentCounts[-1] += 1
+                    if argumentCounts[-1] > 2 and functions[operatorStack[-2][1]].variadic:
+                        postfixTokens.append(operatorStack[-2])
+                elif operatorStack[-1] == 1:
+                    operatorStack.pop()
+                    # The parenthesis of a function call closes the call.
+                    if operatorStack and type(operatorStack[-1]) is not int and operatorStack[-1][0] == FUNCTION:
+                        function = operatorStack.pop()
+                        if argumentCounts.pop() > 1 or not functions[function[1]].variadic:
+                            postfixTokens.append(function)
+                else:
+                    operatorStack[-1] -= 1
+            elif kind == FUNCTION:
+                operatorStack.append(token)
+                argumentCounts.append(1)
+            elif kind == UNARY_OPERATOR:
+                # It has no left operand, so nothing on the stack is applied before it.
+                operatorStack.append(token)
+            else:
+                tokenPrecedence = precedence[token[1]]
+                if token[1] in rightAssociative:
+                    tokenPrecedence += 0.5
+                # Opening parentheses have the lowest precedence, so popping stops at them.
+                while operatorStack and type(operatorStack[-1]) is not int \
+                        and precedence[operatorStack[-1][1]] >= tokenPrecedence:
+                    postfixTokens.append(operatorStack.pop())
                 operatorStack.append(token)
 
         # There might still be operators left on the stack.
-        while len(operatorStack) > 0:
-            postfixList.append(operatorStack.pop())
+        while operatorStack:
+            topOperator = operatorStack.pop()
+            if type(topOperator) is int or topOperator[0] == FUNCTION:
+                raise ExpressionSyntaxError("Syntax error. Please enter a valid arithmetic expression.",
+                                            tokens[-1][2] + 1)
+            postfixTokens.append(topOperator)
+        return postfixTokens
+
+    def extractExpression(self, inputExpression):
+        """
+        Returns the arithmetic expression out of the user input. The input can either be
+        the expression itself or a query of the form "calculate \"1 + 2\"".
 
-        postfixExpression = " ".join(postfixList)
-        return postfixExpression
+        Parameters
+        ----------
+        inputExpression : str
+            The input of the user.
+
+        Returns
+        ------
+        inputExpression : str
+            The arithmetic expression.
+
+        Raises
+        ------
+        EmptyExpressionError
+            If the input is empty.
+        ResourceLimitError
+            If the parser has limits and the expression is longer than they allow, so
+            that it is rejected before it is looked up in a cache.
+        """
+        if len(inputExpression) == 0:
+            raise EmptyExpressionError("Empty expression. Please enter a valid arithmetic expression.")
+        if "\"" in inputExpression:
+            inputExpression = inputExpression.split("\"")[1]
+        if self.limits is not None:
+            self.limits.checkLength(inputExpression)
+        return inputExpression
+
+    def _tokenizeToPostfix(self, inputExpression, allowVariables):
+        """
+        Runs tokenize() and tokensToPostfix() on the inputExpression, recording both stages
+        if the parser has an Instrumentation.
+
+        Returns
+        ------
+        postfixTokens : list
+            The tokens of the inputExpression in postfix order.
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            # Validation, signed number folding and token typing all happen in one pass.
+            return self.tokensToPostfix(self.tokenize(inputExpression, allowVariables))
+        tokens = instrumentation.measure("tokenize", self.tokenize, inputExpression, allowVariables)
+        return instrumentation.measure("toPostfix", self.tokensToPostfix, tokens)
 
     def parseInput(self, inputExpression):
         """
-        Parses the user input. Checks for errors. If none are found, prettifies the user
-        input and converts it from infix to postfix notation.
+        Parses the user input. Tokenizes it (which checks for errors) and, if none are
+        found, converts the tokens from infix to postfix notation. If the parser has a
+        cache, expressions that only differ in whitespaces are parsed only once. Nothing
+        is printed if there is an error; use compile() to find out what went wrong.
 
         Parameters
         ----------
@@ -306,20 +735,152 @@ class InputParser:
         """
 
         try:
-            if len(inputExpression) == 0:
-                raise ValueError("Empty expression. Please enter a valid arithmetic expression.")
-            if "\"" in inputExpression:
-                inputExpression = inputExpression.split("\"")[1]
-            if self.checkForInvalidInput(inputExpression):
-                raise ValueError("Invalid input. Please enter a valid arithmetic expression.")
-            if self.checkForSyntaxError(inputExpression):
-                raise SyntaxError("Syntax error. Please enter a valid arithmetic expression.")
-
-            # No errors detected. Time to prettify the input.
-            inputExpression = self.prettifyInputExpression(inputExpression)
-            inputExpression = self.infixToPostfix(inputExpression)
-            return inputExpression
-
-        except Exception as error:
-            print("Error: " + str(error))
+            inputExpression = self.extractExpression(inputExpression)
+            cache = self.cache
+            if cache is not None:
+                cacheKey = cache.normalize(inputExpression)
+                if self.limits is not None:
+                    # Expressions cached by a parser with other limits (or none) are not used.
+                    cacheKey = (cacheKey, self.limits)
+                postfixExpression = cache.get(cacheKey)
+                if postfixExpression is not None:
+                    return postfixExpression
+            postfixExpression = None
+            persistentCache = self.persistentCache
+            if persistentCache is not None and persistentCache.backendName == "float":
+                from PersistentExpressionCache import postfixText
+
+                postfix = persistentCache.getPostfix(inputExpression, False)
+                if postfix is not None:
+                    self._checkLimits(inputExpression, False)
+                    postfixExpression = postfixText(postfix)
+            if postfixExpression is None:
+                postfixTokens = self._tokenizeToPostfix(inputExpression, False)
+                postfixExpression = " ".join([token[1] for token in postfixTokens])
+            if cache is not None:
+                cache.put(cacheKey, postfixExpression)
+            return postfixExpression
+
+        except CalculatorError:
             return None
+
+    def compile(self, inputExpression, allowVariables=True, backend=None):
+        """
+        Parses the user input once and returns it as a CompiledExpression, whose
+        evaluate() method can be called any number of times without parsing the
+        expression again. Unlike parseInput(), errors are raised instead of printed and
+        the expression may use variables (e.g. "(price - cost) * qty"), whose values are
+        passed to evaluate(). If the parser has an optimizer, the expression is simplified
+        before it is returned. The numbers are converted, and the operators and functions
+        of the registry applied, by the numeric backend, e.g. DecimalBackend for exact
+        decimal results.
+
+        Parameters
+        ----------
+        inputExpression : str
+            The arithmetic expression that is input by the user.
+        allowVariables : bool
+            Whether the expression may use variables.
+        backend : NumericBackend
+            The numeric backend of the expression. The backend of the parser is used if
+            left out, or floats if the parser has none either.
+
+        Returns
+        ------
+        compiledExpression : CompiledExpression
+            The parsed expression with its operands already converted to numbers.
+
+        Raises
+        ------
+        EmptyExpressionError
+            If the inputExpression is empty.
+        InvalidInputError
+            If the inputExpression contains a character that is not allowed.
+        ExpressionSyntaxError
+            If the inputExpression is not in correct infix notation.
+        ResourceLimitError
+            If the parser has limits and the inputExpression exceeds one of them. The
+            compiled expression raises it as well if one of its results gets too big.
+        """
+        from CompiledExpression import CompiledExpression
+
+        if backend is None:
+            backend = self.backend if self.backend is not None else defaultBackend
+        postfix = self._convertedPostfix(self.extractExpression(inputExpression), allowVariables, backend)
+        operatorFunctions = self.registry.functionsFor(backend.operatorFunctions)
+        if self.limits is not None:
+            operatorFunctions = self.limits.guard(operatorFunctions)
+        optimizer = self.optimizer
+        if optimizer is not None:
+            if self.instrumentation is None:
+                postfix = optimizer.optimize(postfix, operatorFunctions)
+            else:
+                postfix = self.instrumentation.measure("optimize", optimizer.optimize, postfix, operatorFunctions)
+        return CompiledExpression(postfix, operatorFunctions, backend, self.registry)
+
+    def compileBatch(self, inputExpressions, allowVariables=True, backend=None):
+        """
+        Compiles many expressions that are evaluated with the same values of their
+        variables into one CompiledBatch, which computes the subexpressions they have in
+        common only once.
+
+        Parameters
+        ----------
+        inputExpressions : iterable
+            The arithmetic expressions.
+        allowVariables : bool
+            Whether the expressions may use variables.
+        backend : NumericBackend
+            The numeric backend of the expressions (see compile()).
+
+        Returns
+        ------
+        compiledBatch : CompiledBatch
+            The expressions, compiled together.
+
+        Raises
+        ------
+        CalculatorError
+            The error of the first expression that cannot be compiled (see compile()).
+        """
+        from CompiledBatch import CompiledBatch
+
+        if backend is None:
+            backend = self.backend if self.backend is not None else defaultBackend
+        return CompiledBatch([self.compile(inputExpression, allowVariables, backend)
+                              for inputExpression in inputExpressions], self.registry, self.limits)
+
+    def _checkLimits(self, inputExpression, allowVariables):
+        """
+        Checks an expression found in the persistent cache against the limits of the
+        parser, since the cache was built without them. tokenize() checks them.
+        """
+        if self.limits is not None:
+            self.tokenize(inputExpression, allowVariables)
+
+    def _convertedPostfix(self, inputExpression, allowVariables, backend):
+        """
+        Returns the postfix tuples of the inputExpression with its numbers converted by
+        the backend, from the persistent cache if it has them.
+        """
+        persistentCache = self.persistentCache
+        if persistentCache is not None and persistentCache.backendName == backend.name:
+            postfix = persistentCache.getPostfix(inputExpression, allowVariables)
+            if postfix is not None:
+                self._checkLimits(inputExpression, allowVariables)
+                return postfix
+        postfixTokens = self._tokenizeToPostfix(inputExpression, allowVariables)
+        # Only numbers with a decimal point need the backend, everything else is an int.
+        convert = int if "." not in inputExpression else backend.convert
+        postfix = []
+        try:
+            for kind, text, position in postfixTokens:
+                if kind == NUMBER:
+                    postfix.append((kind, convert(text), position))
+                else:
+                    postfix.append((kind, text, position))
+        except ValueError:
+            # int() refuses numbers with more digits than sys.get_int_max_str_digits().
+            raise InvalidInputError("The number " + text[:20] + "... has too many digits.", position) from None
+        return tuple(postfix)
+
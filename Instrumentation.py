@@ -0,0 +1,182 @@
+import bisect
+import time
+
+
+class Instrumentation:
+    """
+    Collects how often each stage of the calculator runs, how long it takes and which
+    errors it raises. InputParser, Calculator and BatchEvaluator only use it if one is
+    passed to them, so it costs nothing more than a check for None when it is off.
+    Instances are not locked, so every thread should use its own.
+
+    ...
+
+    Attributes
+    ----------
+    buckets : tuple
+        The upper bounds (in seconds) of the buckets of the latency histograms.
+
+    Methods
+    -------
+    measure(stage, function, *arguments)
+        Calls function with arguments and records its latency and errors under stage.
+
+    record(stage, seconds)
+        Records one run of stage that took the given number of seconds.
+
+    recordError(stage, errorCode)
+        Records one error with the given code in stage.
+
+    toDict()
+        Returns all counters and histograms as a dictionary.
+
+    toPrometheus(prefix)
+        Returns all counters and histograms in the Prometheus text format.
+
+    reset()
+        Sets all counters and histograms back to zero.
+
+    """
+
+    defaultBuckets = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                      1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self, buckets=None):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        buckets : sequence
+            The upper bounds (in seconds) of the buckets of the latency histograms, in
+            increasing order. A bucket for everything above the last bound is added.
+        """
+        self.buckets = tuple(buckets) if buckets is not None else self.defaultBuckets
+        self._clock = time.perf_counter
+        self._stages = {}
+        self._errors = {}
+
+    def measure(self, stage, function, *arguments):
+        """
+        Calls function with arguments and records how long it took under stage. If it
+        raises an error, the error is recorded too (by its code, see CalculatorErrors)
+        and raised again.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage, e.g. "tokenize".
+        function : callable
+            The function that runs the stage.
+        arguments : tuple
+            The arguments function is called with.
+
+        Returns
+        ------
+        result : object
+            Whatever function returns.
+        """
+        start = self._clock()
+        try:
+            return function(*arguments)
+        except Exception as error:
+            self.recordError(stage, getattr(error, "code", type(error).__name__))
+            raise
+        finally:
+            self.record(stage, self._clock() - start)
+
+    def record(self, stage, seconds):
+        """
+        Records one run of stage that took the given number of seconds.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+        seconds : float
+            How long the stage took.
+        """
+        statistics = self._stages.get(stage)
+        if statistics is None:
+            statistics = self._stages[stage] = [0, 0.0, [0] * (len(self.buckets) + 1)]
+        statistics[0] += 1
+        statistics[1] += seconds
+        statistics[2][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def recordError(self, stage, errorCode):
+        """
+        Records one error with the given code in stage.
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+        errorCode : str
+            The code of the error, e.g. "SYNTAX_ERROR".
+        """
+        key = (stage, errorCode)
+        self._errors[key] = self._errors.get(key, 0) + 1
+
+    def toDict(self):
+        """
+        Returns all counters and histograms.
+
+        Returns
+        ------
+        metrics : dict
+            "stages" maps every stage to its "count", the "sum" of its latencies and its
+            cumulative "buckets" (upper bound to count, with "+Inf" last). "errors" maps
+            every stage to a dictionary from error code to count.
+        """
+        bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+        stages = {}
+        for stage, (count, seconds, bucketCounts) in self._stages.items():
+            cumulativeCounts = {}
+            total = 0
+            for bound, bucketCount in zip(bounds, bucketCounts):
+                total += bucketCount
+                cumulativeCounts[bound] = total
+            stages[stage] = {"count": count, "sum": seconds, "buckets": cumulativeCounts}
+        errors = {}
+        for (stage, errorCode), count in self._errors.items():
+            errors.setdefault(stage, {})[errorCode] = count
+        return {"stages": stages, "errors": errors}
+
+    def toPrometheus(self, prefix="calculator"):
+        """
+        Returns all counters and histograms in the Prometheus text exposition format.
+
+        Parameters
+        ----------
+        prefix : str
+            The prefix of the names of the metrics.
+
+        Returns
+        ------
+        text : str
+            A histogram named <prefix>_stage_duration_seconds and a counter named
+            <prefix>_stage_errors_total, both labelled by stage.
+        """
+        metrics = self.toDict()
+        histogramName = prefix + "_stage_duration_seconds"
+        counterName = prefix + "_stage_errors_total"
+        lines = ["# HELP " + histogramName + " Time spent in each stage of the calculator.",
+                 "# TYPE " + histogramName + " histogram"]
+        for stage, statistics in metrics["stages"].items():
+            for bound, count in statistics["buckets"].items():
+                lines.append(histogramName + '_bucket{stage="' + stage + '",le="' + bound + '"} ' + str(count))
+            lines.append(histogramName + '_sum{stage="' + stage + '"} ' + repr(statistics["sum"]))
+            lines.append(histogramName + '_count{stage="' + stage + '"} ' + str(statistics["count"]))
+        lines.append("# HELP " + counterName + " Errors raised in each stage of the calculator.")
+        lines.append("# TYPE " + counterName + " counter")
+        for stage, errorCounts in metrics["errors"].items():
+            for errorCode, count in errorCounts.items():
+                lines.append(counterName + '{stage="' + stage + '",code="' + errorCode + '"} ' + str(count))
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """
+        Sets all counters and histograms back to zero.
+        """
+        self._stages.clear()
+        self._errors.clear()
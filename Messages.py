@@ -15,5 +15,7 @@ class Messages:
                            "2) You can use negative numbers as well as floats. \n" \
                            "3) Your query should be of the form \"calculate \"1 + 2\"\". \n" \
                            "4) Division by zero is handled by the calculator.\n" \
-                           "5) You cannot use english alphabets in your expressions. \n" \
-                           "6) You can type \"exit\" to quit the program at any time. \n\n"
+                           "5) Besides + - * /, you can use % (remainder), // (integer division) and ^ (power),\n" \
+                           "   and the functions abs(x), sqrt(x), min(a, b, ...) and max(a, b, ...). \n" \
+                           "6) You cannot use english alphabets in your expressions (except for function names). \n" \
+                           "7) You can type \"exit\" to quit the program at any time. \n\n"
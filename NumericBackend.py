@@ -0,0 +1,196 @@
+"""
+This file has the numeric backends the calculator can evaluate expressions with. A
+backend decides which type the numbers written in an expression are converted to and
+how the operators are applied to them, e.g.
+
+    InputParser().compile("0.1 + 0.2", backend=DecimalBackend()).evaluate()  # Decimal("0.3")
+"""
+
+from OperatorRegistry import defaultRegistry
+
+
+class NumericBackend:
+    """
+    The default backend, which evaluates with python floats (and ints, as long as no
+    operand has a decimal point). Other backends override convert() and operatorFunctions.
+    Integers are exact in every backend, so numbers without a decimal point are always
+    converted with int() and an expression without any decimal point skips convert().
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        The name the backend is chosen by (see getBackend()).
+    operatorFunctions : dict
+        Maps the name of every operator and function in postfix notation to the function
+        that applies it (see OperatorRegistry). The default backend uses the functions of
+        the registry.
+
+    Methods
+    -------
+    convert(text)
+        Converts the text of a number in an expression to a number.
+
+    """
+
+    name = "float"
+    operatorFunctions = defaultRegistry.operatorFunctions
+
+    def __repr__(self):
+        return type(self).__name__ + "()"
+
+    def convert(self, text):
+        """
+        Converts the text of a number in an expression to a number.
+
+        Parameters
+        ----------
+        text : str
+            The number, e.g. "-12" or ".5".
+
+        Returns
+        ------
+        number : int or float
+            An int if the text has no decimal point, a float otherwise.
+        """
+        return float(text) if "." in text else int(text)
+
+
+class DecimalBackend(NumericBackend):
+    """
+    Evaluates with decimal.Decimal, so numbers like 0.1 are exact and every result is
+    rounded the way the decimal context says (28 significant digits by default). Values
+    of variables should be ints or Decimals. % and // round the quotient down like they
+    do for floats (the remainder has the sign of the divisor), not towards zero like the
+    decimal module, so every backend gives the same results.
+
+    ...
+
+    Attributes
+    ----------
+    context : decimal.Context
+        The context that sets the precision and rounding of every operation.
+
+    """
+
+    name = "decimal"
+
+    def __init__(self, context=None):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        context : decimal.Context
+            The context used for every operation. A copy of the current context of the
+            thread is used if left out.
+        """
+        import decimal
+
+        self.context = context if context is not None else decimal.getcontext().copy()
+        self._decimal = decimal.Decimal
+        self.operatorFunctions = dict(defaultRegistry.operatorFunctions)
+        self.operatorFunctions.update({"*": self.context.multiply, "/": self._divide, "+": self.context.add,
+                                       "-": self.context.subtract, "%": self._remainder,
+                                       "//": self._divideInteger, "^": self._power,
+                                       "u-": self.context.minus, "abs": self.context.abs,
+                                       "sqrt": self.context.sqrt})
+
+    def __repr__(self):
+        return "DecimalBackend(prec=" + str(self.context.prec) + ")"
+
+    def _divide(self, operand1, operand2):
+        # The context signals 0 / 0 as an InvalidOperation instead of a division by zero.
+        if not operand2:
+            raise ZeroDivisionError("division by zero")
+        return self.context.divide(operand1, operand2)
+
+    def _remainder(self, operand1, operand2):
+        if not operand2:
+            raise ZeroDivisionError("division by zero")
+        remainder = self.context.remainder(operand1, operand2)
+        if remainder and (remainder < 0) != (operand2 < 0):
+            # The context truncates the quotient, Python floors it.
+            remainder = self.context.add(remainder, operand2)
+        return remainder
+
+    def _divideInteger(self, operand1, operand2):
+        if not operand2:
+            raise ZeroDivisionError("division by zero")
+        quotient, remainder = self.context.divmod(operand1, operand2)
+        if remainder and (remainder < 0) != (operand2 < 0):
+            quotient = self.context.subtract(quotient, 1)
+        return quotient
+
+    def _power(self, operand1, operand2):
+        # The context signals 0 ^ 0 as an InvalidOperation and gives Infinity for 0 ^ -1,
+        # Python defines them as 1 and a division by zero.
+        if not operand1:
+            if not operand2:
+                return self._decimal(1)
+            if operand2 < 0:
+                raise ZeroDivisionError("division by zero")
+        return self.context.power(operand1, operand2)
+
+    def convert(self, text):
+        """
+        Converts the text of a number in an expression to an int, or to an exact Decimal
+        if it has a decimal point.
+        """
+        return self._decimal(text) if "." in text else int(text)
+
+
+class FractionBackend(NumericBackend):
+    """
+    Evaluates with fractions.Fraction, so every result is exact (1 / 3 * 3 is 1).
+    Values of variables should be ints or Fractions.
+    """
+
+    name = "fraction"
+
+    def __init__(self):
+        """
+        Initializes the class variables.
+        """
+        import fractions
+
+        self._fraction = fractions.Fraction
+        self.operatorFunctions = dict(defaultRegistry.operatorFunctions)
+        self.operatorFunctions["/"] = self._divide
+
+    def _divide(self, operand1, operand2):
+        return self._fraction(operand1) / operand2
+
+    def convert(self, text):
+        """
+        Converts the text of a number in an expression to an int, or to an exact Fraction
+        if it has a decimal point.
+        """
+        return self._fraction(text) if "." in text else int(text)
+
+
+# The backend used wherever none is given.
+defaultBackend = NumericBackend()
+
+BACKENDS = {"float": NumericBackend, "decimal": DecimalBackend, "fraction": FractionBackend}
+
+
+def getBackend(name):
+    """
+    Returns a new backend of the given name.
+
+    Parameters
+    ----------
+    name : str
+        One of the keys of BACKENDS.
+
+    Returns
+    ------
+    backend : NumericBackend
+        The backend.
+    """
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError("Unknown numeric backend \"" + name + "\".") from None
@@ -0,0 +1,349 @@
+"""
+The operators and functions that expressions can use. Every operator and function is
+registered once, together with everything the tokenizer, the shunting yard algorithm
+and the evaluators need to know about it, e.g.
+
+    defaultRegistry.registerFunction("hypot", math.hypot, arity=2)
+    InputParser().compile("hypot(3, 4)").evaluate()  # 5.0
+"""
+
+import math
+import operator
+
+# The largest result, in bits, that ^ computes for integers. Bigger powers (e.g.
+# 9 ^ 9 ^ 9) would take minutes and gigabytes and raise an OverflowError instead.
+MAX_POWER_BITS = 1 << 20
+
+
+class Operator:
+    """
+    An operator that is written between its two operands (arity 2) or in front of its
+    only operand (arity 1).
+
+    ...
+
+    Attributes
+    ----------
+    symbol : str
+        The operator as it is written in expressions, e.g. "//".
+    name : str
+        The operator in postfix notation. The symbol for operators between two operands
+        and "u" followed by the symbol for operators in front of one (e.g. "u-"), so both
+        minus signs can be told apart.
+    arity : int
+        The number of operands, 1 or 2.
+    precedence : int
+        Operators with a higher precedence are applied first.
+    rightAssociative : bool
+        Whether a chain of the operator is applied from right to left (2 ^ 3 ^ 2 is
+        2 ^ 9). Operators in front of their operand are always right associative.
+    commutative : bool
+        Whether the operands can be swapped without changing the result (a + b is b + a).
+    function : callable
+        Applies the operator to numbers.
+    arrayFunction : callable
+        Applies the operator to whole NumPy arrays (see Calculator.evaluateBatch()).
+
+    """
+
+    __slots__ = ("symbol", "name", "arity", "precedence", "rightAssociative", "commutative", "function",
+                 "arrayFunction")
+
+    def __init__(self, symbol, arity, precedence, rightAssociative, function, arrayFunction=None, commutative=False):
+        self.symbol = symbol
+        self.name = symbol if arity == 2 else "u" + symbol
+        self.arity = arity
+        self.precedence = precedence
+        self.rightAssociative = rightAssociative or arity == 1
+        self.commutative = commutative and arity == 2
+        self.function = function
+        self.arrayFunction = arrayFunction if arrayFunction is not None else function
+
+    def __repr__(self):
+        return "Operator(" + repr(self.symbol) + ", arity=" + str(self.arity) + ", precedence=" \
+            + str(self.precedence) + ")"
+
+
+class Function:
+    """
+    A function that is called by its name with its arguments in parentheses, e.g.
+    "max(a, b, 0)".
+
+    ...
+
+    Attributes
+    ----------
+    name : str
+        The name of the function.
+    arity : int
+        The number of arguments.
+    variadic : bool
+        Whether the function takes any number (at least one) of arguments. Its function
+        takes two of them and is applied from left to right, so max(a, b, c) is
+        max(max(a, b), c) and max(a) is a.
+    function : callable
+        Applies the function to numbers.
+    arrayFunction : callable
+        Applies the function to whole NumPy arrays (see Calculator.evaluateBatch()).
+
+    """
+
+    __slots__ = ("name", "arity", "variadic", "function", "arrayFunction")
+
+    def __init__(self, name, arity, variadic, function, arrayFunction=None):
+        self.name = name
+        self.arity = arity
+        self.variadic = variadic
+        self.function = function
+        self.arrayFunction = arrayFunction if arrayFunction is not None else function
+
+    def __repr__(self):
+        return "Function(" + repr(self.name) + ", arity=" + str(self.arity) + ")"
+
+
+class OperatorRegistry:
+    """
+    Holds the operators and functions that expressions can use, and the tables built
+    from them that the parser and the evaluators look them up in, so that applying an
+    operator is one dictionary lookup instead of a chain of comparisons.
+
+    Functions should raise an ArithmeticError or a ValueError for operands they are not
+    defined for, which the evaluators turn into an ArithmeticEvaluationError.
+
+    ...
+
+    Attributes
+    ----------
+    binaryOperators : dict
+        Maps the symbol of every operator between two operands to its Operator.
+    prefixOperators : dict
+        Maps the symbol of every operator in front of an operand to its Operator.
+    functions : dict
+        Maps the name of every function to its Function.
+    operatorFunctions : dict
+        Maps the name of every operator and function in postfix notation to the
+        function that applies it.
+    arrayFunctions : dict
+        Like operatorFunctions, but with the functions that apply them to NumPy arrays.
+    arities : dict
+        Maps the name of every operator and function in postfix notation to the number
+        of operands it takes from the stack.
+    precedences : dict
+        Maps the name of every operator in postfix notation to its precedence.
+    rightAssociative : set
+        The names of the operators that are right associative.
+    commutativeOperators : set
+        The names of the operators whose operands can be swapped.
+    operatorCharacters : str
+        Every character that appears in the symbol of an operator.
+    longSymbols : dict
+        Maps the first character of every symbol that is longer than one character to
+        those symbols, longest first, so the tokenizer reads "//" instead of "/" twice.
+
+    Methods
+    -------
+    registerOperator(symbol, function, precedence, arity, associativity, arrayFunction, commutative)
+        Registers an operator.
+
+    registerFunction(name, function, arity, variadic, arrayFunction)
+        Registers a function.
+
+    functionsFor(operatorFunctions)
+        Returns the functions to evaluate with, given the ones of a numeric backend.
+
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty registry.
+        """
+        self.binaryOperators = {}
+        self.prefixOperators = {}
+        self.functions = {}
+        self.operatorFunctions = {}
+        self.arrayFunctions = {}
+        self.arities = {}
+        self.precedences = {}
+        self.rightAssociative = set()
+        self.commutativeOperators = set()
+        self.operatorCharacters = ""
+        self.longSymbols = {}
+
+    def registerOperator(self, symbol, function, precedence, arity=2, associativity="left", arrayFunction=None,
+                         commutative=False):
+        """
+        Registers an operator, or replaces the one with the same symbol and arity.
+
+        Parameters
+        ----------
+        symbol : str
+            The operator as it is written in expressions. It can be made of any
+            characters that are not digits, letters, whitespaces, parentheses, commas
+            or decimal points. Operators in front of an operand are one character long.
+        function : callable
+            Applies the operator to arity numbers.
+        precedence : int
+            Operators with a higher precedence are applied first (+ and - have 2, *, /, %
+            and // have 3, the minus in front of an operand has 4 and ^ has 5).
+        arity : int
+            2 for an operator between two operands, 1 for an operator in front of one.
+        associativity : str
+            "left" or "right", for operators between two operands.
+        arrayFunction : callable
+            Applies the operator to NumPy arrays, if function cannot.
+        commutative : bool
+            Whether the operands of an operator between two operands can be swapped
+            without changing the result, so CompiledBatch can share a + b and b + a.
+
+        Returns
+        ------
+        operator : Operator
+            The registered operator.
+        """
+        if arity not in (1, 2):
+            raise ValueError("Operators take one or two operands.")
+        if associativity not in ("left", "right"):
+            raise ValueError("The associativity has to be \"left\" or \"right\".")
+        if not symbol or any(character.isalnum() or character.isspace() or character in "(),."
+                             for character in symbol):
+            raise ValueError("Invalid operator symbol " + repr(symbol) + ".")
+        if arity == 1 and len(symbol) != 1:
+            raise ValueError("Operators in front of an operand have to be one character long.")
+        definition = Operator(symbol, arity, precedence, associativity == "right", function, arrayFunction,
+                              commutative)
+        (self.binaryOperators if arity == 2 else self.prefixOperators)[symbol] = definition
+        self._add(definition.name, definition, arity)
+        self.precedences[definition.name] = precedence
+        if definition.rightAssociative:
+            self.rightAssociative.add(definition.name)
+        else:
+            self.rightAssociative.discard(definition.name)
+        if definition.commutative:
+            self.commutativeOperators.add(definition.name)
+        else:
+            self.commutativeOperators.discard(definition.name)
+        for character in symbol:
+            if character not in self.operatorCharacters:
+                self.operatorCharacters += character
+        if len(symbol) > 1:
+            symbols = self.longSymbols.setdefault(symbol[0], [])
+            if symbol not in symbols:
+                symbols.append(symbol)
+                symbols.sort(key=len, reverse=True)
+        return definition
+
+    def registerFunction(self, name, function, arity=1, variadic=False, arrayFunction=None):
+        """
+        Registers a function, or replaces the one with the same name. The name cannot be
+        used as the name of a variable anymore.
+
+        Parameters
+        ----------
+        name : str
+            The name of the function. It follows the same rules as the names of variables.
+        function : callable
+            Applies the function to arity numbers.
+        arity : int
+            The number of arguments, at least one. Has to be 2 for a variadic function.
+        variadic : bool
+            Whether the function takes any number of arguments, by applying function to
+            them from left to right.
+        arrayFunction : callable
+            Applies the function to NumPy arrays, if function cannot.
+
+        Returns
+        ------
+        function : Function
+            The registered function.
+        """
+        if not name.isidentifier():
+            raise ValueError("Invalid function name " + repr(name) + ".")
+        if arity < 1 or (variadic and arity != 2):
+            raise ValueError("Functions take at least one argument and variadic ones are applied to two at a time.")
+        definition = Function(name, arity, variadic, function, arrayFunction)
+        self.functions[name] = definition
+        self._add(name, definition, arity)
+        return definition
+
+    def _add(self, name, definition, arity):
+        self.operatorFunctions[name] = definition.function
+        self.arrayFunctions[name] = definition.arrayFunction
+        self.arities[name] = arity
+
+    def functionsFor(self, operatorFunctions):
+        """
+        Returns the functions that apply every operator and function, given the ones of
+        a numeric backend. The backend decides how the operators it knows are applied;
+        the registry applies the rest.
+
+        Parameters
+        ----------
+        operatorFunctions : dict
+            The operatorFunctions of a NumericBackend.
+
+        Returns
+        ------
+        operatorFunctions : Mapping
+            Maps the name of every operator and function in postfix notation to the
+            function that applies it.
+        """
+        if operatorFunctions.keys() >= self.arities.keys():
+            return operatorFunctions
+        from collections import ChainMap
+
+        return ChainMap(operatorFunctions, self.operatorFunctions)
+
+
+def power(base, exponent):
+    """
+    Raises base to exponent, like ** but without creating complex numbers (for a
+    negative base and a fractional exponent) or integers of more than MAX_POWER_BITS.
+    """
+    if type(base) is int and type(exponent) is int and exponent > 1 \
+            and (exponent - 1) * (abs(base).bit_length() - 1) > MAX_POWER_BITS:
+        raise OverflowError("integer power too large")
+    result = base ** exponent
+    if type(result) is complex:
+        raise ValueError("math domain error")
+    return result
+
+
+def _arrayPower(base, exponent):
+    import numpy
+
+    # NumPy refuses integers to negative integer powers, so the powers are taken in floats.
+    return numpy.power(numpy.asarray(base, dtype=numpy.float64), exponent)
+
+
+def _arraySquareRoot(operand):
+    import numpy
+
+    return numpy.sqrt(operand)
+
+
+def _arrayMinimum(operand1, operand2):
+    import numpy
+
+    return numpy.minimum(operand1, operand2)
+
+
+def _arrayMaximum(operand1, operand2):
+    import numpy
+
+    return numpy.maximum(operand1, operand2)
+
+
+# The registry the parser and the evaluators use unless they are given another one.
+defaultRegistry = OperatorRegistry()
+defaultRegistry.registerOperator("+", operator.add, 2, commutative=True)
+defaultRegistry.registerOperator("-", operator.sub, 2)
+defaultRegistry.registerOperator("*", operator.mul, 3, commutative=True)
+defaultRegistry.registerOperator("/", operator.truediv, 3)
+defaultRegistry.registerOperator("%", operator.mod, 3)
+defaultRegistry.registerOperator("//", operator.floordiv, 3)
+defaultRegistry.registerOperator("-", operator.neg, 4, arity=1)
+defaultRegistry.registerOperator("^", power, 5, associativity="right", arrayFunction=_arrayPower)
+defaultRegistry.registerFunction("abs", abs)
+defaultRegistry.registerFunction("sqrt", math.sqrt, arrayFunction=_arraySquareRoot)
+defaultRegistry.registerFunction("min", min, arity=2, variadic=True, arrayFunction=_arrayMinimum)
+defaultRegistry.registerFunction("max", max, arity=2, variadic=True, arrayFunction=_arrayMaximum)
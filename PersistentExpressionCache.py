@@ -0,0 +1,301 @@
+"""
+A cache of compiled expressions that is kept in a file, so that a new process does not
+have to parse a catalog of formulas again before it can use them. Build the file once,
+e.g.
+
+    python3 PersistentExpressionCache.py formulas.txt --output formulas.cache
+
+and open it in every process that parses the same formulas:
+
+    inputParser = InputParser(persistentCache=PersistentExpressionCache("formulas.cache"))
+"""
+
+import argparse
+import bisect
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+
+from CalculatorErrors import CalculatorError
+from InputParser import PARSER_VERSION, InputParser
+from NumericBackend import BACKENDS, getBackend
+from PostfixBytecode import LOAD, PostfixBytecode
+
+# magic, version of the file format, version of the parser, backend, number of entries
+_HEADER = struct.Struct("<4sIIBxxxQ")
+_HEADER_SIZE = 32
+_MAGIC = b"UFPC"
+_FORMAT_VERSION = 1
+_BACKEND_NAMES = list(BACKENDS)
+_ENTRY_HEADER = struct.Struct("<I4x")
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class PersistentExpressionCache:
+    """
+    Looks up expressions in a cache file that was written by build(). The file is mapped
+    into memory, so opening it only reads its header and every lookup only touches the
+    pages of the entries it needs; the operating system shares those pages between all
+    processes that open the same file.
+
+    The file starts with a 32 byte header, followed by the sorted 64-bit blake2b hashes of
+    the expressions, the offsets of their entries and the entries themselves. Every entry
+    is the expression (to tell expressions with the same hash apart) followed by its
+    PostfixBytecode. The version of the parser is stored in the header and a file
+    written by another version is refused, since the parser might not accept the same
+    expressions or produce the same programs anymore.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        The path of the cache file.
+    backendName : str
+        The name of the numeric backend the expressions were compiled with.
+    hits : int
+        The number of lookups that found an entry.
+    misses : int
+        The number of lookups that did not find an entry.
+
+    Methods
+    -------
+    build(path, expressions, backend, registry)
+        Compiles the expressions and writes them to a cache file.
+
+    get(expression)
+        Returns the bytecode of an expression, or None if it is not in the cache.
+
+    statistics()
+        Returns the size of the cache and its counters as a dictionary.
+
+    close()
+        Closes the cache file.
+
+    """
+
+    def __init__(self, path):
+        """
+        Opens a cache file.
+
+        Parameters
+        ----------
+        path : str
+            The path of a file written by build().
+
+        Raises
+        ------
+        ValueError
+            If the file is not a cache file, or was written by another version of the
+            parser or of the file format.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < _HEADER_SIZE:
+                raise ValueError("\"" + path + "\" is not an expression cache.")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        try:
+            magic, formatVersion, parserVersion, backendIndex, count = _HEADER.unpack_from(view)
+            if magic != _MAGIC:
+                raise ValueError("\"" + path + "\" is not an expression cache.")
+            if formatVersion != _FORMAT_VERSION or parserVersion != PARSER_VERSION:
+                raise ValueError("\"" + path + "\" was written by another version of the parser.")
+            self._entriesStart = _HEADER_SIZE + 8 * (2 * count + 1)
+            if self._entriesStart > size:
+                raise ValueError("\"" + path + "\" is truncated.")
+        except ValueError:
+            view.release()
+            self._map.close()
+            raise
+        self.backendName = _BACKEND_NAMES[backendIndex]
+        self._view = view
+        self._hashes = view[_HEADER_SIZE:_HEADER_SIZE + 8 * count].cast("Q")
+        self._offsets = view[_HEADER_SIZE + 8 * count:self._entriesStart].cast("Q")
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    @staticmethod
+    def build(path, expressions, backend=None, registry=None):
+        """
+        Compiles the expressions and writes them to a cache file. Expressions that have
+        errors are left out, so every entry of the cache is known to be valid. The file is
+        written next to path first and then moved there, so processes that open the file
+        meanwhile see either the old or the new cache.
+
+        Parameters
+        ----------
+        path : str
+            The path of the cache file.
+        expressions : iterable
+            The arithmetic expressions to cache.
+        backend : NumericBackend
+            The numeric backend to compile the expressions with (floats if left out).
+        registry : OperatorRegistry
+            The operators and functions the expressions can use (the default ones if left
+            out). The file does not record it, so the parsers that read the cache should
+            use the same registry.
+
+        Returns
+        ------
+        count : int
+            The number of expressions written to the cache.
+        """
+        if backend is None:
+            backend = getBackend("float")
+        inputParser = InputParser(backend=backend, registry=registry)
+        entries = {}
+        for expression in expressions:
+            try:
+                expression = inputParser.extractExpression(expression)
+                key = expression.encode("utf-8")
+                if key not in entries:
+                    entries[key] = PostfixBytecode.fromCompiledExpression(inputParser.compile(expression))
+            except CalculatorError:
+                pass
+        keys = sorted(entries, key=_hash)
+        offsets = [0]
+        for key in keys:
+            offsets.append(offsets[-1] + _ENTRY_HEADER.size + _align(len(key)) + entries[key].nbytes)
+
+        temporaryPath = path + ".tmp"
+        with open(temporaryPath, "wb") as file:
+            header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, PARSER_VERSION, _BACKEND_NAMES.index(backend.name),
+                                  len(keys))
+            file.write(header + b"\0" * (_HEADER_SIZE - _HEADER.size))
+            file.write(struct.pack("<%dQ" % len(keys), *[_hash(key) for key in keys]))
+            file.write(struct.pack("<%dQ" % len(offsets), *offsets))
+            for key in keys:
+                file.write(_ENTRY_HEADER.pack(len(key)))
+                file.write(key + b"\0" * (_align(len(key)) - len(key)))
+                entries[key].writeTo(file)
+        os.replace(temporaryPath, path)
+        return len(keys)
+
+    def get(self, expression):
+        """
+        Returns the bytecode of an expression. The bytecode reads the cache file directly
+        and cannot be used after the cache is closed.
+
+        Parameters
+        ----------
+        expression : str
+            The arithmetic expression, exactly as it was given to build() (after
+            InputParser.extractExpression()).
+
+        Returns
+        ------
+        bytecode : PostfixBytecode
+            The bytecode of the expression, or None if it is not in the cache.
+        """
+        key = expression.encode("utf-8")
+        keyHash = _hash(key)
+        hashes = self._hashes
+        index = bisect.bisect_left(hashes, keyHash)
+        while index < len(hashes) and hashes[index] == keyHash:
+            start = self._entriesStart + self._offsets[index]
+            keyLength = _ENTRY_HEADER.unpack_from(self._view, start)[0]
+            keyStart = start + _ENTRY_HEADER.size
+            if keyLength == len(key) and self._view[keyStart:keyStart + keyLength] == key:
+                self.hits += 1
+                return PostfixBytecode.fromBuffer(self._view, keyStart + _align(keyLength))
+            index += 1
+        self.misses += 1
+        return None
+
+    def getPostfix(self, expression, allowVariables=True):
+        """
+        Returns the (kind, value, position) tuples of an expression, as InputParser.compile()
+        uses them, or None if it is not in the cache or uses variables that are not allowed.
+        """
+        bytecode = self.get(expression)
+        if bytecode is None or (not allowVariables and LOAD in bytecode.opcodes):
+            return None
+        return bytecode.toPostfix()
+
+    def statistics(self):
+        """
+        Returns the size of the cache and its counters.
+
+        Returns
+        ------
+        statistics : dict
+            The keys are "size", "hits" and "misses".
+        """
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """
+        Closes the cache file. Bytecodes returned by get() cannot be used anymore.
+        """
+        if self._map.closed:
+            return
+        self._hashes.release()
+        self._offsets.release()
+        self._view.release()
+        self._map.close()
+
+
+def postfixText(postfix):
+    """
+    Returns the text parseInput() returns for the (kind, value, position) tuples of an
+    expression, or None if a number cannot be written so that Calculator reads it back
+    as the same value.
+    """
+    texts = []
+    for kind, value, position in postfix:
+        if type(value) is float:
+            if not math.isfinite(value):
+                return None
+            text = repr(value)
+            if "e" in text:
+                import decimal
+
+                text = format(decimal.Decimal(value), "f")
+            if "." not in text:
+                text += ".0"
+            texts.append(text)
+        else:
+            texts.append(str(value))
+    return " ".join(texts)
+
+
+def main(arguments=None):
+    from RunMe import readLines
+
+    argumentParser = argparse.ArgumentParser(description="Writes the expressions of files to a cache file.")
+    argumentParser.add_argument("files", nargs="*", metavar="FILE",
+                                help="the files with one expression per line (stdin if none are given)")
+    argumentParser.add_argument("--output", required=True, help="the path of the cache file")
+    argumentParser.add_argument("--numeric", choices=list(BACKENDS), default="float",
+                                help="the numeric backend to compile the expressions with")
+    parsedArguments = argumentParser.parse_args(arguments)
+    expressions = (line.strip() for line in readLines(parsedArguments.files))
+    count = PersistentExpressionCache.build(parsedArguments.output, [line for line in expressions if line],
+                                            getBackend(parsedArguments.numeric))
+    print("Cached %d expressions in %s" % (count, parsedArguments.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+"""
+A compact form of compiled expressions that is kept in a few flat arrays instead of
+Python tuples and strings, and can be written to and read from bytes without
+converting every instruction, e.g.
+
+    bytecode = PostfixBytecode.fromCompiledExpression(InputParser().compile("(price - cost) * qty"))
+    data = bytecode.toBytes()
+    PostfixBytecode.fromBuffer(data).evaluate({"price": 5, "cost": 3, "qty": 2})  # 4
+"""
+
+import struct
+import sys
+from array import array
+
+from CalculatorErrors import ArithmeticEvaluationError, DivisionByZeroError, InvalidInputError, \
+    UnboundVariableError, arithmeticErrorMessage, formatValue
+from InputParser import FUNCTION, NUMBER, OPERATOR, UNARY_OPERATOR, VARIABLE
+from NumericBackend import BACKENDS, getBackend
+from OperatorRegistry import defaultRegistry
+
+PUSH_INTEGER = 0
+PUSH_FLOAT = 1
+PUSH_LITERAL = 2
+LOAD = 3
+ADD = 4
+SUBTRACT = 5
+MULTIPLY = 6
+DIVIDE = 7
+BINARY = 8
+UNARY = 9
+CALL = 10
+
+OPERATOR_OPCODES = {"+": ADD, "-": SUBTRACT, "*": MULTIPLY, "/": DIVIDE}
+OPCODE_OPERATORS = "+-*/"
+# The opcodes of the other operators and functions, whose names are stored as text.
+_NAMED_OPCODES = {OPERATOR: BINARY, UNARY_OPERATOR: UNARY, FUNCTION: CALL}
+
+# magic, version, byte order, backend, instructions, arguments, integers, floats, bytes of texts,
+# precision of the decimal context (0 for none)
+_HEADER = struct.Struct("<4sBBBxIIIIII")
+_HEADER_SIZE = 32
+_MAGIC = b"PFBC"
+_VERSION = 2
+_BACKEND_NAMES = list(BACKENDS)
+_INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+# The first character of a constant stored as text tells its type. None of them can
+# start the name of a variable.
+_LITERAL_TAGS = {"int": "+", "Decimal": ".", "Fraction": "/"}
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+class PostfixBytecode:
+    """
+    A compiled expression stored as arrays. Every instruction is one byte in opcodes.
+    +, -, * and / have an opcode of their own. All other instructions take the next
+    entry of arguments, which is an index into integers (64-bit ints), floats (doubles)
+    or texts (names of variables, operators and functions, and the numbers that fit
+    neither, like big ints or Decimals). positions holds the position of every
+    instruction in the expression, for the errors.
+
+    The serialized form starts with a 32 byte header followed by the arrays, each
+    starting at a multiple of 8 bytes, so fromBuffer() can use the bytes directly (e.g.
+    of a file mapped into memory) without copying or converting them.
+
+    ...
+
+    Attributes
+    ----------
+    opcodes : array or memoryview
+        One byte per instruction.
+    arguments : array or memoryview
+        The index of the operand (or of the name) of every instruction that takes one,
+        in order.
+    integers : array or memoryview
+        The integer constants.
+    floats : array or memoryview
+        The float constants.
+    positions : array or memoryview
+        The position of every instruction in the expression.
+    texts : list
+        The names of the variables, operators and functions and the constants that are
+        stored as text.
+    backendName : str
+        The name of the numeric backend the expression was compiled with.
+    precision : int
+        The precision of the decimal context the expression was compiled with, or None
+        for the other backends. It is serialized with the bytecode.
+    backend : NumericBackend
+        The backend the expression is evaluated with unless another one is given: the
+        backend of the CompiledExpression, or a new one of backendName (with precision).
+    registry : OperatorRegistry
+        The registry of the operators and functions of the expression.
+
+    Methods
+    -------
+    fromCompiledExpression(compiledExpression)
+        Creates the bytecode of a CompiledExpression.
+
+    fromBuffer(buffer, offset, registry)
+        Reads bytecode from bytes, a memoryview or an mmap without copying the arrays.
+
+    toBytes()
+        Returns the serialized bytecode.
+
+    writeTo(output)
+        Writes the serialized bytecode to a binary file.
+
+    evaluate(bindings, backend, registry)
+        Evaluates the expression.
+
+    toCompiledExpression(backend, registry)
+        Returns the expression as a CompiledExpression again.
+
+    toPostfix()
+        Returns the (kind, value, position) tuples of the expression.
+
+    """
+
+    __slots__ = ("opcodes", "arguments", "integers", "floats", "positions", "backendName", "precision", "registry",
+                 "_backend", "_tables", "_texts", "_textBytes")
+
+    def __init__(self, opcodes, arguments, integers, floats, positions, texts, backendName="float", precision=None,
+                 registry=None, backend=None):
+        """
+        Initializes the class variables. Use fromCompiledExpression() or fromBuffer() to
+        create bytecode.
+        """
+        self.opcodes = opcodes
+        self.arguments = arguments
+        self.integers = integers
+        self.floats = floats
+        self.positions = positions
+        self.backendName = backendName
+        self.precision = precision
+        self.registry = registry if registry is not None else defaultRegistry
+        self._backend = backend
+        # The functions of backend and registry, built by the first evaluate().
+        self._tables = None
+        self._texts = texts
+        self._textBytes = None
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __repr__(self):
+        return "PostfixBytecode(" + str(len(self.opcodes)) + " instructions, " + str(self.nbytes) + " bytes)"
+
+    @property
+    def texts(self):
+        if self._texts is None:
+            textBytes = bytes(self._textBytes)
+            self._texts = textBytes.decode("utf-8").split("\0") if textBytes else []
+        return self._texts
+
+    @property
+    def backend(self):
+        """
+        The backend the expression is evaluated with unless another one is given.
+        """
+        if self._backend is None:
+            backend = getBackend(self.backendName)
+            if self.precision is not None:
+                backend.context.prec = self.precision
+            self._backend = backend
+        return self._backend
+
+    @property
+    def nbytes(self):
+        """
+        The size of the serialized bytecode.
+        """
+        return _HEADER_SIZE + 8 * (len(self.integers) + len(self.floats)) \
+            + _align(4 * (len(self.positions) + len(self.arguments)) + len(self.opcodes) + len(self._encodeTexts()))
+
+    @classmethod
+    def fromCompiledExpression(cls, compiledExpression):
+        """
+        Creates the bytecode of a CompiledExpression. The bytecode keeps its backend and
+        registry, but not the ResourceLimits of the parser that compiled it: evaluate()
+        does not check the magnitude of the results. A parser with limits that finds the
+        bytecode in its PersistentExpressionCache checks them again.
+
+        Parameters
+        ----------
+        compiledExpression : CompiledExpression
+            The expression, as returned by InputParser.compile().
+
+        Returns
+        ------
+        bytecode : PostfixBytecode
+            The same expression as bytecode.
+
+        Raises
+        ------
+        ArithmeticEvaluationError
+            If a constant is an int with too many digits to be written out, e.g. after
+            the optimizer folded 10 ^ 5000.
+        InvalidInputError
+            If a constant is of a type the bytecode cannot store.
+        """
+        opcodes = array("B")
+        arguments = array("I")
+        integers = array("q")
+        floats = array("d")
+        positions = array("I")
+        texts = []
+        textIndexes = {}
+        for kind, value, position in compiledExpression.postfix:
+            if kind == OPERATOR and value in OPERATOR_OPCODES:
+                opcodes.append(OPERATOR_OPCODES[value])
+            elif kind in _NAMED_OPCODES:
+                opcodes.append(_NAMED_OPCODES[kind])
+                arguments.append(_indexOf(value, texts, textIndexes))
+            elif kind == VARIABLE:
+                opcodes.append(LOAD)
+                arguments.append(_indexOf(value, texts, textIndexes))
+            elif type(value) is int and value in _INTEGER_RANGE:
+                opcodes.append(PUSH_INTEGER)
+                arguments.append(len(integers))
+                integers.append(value)
+            elif type(value) is float:
+                opcodes.append(PUSH_FLOAT)
+                arguments.append(len(floats))
+                floats.append(value)
+            else:
+                # Big ints, Decimals and Fractions keep their exact value as text.
+                tag = _LITERAL_TAGS.get(type(value).__name__)
+                if tag is None:
+                    raise InvalidInputError("The number " + repr(value)[:20] + " cannot be stored as bytecode.",
+                                            position)
+                text = tag + formatValue(value)
+                opcodes.append(PUSH_LITERAL)
+                arguments.append(_indexOf(text, texts, textIndexes))
+            positions.append(position)
+        backend = compiledExpression.backend
+        if backend is None:
+            return cls(opcodes, arguments, integers, floats, positions, texts, registry=compiledExpression.registry)
+        context = getattr(backend, "context", None)
+        return cls(opcodes, arguments, integers, floats, positions, texts, backend.name,
+                   context.prec if context is not None else None, compiledExpression.registry, backend)
+
+    @classmethod
+    def fromBuffer(cls, buffer, offset=0, registry=None):
+        """
+        Reads bytecode written by toBytes() or writeTo(). The arrays of the bytecode are
+        memoryviews of the buffer, so nothing is copied and the buffer has to be kept
+        open as long as the bytecode is used.
+
+        Parameters
+        ----------
+        buffer : bytes-like
+            E.g. bytes, a memoryview or an mmap.
+        offset : int
+            Where the bytecode starts in the buffer. Has to be a multiple of 8.
+        registry : OperatorRegistry
+            The registry of the operators and functions of the expression (the default
+            one if left out), which is not serialized.
+
+        Returns
+        ------
+        bytecode : PostfixBytecode
+            The bytecode. Its nbytes tells where the next one in the buffer would start.
+        """
+        view = memoryview(buffer).cast("B")
+        magic, version, byteOrder, backendIndex, instructionCount, argumentCount, integerCount, floatCount, \
+            textLength, precision = _HEADER.unpack_from(view, offset)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a postfix bytecode of version " + str(_VERSION) + ".")
+        if byteOrder != (sys.byteorder == "big"):
+            raise ValueError("The bytecode was written on a machine with another byte order.")
+        start = offset + _HEADER_SIZE
+        sections = []
+        for count, itemSize, typeCode in ((floatCount, 8, "d"), (integerCount, 8, "q"), (instructionCount, 4, "I"),
+                                          (argumentCount, 4, "I"), (instructionCount, 1, "B")):
+            end = start + count * itemSize
+            sections.append(view[start:end].cast(typeCode))
+            start = end
+        bytecode = cls(sections[4], sections[3], sections[1], sections[0], sections[2], None,
+                       _BACKEND_NAMES[backendIndex], precision or None, registry)
+        bytecode._textBytes = view[start:start + textLength]
+        return bytecode
+
+    def _encodeTexts(self):
+        if self._textBytes is None:
+            self._textBytes = "\0".join(self.texts).encode("utf-8")
+        return self._textBytes
+
+    def _serializedParts(self):
+        textBytes = self._encodeTexts()
+        header = _HEADER.pack(_MAGIC, _VERSION, sys.byteorder == "big", _BACKEND_NAMES.index(self.backendName),
+                              len(self.opcodes), len(self.arguments), len(self.integers), len(self.floats),
+                              len(textBytes), self.precision or 0)
+        padding = b"\0" * (self.nbytes - _HEADER_SIZE - 8 * (len(self.integers) + len(self.floats))
+                           - 4 * (len(self.positions) + len(self.arguments)) - len(self.opcodes) - len(textBytes))
+        return [header + b"\0" * (_HEADER_SIZE - _HEADER.size), self.floats, self.integers, self.positions,
+                self.arguments, self.opcodes, textBytes, padding]
+
+    def toBytes(self):
+        """
+        Returns the serialized bytecode. Its length is a multiple of 8, so bytecodes can
+        be written one after the other and still be read without copying.
+
+        Returns
+        ------
+        data : bytes
+            The header followed by the arrays.
+        """
+        return b"".join([memoryview(part).cast("B") for part in self._serializedParts()])
+
+    def writeTo(self, output):
+        """
+        Writes the serialized bytecode (see toBytes()) to a binary file, straight from
+        the arrays.
+
+        Parameters
+        ----------
+        output : file
+            A file-like object opened for writing bytes.
+
+        Returns
+        ------
+        size : int
+            The number of bytes written.
+        """
+        for part in self._serializedParts():
+            output.write(part)
+        return self.nbytes
+
+    def evaluate(self, bindings=None, backend=None, registry=None):
+        """
+        Evaluates the expression straight from the arrays.
+
+        Parameters
+        ----------
+        bindings : Mapping
+            Maps the name of every variable of the expression to its value.
+        backend : NumericBackend
+            The numeric backend to evaluate with (the backend attribute if left out).
+        registry : OperatorRegistry
+            The registry of the operators and functions (the registry attribute if left
+            out).
+
+        Returns
+        ------
+            Result : Integer or Float
+                The result of evaluating the arithmetic expression.
+
+        Raises
+        ------
+        UnboundVariableError
+            If a variable of the expression has no value in bindings.
+        DivisionByZeroError
+            If the expression divides by zero.
+        ArithmeticEvaluationError
+            If applying an operator or a function fails for another arithmetic reason.
+        """
+        if backend is None and registry is None:
+            tables = self._tables
+            if tables is None:
+                tables = self._tables = self._buildTables(self.backend, self.registry)
+        else:
+            tables = self._buildTables(backend if backend is not None else self.backend,
+                                       registry if registry is not None else self.registry)
+        operatorFunctions, arities, functions = tables
+        integers = self.integers
+        floats = self.floats
+        texts = self.texts
+        nextArgument = iter(self.arguments).__next__
+        operandStack = []
+        push = operandStack.append
+        pop = operandStack.pop
+        for index, opcode in enumerate(self.opcodes):
+            if opcode >= ADD:
+                try:
+                    if opcode < BINARY:
+                        operand2 = pop()
+                        push(functions[opcode](pop(), operand2))
+                    else:
+                        name = texts[nextArgument()]
+                        arity = arities[name]
+                        operands = operandStack[-arity:]
+                        del operandStack[-arity:]
+                        push(operatorFunctions[name](*operands))
+                except ZeroDivisionError:
+                    raise DivisionByZeroError("Division by zero.", self.positions[index]) from None
+                except (ArithmeticError, ValueError) as error:
+                    raise ArithmeticEvaluationError(arithmeticErrorMessage(error), self.positions[index]) from None
+            elif opcode == PUSH_INTEGER:
+                push(integers[nextArgument()])
+            elif opcode == PUSH_FLOAT:
+                push(floats[nextArgument()])
+            elif opcode == LOAD:
+                name = texts[nextArgument()]
+                try:
+                    push(bindings[name])
+                except (KeyError, TypeError):
+                    raise UnboundVariableError("Variable \"" + name + "\" has no value.",
+                                               self.positions[index]) from None
+            else:
+                push(_parseLiteral(texts[nextArgument()]))
+        return operandStack[0]
+
+    @staticmethod
+    def _buildTables(backend, registry):
+        """
+        Returns the functions of the operators, the arities and the functions of the
+        opcodes of +, -, * and / that evaluate() uses.
+        """
+        operatorFunctions = registry.functionsFor(backend.operatorFunctions)
+        return (operatorFunctions, registry.arities,
+                [None] * ADD + [operatorFunctions[symbol] for symbol in OPCODE_OPERATORS])
+
+    def toCompiledExpression(self, backend=None, registry=None):
+        """
+        Returns the expression as a CompiledExpression again, e.g. to evaluate it many
+        times or with Calculator.evaluateBatch().
+
+        Parameters
+        ----------
+        backend : NumericBackend
+            The numeric backend of the expression (the backend attribute if left out).
+        registry : OperatorRegistry
+            The registry of the operators and functions (the registry attribute if left
+            out).
+
+        Returns
+        ------
+        compiledExpression : CompiledExpression
+            The expression.
+        """
+        from CompiledExpression import CompiledExpression
+
+        if backend is None:
+            backend = self.backend
+        if registry is None:
+            registry = self.registry
+        return CompiledExpression(self.toPostfix(), registry.functionsFor(backend.operatorFunctions), backend, registry)
+
+    def toPostfix(self):
+        """
+        Returns the (kind, value, position) tuples of the expression in postfix order, as
+        stored in CompiledExpression.postfix.
+
+        Returns
+        ------
+        postfix : tuple
+            The tuples of the expression.
+        """
+        texts = self.texts
+        # The operands of every opcode that takes an argument, indexed by the opcode.
+        pools = (self.integers.tolist(), self.floats.tolist(), _Literals(texts), texts) + (None,) * 4 + (texts,) * 3
+        kinds = (NUMBER, NUMBER, NUMBER, VARIABLE) + (OPERATOR,) * 4 + (OPERATOR, UNARY_OPERATOR, FUNCTION)
+        symbols = (None,) * ADD + tuple(OPCODE_OPERATORS)
+        nextArgument = iter(self.arguments).__next__
+        postfix = []
+        append = postfix.append
+        for opcode, position in zip(self.opcodes, self.positions):
+            if ADD <= opcode < BINARY:
+                append((OPERATOR, symbols[opcode], position))
+            else:
+                append((kinds[opcode], pools[opcode][nextArgument()], position))
+        return tuple(postfix)
+
+
+def _indexOf(text, texts, textIndexes):
+    index = textIndexes.get(text)
+    if index is None:
+        index = textIndexes[text] = len(texts)
+        texts.append(text)
+    return index
+
+
+class _Literals(dict):
+    """
+    The constants stored as text, converted the first time they are needed.
+    """
+
+    __slots__ = ("texts",)
+
+    def __init__(self, texts):
+        super().__init__()
+        self.texts = texts
+
+    def __missing__(self, index):
+        value = self[index] = _parseLiteral(self.texts[index])
+        return value
+
+
+def _parseLiteral(text):
+    """
+    Converts a constant stored as text back to its value (see _LITERAL_TAGS).
+    """
+    kind, text = text[0], text[1:]
+    if kind == "+":
+        return int(text)
+    elif kind == ".":
+        import decimal
+
+        return decimal.Decimal(text)
+    import fractions
+
+    return fractions.Fraction(text)
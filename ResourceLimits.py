@@ -0,0 +1,238 @@
+"""
+Budgets for expressions that come from untrusted users, so that a single pathological
+input (a megabyte-long chain, parentheses nested thousands of levels deep, a number with
+a million digits or 9 ^ 9 ^ 9) is rejected right away instead of keeping a worker busy,
+e.g.
+
+    inputParser = InputParser(limits=ResourceLimits(maxLength=1000))
+    inputParser.compile("9 ^ 9 ^ 9").evaluate()  # raises ResourceLimitError
+"""
+
+import math
+
+from CalculatorErrors import ResourceLimitError
+from InputParser import FUNCTION, LEFT_PARENTHESIS, NUMBER, OPERATOR, RIGHT_PARENTHESIS, UNARY_OPERATOR
+
+
+class _GuardedFunctions(dict):
+    """
+    The functions of a Mapping of operator functions, each wrapped by
+    ResourceLimits._guard() the first time it is looked up, so functions that are
+    registered later are guarded as well.
+    """
+
+    def __init__(self, limits, operatorFunctions):
+        super().__init__()
+        self._limits = limits
+        self._operatorFunctions = operatorFunctions
+
+    def __missing__(self, name):
+        function = self[name] = self._limits._guard(name, self._operatorFunctions[name])
+        return function
+
+
+class ResourceLimits:
+    """
+    The resources an expression may use. The length of the expression is checked before
+    it is tokenized and the number of tokens, the depth of the parentheses, the digits of
+    every number and the number of operations are checked right after, before any number
+    is converted or anything is evaluated. Since expressions have no loops, every
+    operation is applied at most once per evaluation, so the number of operations is
+    the budget of the time an evaluation takes, as long as no single operation is slow.
+    That is what the magnitude limit is for: every result of an operator or function is
+    checked against it, and ^ estimates the size of its result before it computes it, so
+    no operation ever works on numbers bigger than maxMagnitude.
+
+    Every limit can be None to leave it out. Violations raise a ResourceLimitError,
+    whose limit attribute names the limit that was exceeded.
+
+    ...
+
+    Attributes
+    ----------
+    maxLength : int
+        The maximum number of characters of an expression.
+    maxTokens : int
+        The maximum number of tokens (numbers, names, operators, parentheses and commas).
+    maxDepth : int
+        The maximum number of parentheses that are open at the same time.
+    maxLiteralDigits : int
+        The maximum number of digits of a number in the expression.
+    maxMagnitude : Integer or Float
+        The maximum absolute value of any result of an operator or function.
+    maxOperations : int
+        The maximum number of operators and functions, i.e. of operations per evaluation.
+
+    Methods
+    -------
+    checkLength(inputExpression)
+        Rejects expressions that are too long.
+
+    checkTokens(tokens)
+        Rejects expressions with too many tokens, too deep parentheses, too long numbers
+        or too many operations.
+
+    guard(operatorFunctions)
+        Returns the operator functions wrapped so their results are checked.
+
+    """
+
+    powerOperators = frozenset(["^"])
+
+    def __init__(self, maxLength=10000, maxTokens=2000, maxDepth=100, maxLiteralDigits=100, maxMagnitude=10 ** 308,
+                 maxOperations=1000):
+        """
+        Initializes the class variables.
+
+        Parameters
+        ----------
+        maxLength : int
+            The maximum number of characters of an expression.
+        maxTokens : int
+            The maximum number of tokens of an expression.
+        maxDepth : int
+            The maximum depth of the parentheses.
+        maxLiteralDigits : int
+            The maximum number of digits of a number.
+        maxMagnitude : Integer or Float
+            The maximum absolute value of any result. The default is about the biggest
+            float, so integers cannot grow beyond what a float can hold either.
+        maxOperations : int
+            The maximum number of operators and functions of an expression.
+        """
+        self.maxLength = maxLength
+        self.maxTokens = maxTokens
+        self.maxDepth = maxDepth
+        self.maxLiteralDigits = maxLiteralDigits
+        self.maxMagnitude = maxMagnitude
+        self.maxOperations = maxOperations
+        self._guarded = {}
+
+    def __repr__(self):
+        return "ResourceLimits(maxLength=%r, maxTokens=%r, maxDepth=%r, maxLiteralDigits=%r, maxMagnitude=%r, " \
+               "maxOperations=%r)" % (self.maxLength, self.maxTokens, self.maxDepth, self.maxLiteralDigits,
+                                      self.maxMagnitude, self.maxOperations)
+
+    def __getstate__(self):
+        # The guarded functions are closures, which cannot be sent to worker processes.
+        state = self.__dict__.copy()
+        state["_guarded"] = {}
+        return state
+
+    def checkLength(self, inputExpression):
+        """
+        Checks the length of an expression before anything else is done with it.
+
+        Parameters
+        ----------
+        inputExpression : str
+            The arithmetic expression.
+
+        Raises
+        ------
+        ResourceLimitError
+            If the expression is longer than maxLength, at the first character past it.
+        """
+        if self.maxLength is not None and len(inputExpression) > self.maxLength:
+            raise ResourceLimitError("The expression is longer than " + str(self.maxLength) + " characters.",
+                                     self.maxLength, "maxLength")
+
+    def checkTokens(self, tokens):
+        """
+        Checks the tokens of an expression in a single pass, before its numbers are
+        converted.
+
+        Parameters
+        ----------
+        tokens : list
+            The (kind, text, position) tuples returned by InputParser.tokenize().
+
+        Raises
+        ------
+        ResourceLimitError
+            If there are more than maxTokens tokens, more than maxDepth open parentheses,
+            a number with more than maxLiteralDigits digits or more than maxOperations
+            operators and functions, at the first token past the limit.
+        """
+        if self.maxTokens is not None and len(tokens) > self.maxTokens:
+            raise ResourceLimitError("The expression has more than " + str(self.maxTokens) + " tokens.",
+                                     tokens[self.maxTokens][2], "maxTokens")
+        maxDepth = self.maxDepth if self.maxDepth is not None else math.inf
+        maxLiteralDigits = self.maxLiteralDigits if self.maxLiteralDigits is not None else math.inf
+        maxOperations = self.maxOperations if self.maxOperations is not None else math.inf
+        depth = 0
+        operations = 0
+        for kind, text, position in tokens:
+            if kind == NUMBER:
+                if len(text) > maxLiteralDigits and len(text) - (text[0] in "+-") - ("." in text) > maxLiteralDigits:
+                    raise ResourceLimitError("The number has more than " + str(maxLiteralDigits) + " digits.",
+                                             position, "maxLiteralDigits")
+            elif kind == LEFT_PARENTHESIS:
+                depth += 1
+                if depth > maxDepth:
+                    raise ResourceLimitError("The expression nests parentheses more than " + str(maxDepth)
+                                             + " levels deep.", position, "maxDepth")
+            elif kind == RIGHT_PARENTHESIS:
+                depth -= 1
+            elif kind == OPERATOR or kind == UNARY_OPERATOR or kind == FUNCTION:
+                operations += 1
+                if operations > maxOperations:
+                    raise ResourceLimitError("The expression has more than " + str(maxOperations) + " operations.",
+                                             position, "maxOperations")
+
+    def guard(self, operatorFunctions):
+        """
+        Wraps every operator and function so that a result bigger than maxMagnitude
+        raises a ResourceLimitError, and ^ raises it before it computes such a result.
+
+        Parameters
+        ----------
+        operatorFunctions : Mapping
+            Maps the name of every operator and function to the function that applies it
+            (e.g. returned by OperatorRegistry.functionsFor()).
+
+        Returns
+        ------
+        operatorFunctions : Mapping
+            The wrapped functions, or operatorFunctions itself if there is no maxMagnitude.
+            The same Mapping is returned for the same functions.
+        """
+        if self.maxMagnitude is None:
+            return operatorFunctions
+        # OperatorRegistry.functionsFor() can return a new ChainMap of the same dictionaries.
+        maps = tuple(getattr(operatorFunctions, "maps", (operatorFunctions,)))
+        key = tuple([id(mapping) for mapping in maps])
+        cached = self._guarded.get(key)
+        if cached is None or any([mapping is not cachedMapping for mapping, cachedMapping in zip(maps, cached[0])]):
+            cached = self._guarded[key] = (maps, _GuardedFunctions(self, operatorFunctions))
+        return cached[1]
+
+    def _guard(self, name, function):
+        maxMagnitude = self.maxMagnitude
+        message = "The result is bigger than the limit of %g." % maxMagnitude
+        if name not in self.powerOperators:
+            def guarded(*operands):
+                result = function(*operands)
+                if abs(result) > maxMagnitude:
+                    raise ResourceLimitError(message, None, "maxMagnitude")
+                return result
+
+            return guarded
+
+        maxDigits = math.log10(maxMagnitude)
+
+        def guardedPower(base, exponent):
+            if base:
+                # The result has about exponent * log10(|base|) digits.
+                try:
+                    digits = float(exponent) * math.log10(abs(base))
+                except OverflowError:
+                    digits = math.inf if exponent > 0 else -math.inf
+                if digits > maxDigits:
+                    raise ResourceLimitError(message, None, "maxMagnitude")
+            result = function(base, exponent)
+            if abs(result) > maxMagnitude:
+                raise ResourceLimitError(message, None, "maxMagnitude")
+            return result
+
+        return guardedPower
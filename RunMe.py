@@ -1,16 +1,151 @@
 """
 This file is a very basic interface for the calculator.
 It calls relevant functions as they are needed.
+
+Without arguments, the calculator asks for one expression at a time. With --batch it
+reads newline-delimited expressions from the given files (or stdin) instead and writes
+one result per line, e.g.
+
+    python3 RunMe.py --batch expressions.txt --jsonl > results.jsonl
+
+With --aggregate, only statistics of the results are written instead.
+
+A single query can also be given on the command line, which prints its answer and exits:
+
+    python3 -m RunMe calculate "1 + 2"
+
+Modules are only imported once the mode that needs them is chosen, so short-lived
+processes that answer one query do not pay for the batch and interactive modes.
 """
 
-from Calculator import Calculator
-from InputParser import InputParser
-from Messages import Messages
+import sys
+
+
+def parseArguments(arguments):
+    import argparse
+
+    from NumericBackend import BACKENDS
+
+    argumentParser = argparse.ArgumentParser(description="A user-friendly calculator.")
+    argumentParser.add_argument("query", nargs="*", metavar="QUERY",
+                                help="a single query like calculate \"1 + 2\" to answer instead of asking for "
+                                     "expressions")
+    argumentParser.add_argument("--batch", nargs="*", metavar="FILE",
+                                help="evaluate the expressions in the files (or stdin if none are given or "
+                                     "for \"-\"), one per line, without any prompts")
+    argumentParser.add_argument("--jsonl", action="store_true",
+                                help="write the results of --batch as JSON lines with an error field")
+    argumentParser.add_argument("--aggregate", action="store_true",
+                                help="only write the count, sum, min, max, mean and variance of the results of "
+                                     "--batch and the number of errors of every kind")
+    argumentParser.add_argument("--workers", type=int, default=1,
+                                help="the number of processes --batch evaluates the expressions in")
+    argumentParser.add_argument("--numeric", choices=list(BACKENDS), default="float",
+                                help="evaluate with floats, exact decimals or exact fractions")
+    argumentParser.add_argument("--expression-cache", metavar="FILE",
+                                help="do not parse the expressions of --batch that are in this cache file again "
+                                     "(see PersistentExpressionCache.py)")
+    parsedArguments = argumentParser.parse_args(arguments)
+    if parsedArguments.batch is None and (parsedArguments.jsonl or parsedArguments.aggregate
+                                          or parsedArguments.workers != 1 or parsedArguments.expression_cache):
+        argumentParser.error("--jsonl, --aggregate, --workers and --expression-cache can only be used with --batch")
+    if parsedArguments.query and parsedArguments.batch is not None:
+        argumentParser.error("a query cannot be combined with --batch")
+    if parsedArguments.workers < 1:
+        argumentParser.error("--workers has to be at least 1")
+    return parsedArguments
+
+
+def readLines(fileNames):
+    for fileName in fileNames or ["-"]:
+        if fileName == "-":
+            yield from sys.stdin
+        else:
+            with open(fileName) as file:
+                yield from file
+
+
+def calculate(query, backend=None):
+    """
+    Prints the answer to a single query, like "calculate 1 + 2" or "calculate \"1 + 2\"",
+    and returns the exit status.
+    """
+    from CalculatorErrors import CalculatorError, formatValue
+    from InputParser import InputParser
 
+    words = query.split(None, 1)
+    if "\"" not in query and words and words[0] == "calculate":
+        query = words[1] if len(words) > 1 else ""
+    try:
+        print(formatValue(InputParser(backend=backend).compile(query, allowVariables=False).evaluate()))
+    except CalculatorError as error:
+        print("Error: " + str(error))
+        return 1
+    return 0
 
-def main():
-    inputParser = InputParser()
-    calculator = Calculator()
+
+def openExpressionCache(path):
+    from PersistentExpressionCache import PersistentExpressionCache
+
+    try:
+        return PersistentExpressionCache(path)
+    except (OSError, ValueError) as error:
+        # A missing or outdated cache only makes the start slower.
+        print("Not using the expression cache: " + str(error), file=sys.stderr)
+        return None
+
+
+def runBatch(fileNames, jsonLines, workers, backend=None, expressionCache=None, aggregate=False):
+    from BatchEvaluator import BatchEvaluator
+    from ExpressionCache import ExpressionCache
+    from InputParser import InputParser
+
+    persistentCache = openExpressionCache(expressionCache) if expressionCache else None
+    inputParser = InputParser(backend=backend, persistentCache=persistentCache)
+    batchEvaluator = BatchEvaluator(inputParser, cache=ExpressionCache(), workers=workers)
+    if not aggregate:
+        batchEvaluator.run(readLines(fileNames), sys.stdout, jsonLines)
+        return
+    statistics = batchEvaluator.aggregate(batchEvaluator.readExpressions(readLines(fileNames))).toDict()
+    if jsonLines:
+        import json
+
+        print(json.dumps(statistics, default=str))
+    else:
+        for name, value in statistics.items():
+            print(name + ": " + str(value))
+
+
+def main(arguments=None):
+    if arguments is None:
+        arguments = sys.argv[1:]
+    # The most common one-shot query does not need the argument parser.
+    if len(arguments) == 2 and arguments[0] == "calculate":
+        return calculate(" ".join(arguments))
+
+    from NumericBackend import getBackend
+
+    parsedArguments = parseArguments(arguments)
+    backend = getBackend(parsedArguments.numeric)
+    if parsedArguments.query:
+        return calculate(" ".join(parsedArguments.query), backend)
+    if parsedArguments.batch is not None:
+        runBatch(parsedArguments.batch, parsedArguments.jsonl, parsedArguments.workers, backend,
+                 parsedArguments.expression_cache, parsedArguments.aggregate)
+        return 0
+    runInteractive(backend)
+    return 0
+
+
+def runInteractive(backend=None):
+    from CalculatorErrors import CalculatorError, formatValue
+    from IncrementalParser import IncrementalParser
+    from InputParser import InputParser
+    from Messages import Messages
+
+    inputParser = InputParser(backend=backend)
+    incrementalParser = IncrementalParser(inputParser, allowVariables=False)
+    state = None
     messages = Messages()
     print(messages.welcomeMessage)
 
@@ -23,14 +158,20 @@ def main():
             elif userInput == "help" or userInput == "Help":
                 print(messages.helpMessage)
             else:
-                userExpression = inputParser.parseInput(userInput)
-                if userExpression is None:
-                    continue
-                result = calculator.evaluateExpression(userExpression)
-                print("Answer: " + str(result))
+                expression = inputParser.extractExpression(userInput)
+                # Expressions are often typed again with a small change, so only the
+                # part that differs from the last one is parsed again.
+                if state is None:
+                    state = incrementalParser.parse(expression)
+                else:
+                    state = incrementalParser.update(state, expression)
+                print("Answer: " + formatValue(state.evaluate()))
+
+        except CalculatorError as error:
+            print("Error: " + str(error))
 
         except Exception as error:
             print( "error: " + str(error))
             pass
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,221 @@
+class RunningStatistics:
+    """
+    Statistics of a stream of values that are updated one value at a time, so that the
+    values never have to be stored: count, sum, minimum, maximum, mean and variance, and
+    the number of errors of every kind. The mean and variance are updated with Welford's
+    algorithm, which does not lose precision the way summing the squares does. As long as
+    all values are integers, whose sums are exact, only their sum and the sum of their
+    squares are kept. The statistics of separate streams (e.g. of worker processes) can
+    be merged.
+
+    Works with every numeric backend: with Decimals or Fractions, the sum and mean stay
+    exact, also when some of the values are integers.
+
+    ...
+
+    Attributes
+    ----------
+    count : int
+        The number of values.
+    sum : Integer or Float
+        The sum of the values.
+    min : Integer or Float
+        The smallest value, or None if there are none.
+    max : Integer or Float
+        The biggest value, or None if there are none.
+    mean : Integer or Float
+        The mean of the values, or None if there are none. The mean of integers is a
+        Float, just like the result of dividing them.
+    errorCount : int
+        The number of errors.
+    errorCounts : dict
+        Maps the code of every kind of error (see CalculatorErrors) to how often it occurred.
+
+    Methods
+    -------
+    add(value)
+        Adds a value.
+
+    addError(errorCode)
+        Counts an error.
+
+    addResult(result)
+        Adds the value or counts the error of an EvaluationResult.
+
+    merge(other)
+        Adds the values and errors counted by other RunningStatistics.
+
+    toDict()
+        Returns the statistics as a dictionary.
+
+    """
+
+    __slots__ = ("count", "sum", "min", "max", "_mean", "_squaredDeviations", "_sumOfSquares", "errorCount", "errorCounts")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self._mean = 0
+        self._squaredDeviations = 0
+        self._sumOfSquares = 0
+        self.errorCount = 0
+        self.errorCounts = {}
+
+    def __repr__(self):
+        return "RunningStatistics(count=" + repr(self.count) + ", mean=" + repr(self.mean) + ", errors=" \
+            + repr(self.errorCount) + ")"
+
+    @property
+    def mean(self):
+        """
+        The mean of the values, or None if there are none.
+        """
+        if not self.count:
+            return None
+        return self.sum / self.count if self.sum.__class__ is int else self._mean
+
+    @property
+    def variance(self):
+        """
+        The population variance of the values, or None if there are none.
+        """
+        if not self.count:
+            return None
+        if self.sum.__class__ is int:
+            return (self.count * self._sumOfSquares - self.sum * self.sum) / (self.count * self.count)
+        return self._squaredDeviations / self.count
+
+    @property
+    def sampleVariance(self):
+        """
+        The sample variance of the values, or None if there are fewer than two.
+        """
+        if self.count < 2:
+            return None
+        if self.sum.__class__ is int:
+            return (self.count * self._sumOfSquares - self.sum * self.sum) / (self.count * (self.count - 1))
+        return self._squaredDeviations / (self.count - 1)
+
+    def _state(self, numberType):
+        """
+        Returns the mean and the sum of the squared deviations of the values, computed
+        exactly as numberType (e.g. Decimal) if all values are integers.
+        """
+        if self.sum.__class__ is not int:
+            return self._mean, self._squaredDeviations
+        if not self.count:
+            return 0, 0
+        return numberType(self.sum) / self.count, \
+            numberType(self.count * self._sumOfSquares - self.sum * self.sum) / self.count
+
+    def add(self, value):
+        """
+        Adds a value to the statistics.
+
+        Parameters
+        ----------
+        value : Integer or Float
+            The value.
+        """
+        if self.sum.__class__ is int:
+            if value.__class__ is int:
+                self._sumOfSquares += value * value
+            else:
+                # Dividing integers would give a Float, so the statistics of the integers
+                # so far are converted to the type of the first value that is not one.
+                self._mean, self._squaredDeviations = self._state(value.__class__)
+        self.count += 1
+        self.sum += value
+        if self.count == 1:
+            self.min = self.max = value
+        elif value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        if self.sum.__class__ is not int:
+            delta = value - self._mean
+            self._mean += delta / self.count
+            self._squaredDeviations += delta * (value - self._mean)
+
+    def addError(self, errorCode):
+        """
+        Counts an error.
+
+        Parameters
+        ----------
+        errorCode : str
+            The code of the error.
+        """
+        self.errorCount += 1
+        self.errorCounts[errorCode] = self.errorCounts.get(errorCode, 0) + 1
+
+    def addResult(self, result):
+        """
+        Adds the value or counts the error of a result.
+
+        Parameters
+        ----------
+        result : EvaluationResult
+            The result of evaluating an expression.
+        """
+        if result.errorCode is None:
+            self.add(result.value)
+        else:
+            self.addError(result.errorCode)
+
+    def merge(self, other):
+        """
+        Adds the values and errors counted by other statistics, as if they had been added
+        to these ones (Chan et al.'s formula for combining variances).
+
+        Parameters
+        ----------
+        other : RunningStatistics
+            The statistics to add. They are not changed.
+
+        Returns
+        ------
+        self : RunningStatistics
+            These statistics.
+        """
+        for errorCode, count in other.errorCounts.items():
+            self.errorCounts[errorCode] = self.errorCounts.get(errorCode, 0) + count
+        self.errorCount += other.errorCount
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.sum, self.min, self.max = other.count, other.sum, other.min, other.max
+            self._mean, self._squaredDeviations = other._mean, other._squaredDeviations
+            self._sumOfSquares = other._sumOfSquares
+            return self
+        count = self.count + other.count
+        if self.sum.__class__ is int and other.sum.__class__ is int:
+            self._sumOfSquares += other._sumOfSquares
+        else:
+            numberType = (other if self.sum.__class__ is int else self)._mean.__class__
+            mean, squaredDeviations = self._state(numberType)
+            otherMean, otherSquaredDeviations = other._state(numberType)
+            delta = otherMean - mean
+            self._mean = mean + delta * other.count / count
+            self._squaredDeviations = squaredDeviations + otherSquaredDeviations \
+                + delta * delta * self.count * other.count / count
+        self.count = count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def toDict(self):
+        """
+        Returns the statistics.
+
+        Returns
+        ------
+        statistics : dict
+            The "count", "sum", "min", "max", "mean" and "variance" of the values, the
+            number of "errors" and the number of errors of every kind ("errorCounts").
+        """
+        return {"count": self.count, "sum": self.sum, "min": self.min, "max": self.max, "mean": self.mean,
+                "variance": self.variance, "errors": self.errorCount, "errorCounts": dict(self.errorCounts)}
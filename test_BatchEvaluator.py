@@ -0,0 +1,111 @@
+import io
+import json
+import math
+import operator
+
+from BatchEvaluator import BatchEvaluator
+from EvaluationResult import EvaluationResult
+from ExpressionCache import ExpressionCache
+from ExpressionOptimizer import ExpressionOptimizer
+from InputParser import InputParser
+from OperatorRegistry import OperatorRegistry
+
+
+def testEvaluate():
+    batchEvaluator = BatchEvaluator()
+    results = list(batchEvaluator.evaluate(["1 + 2", "4*5/2", "1/0", "2+-+-4"]))
+    assert results[0] == ("1 + 2", EvaluationResult(3)), "Should be 3."
+    assert results[1] == ("4*5/2", EvaluationResult(10.0)), "Should be 10."
+    assert results[2] == ("1/0", EvaluationResult(None, "DIVISION_BY_ZERO", 1, "Division by zero.")), \
+        "Should be a division by zero."
+    assert (results[3][1].errorCode, results[3][1].errorPosition) == ("SYNTAX_ERROR", 4), "Should be a syntax error."
+
+
+def testRun():
+    output = io.StringIO()
+    BatchEvaluator().run(io.StringIO("1 + 2\n(4-2)*3.5\n19 + $\n"), output, chunkSize=2)
+    assert output.getvalue() == "3\n7.0\nError: Invalid input. Please enter a valid arithmetic expression.\n", \
+        "Should write one result per line."
+
+
+def testRunJsonLines():
+    output = io.StringIO()
+    BatchEvaluator().run(["1 + 2\r\n", "1/0\n"], output, jsonLines=True)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines == [{"expression": "1 + 2", "value": 3, "error": None, "errorCode": None, "errorPosition": None},
+                     {"expression": "1/0", "value": None, "error": "Division by zero.",
+                      "errorCode": "DIVISION_BY_ZERO", "errorPosition": 1}], "Should write JSON lines."
+
+
+def testTooManyDigits():
+    output = io.StringIO()
+    BatchEvaluator().run(["10^5000\n", "1 + 2\n"], output)
+    assert output.getvalue() == "Error: The result has too many digits to be written out.\n3\n", \
+        "Should only fail the line with too many digits."
+    output = io.StringIO()
+    BatchEvaluator().run(["10^5000\n", "1 + 2\n"], output, jsonLines=True)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(line["errorCode"], line["value"]) for line in lines] == [("ARITHMETIC_ERROR", None), (None, 3)], \
+        "Should only fail the line with too many digits."
+
+
+def testCache():
+    cache = ExpressionCache()
+    batchEvaluator = BatchEvaluator(cache=cache)
+    values = [result.value for expression, result in batchEvaluator.evaluate(["1 + 2", "3 * 4", "1 + 2"])]
+    assert values == [3, 12, 3], "Should be correct."
+    assert (cache.hits, cache.misses) == (1, 2), "Repeated expressions should be compiled once."
+
+
+def testEvaluateInParallel():
+    expressions = [str(i) + " * 2 / (" + str(i % 5) + ")" for i in range(100)]
+    expected = list(BatchEvaluator().evaluate(expressions))
+    batchEvaluator = BatchEvaluator(cache=ExpressionCache(), workers=2, chunkSize=7)
+    assert list(batchEvaluator.evaluate(expressions)) == expected, "Should match the results in input order."
+    assert list(batchEvaluator.evaluate([])) == [], "Should be empty."
+
+
+def testAggregate():
+    expressions = [str(i) + " * 2 / (" + str(i % 5) + ")" for i in range(100)] + ["1 +", "x"]
+    statistics = BatchEvaluator().aggregate(iter(expressions))
+    values = [result.value for expression, result in BatchEvaluator().evaluate(expressions) if not result.isError]
+    assert (statistics.count, statistics.sum, statistics.min, statistics.max) == \
+        (80, sum(values), min(values), max(values)), "Should only count the values."
+    assert statistics.errorCounts == {"DIVISION_BY_ZERO": 20, "SYNTAX_ERROR": 1, "UNBOUND_VARIABLE": 1}, \
+        "Should count the errors by kind."
+    parallelStatistics = BatchEvaluator(workers=2, chunkSize=7).aggregate(expressions)
+    assert parallelStatistics.count == 80 and parallelStatistics.errorCounts == statistics.errorCounts, \
+        "Should merge the statistics of the workers."
+    assert abs(parallelStatistics.variance - statistics.variance) < 1e-9, "Should be the same variance."
+
+
+def testWorkersUseTheParser():
+    registry = OperatorRegistry()
+    registry.registerOperator("+", operator.add, 2)
+    registry.registerOperator("*", operator.mul, 3)
+    registry.registerOperator("#", operator.sub, 2)
+    registry.registerFunction("hypot", math.hypot, arity=2)
+    inputParser = InputParser(optimizer=ExpressionOptimizer(registry.operatorFunctions, registry), registry=registry)
+    expressions = ["5 # 3", "hypot(3, 4) * 2", "x * 0 + 1"] * 5
+    expected = list(BatchEvaluator(inputParser).evaluate(expressions))
+    assert expected[0][1].value == 2, "# should subtract."
+    batchEvaluator = BatchEvaluator(inputParser, workers=2, chunkSize=2)
+    assert list(batchEvaluator.evaluate(expressions)) == expected, "The workers should use the same registry."
+    statistics = batchEvaluator.aggregate(expressions)
+    assert (statistics.count, statistics.sum, statistics.errorCounts) == (10, 60.0, {"UNBOUND_VARIABLE": 5}), \
+        "The workers should use the same registry."
+
+
+def main():
+    testEvaluate()
+    testRun()
+    testRunJsonLines()
+    testTooManyDigits()
+    testCache()
+    testEvaluateInParallel()
+    testAggregate()
+    testWorkersUseTheParser()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import random
+
+import Benchmark
+from InputParser import InputParser
+
+
+def testCorporaAreValid():
+    inputParser = InputParser()
+    for corpus, (generator, count) in Benchmark.CORPORA.items():
+        for expression in generator(3, random.Random(0)):
+            assert inputParser.checkForInvalidInput(expression) == False, "Should be valid: " + corpus
+            assert inputParser.parseInput(expression) is not None, "Should parse: " + corpus
+
+
+def testCorporaAreReproducible():
+    first = Benchmark.generateSignedDecimalExpressions(5, random.Random(42))
+    second = Benchmark.generateSignedDecimalExpressions(5, random.Random(42))
+    assert first == second, "The same seed should generate the same corpus."
+
+
+def testRunBenchmark():
+    results = Benchmark.runBenchmark(corpora=["short", "nested"], stages=["tokenize", "evaluatePostfixExp"],
+                                     scale=0.01, repeat=1)
+    assert sorted(results) == ["nested", "short"], "Should have results for every corpus."
+    for stageResults in results.values():
+        assert sorted(stageResults) == ["evaluatePostfixExp", "tokenize"], "Should have results for every stage."
+        for statistics in stageResults.values():
+            assert statistics["throughput"] > 0 and 0 <= statistics["p50"] <= statistics["p99"], \
+                "Statistics should be consistent."
+
+
+def testCompareToBaseline():
+    baseline = {"short": {"tokenize": {"throughput": 100.0, "p50": 10.0, "p99": 20.0}}}
+    results = {"short": {"tokenize": {"throughput": 50.0, "p50": 20.0, "p99": 40.0},
+                         "compile": {"throughput": 50.0, "p50": 20.0, "p99": 40.0}}}
+    assert Benchmark.compareToBaseline(results, baseline) == [("short", "tokenize", 2.0)], "Should be a regression."
+    assert Benchmark.compareToBaseline(results, baseline, threshold=3.0) == [], "Should be within the threshold."
+
+
+def testStartupImportsOnlyTheCalculator():
+    startup = Benchmark.measureStartup(repeat=1)
+    assert "InputParser" in startup["modules"], "Should import the parser."
+    for module in ["argparse", "decimal", "json", "threading", "numpy", "BatchEvaluator"]:
+        assert module not in startup["modules"], "Should not import " + module + " to answer one query."
+
+
+def main():
+    testCorporaAreValid()
+    testCorporaAreReproducible()
+    testRunBenchmark()
+    testCompareToBaseline()
+    testStartupImportsOnlyTheCalculator()
+
+
+if __name__ == "__main__":
+    main()
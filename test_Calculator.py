@@ -1,4 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
 from Calculator import Calculator
+from InputParser import InputParser
 
 
 def testIsOperand():
@@ -30,12 +35,73 @@ def testEvaluatePostfixExp():
     assert calculator.evaluatePostfixExp("4 5 * 2 /") == 10, "Should be 10."
     assert calculator.evaluatePostfixExp("-5 -8 + -11 2 * -") == 9, "Should be 9."
     assert calculator.evaluatePostfixExp("-.32 .5 /") == -0.64, "Should be -0.64."
+    assert calculator.evaluatePostfixExp("1 0 /") is None, "Should be None."
+
+
+def testEvaluatePostfixExpWithBindings():
+    calculator = Calculator()
+    assert calculator.isVariable("price") == True, "Should be True."
+    assert calculator.isVariable("-12121") == False, "Should be False."
+    assert calculator.evaluatePostfixExp("price cost - qty *", {"price": 5, "cost": 3, "qty": 2}) == 4, \
+        "Should be 4."
+    with pytest.raises(NameError):
+        calculator.evaluatePostfixExp("price 2 *")
+
+
+def testEvaluateBatch():
+    numpy = pytest.importorskip("numpy")
+    calculator = Calculator()
+    compiledExpression = InputParser().compile("(4 - 2) * 3.5")
+    columns = [numpy.array([4, 5, 6]), None, [1.0, 2.0, 3.0]]
+    values, errorMask = calculator.evaluateBatch(compiledExpression, columns)
+    assert values.tolist() == [2.0, 6.0, 12.0], "Should be evaluated row by row."
+    assert errorMask.tolist() == [False, False, False], "No row should have an error."
+
+    compiledExpression = InputParser().compile("1 / (2 - 2) + 1")
+    values, errorMask = calculator.evaluateBatch(compiledExpression, [numpy.array([1, 2, 3]), None, [2, 3, 1], None])
+    assert errorMask.tolist() == [True, False, False], "Only the first row divides by zero."
+    assert numpy.isnan(values[0]) and values[1:].tolist() == [-1.0, 4.0], "Other rows should be kept."
+
+    with pytest.raises(ValueError):
+        calculator.evaluateBatch(compiledExpression, [None])
+
+    compiledExpression = InputParser().compile("(price - cost) * 2")
+    values, errorMask = calculator.evaluateBatch(compiledExpression, {"price": [5, 6], "cost": numpy.array([1, 2])})
+    assert values.tolist() == [8, 8], "Variables should be bound to their columns."
+    with pytest.raises(NameError):
+        calculator.evaluateBatch(compiledExpression, {"price": [5, 6]})
+
+    compiledExpression = InputParser().compile("x ^ -1 + (-x) ^ 0.5")
+    values, errorMask = calculator.evaluateBatch(compiledExpression, {"x": numpy.array([0, 2, 4])})
+    assert errorMask.tolist() == [True, False, False], "Only the first row divides by zero."
+    assert numpy.isnan(values).all(), "Rows without a real power should be NaN."
+    values, errorMask = calculator.evaluateBatch(InputParser().compile("x ^ -1"), {"x": numpy.array([1, 2, 4])})
+    assert values.tolist() == [1.0, 0.5, 0.25] and not errorMask.any(), \
+        "Integers should be raised to negative powers."
+
+
+def testSharedAcrossThreads():
+    calculator = Calculator()
+    inputParser = InputParser()
+    expressions = ["%d * (3.5 - %d) / 2 + max(%d, 4) ^ 2" % (i, i % 7, i) for i in range(300)]
+
+    def evaluate(expression):
+        return calculator.evaluatePostfixExp(inputParser.parseInput(expression))
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(evaluate, expressions))
+    assert results == [evaluate(expression) for expression in expressions], "Threads should not share stacks."
+    assert calculator.evaluatePostfixExp("1 0 /") is None, "Should fail."
+    assert calculator.evaluatePostfixExp("1 2 +") == 3, "The stack should be empty after an error."
 
 
 def main():
     testIsOperand()
     testApplyOperator()
     testEvaluatePostfixExp()
+    testEvaluatePostfixExpWithBindings()
+    testEvaluateBatch()
+    testSharedAcrossThreads()
 
 
 if __name__ == "__main__":
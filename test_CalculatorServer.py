@@ -0,0 +1,107 @@
+import asyncio
+import os
+import tempfile
+
+from CalculatorErrors import TOO_MANY_DIGITS_MESSAGE
+from CalculatorServer import CalculatorServer
+
+
+async def sendLines(reader, writer, data, count):
+    writer.write(data)
+    writer.write_eof()
+    await writer.drain()
+    answers = [(await reader.readline()).decode() for i in range(count)]
+    writer.close()
+    await writer.wait_closed()
+    return answers
+
+
+async def runPipelinedRequests(workers):
+    calculatorServer = CalculatorServer(workers=workers, chunkSize=2)
+    server = await calculatorServer.start()
+    host, port = server.sockets[0].getsockname()[:2]
+    try:
+        connections = [await asyncio.open_connection(host, port) for i in range(5)]
+        data = b"1 + 2\n(4-2)*3.5\n1/0\n2+-+-4\n4*5/2\n"
+        return await asyncio.gather(*[sendLines(reader, writer, data, 5) for reader, writer in connections])
+    finally:
+        await calculatorServer.close()
+
+
+def testPipelinedRequests():
+    expected = ["3\n", "7.0\n", "Error: Division by zero.\n",
+                "Error: Syntax error. Please enter a valid arithmetic expression.\n", "10.0\n"]
+    for answers in asyncio.run(runPipelinedRequests(workers=0)):
+        assert answers == expected, "Every connection should get its answers in order."
+
+
+def testWorkerPool():
+    for answers in asyncio.run(runPipelinedRequests(workers=2)):
+        assert answers[0] == "3\n" and answers[4] == "10.0\n", "Workers should give the same answers."
+
+
+async def runUnixSocket(path):
+    calculatorServer = CalculatorServer()
+    await calculatorServer.startUnix(path)
+    try:
+        reader, writer = await asyncio.open_unix_connection(path)
+        return await sendLines(reader, writer, b"1 + 2\r\n3 * 4", 2)
+    finally:
+        await calculatorServer.close()
+
+
+def testUnixSocket():
+    with tempfile.TemporaryDirectory() as directory:
+        answers = asyncio.run(runUnixSocket(os.path.join(directory, "calculator.sock")))
+    assert answers == ["3\n", "12\n"], "Should answer the last line even without a newline."
+
+
+async def runLongLine():
+    calculatorServer = CalculatorServer(maxLineLength=100)
+    server = await calculatorServer.start()
+    host, port = server.sockets[0].getsockname()[:2]
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"1 + 2\n" + b"1" * 200)
+        await writer.drain()
+        answers = [(await reader.readline()).decode() for i in range(2)]
+        closed = await reader.read() == b""
+        writer.close()
+        return answers, closed
+    finally:
+        await calculatorServer.close()
+
+
+def testLongLine():
+    answers, closed = asyncio.run(runLongLine())
+    assert answers == ["3\n", "Error: Line too long.\n"], "Should reject the long line."
+    assert closed, "Should close the connection."
+
+
+async def runTooManyDigits():
+    calculatorServer = CalculatorServer()
+    server = await calculatorServer.start()
+    host, port = server.sockets[0].getsockname()[:2]
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        return await sendLines(reader, writer, b"1+1\n10^5000\n2+2\n", 3)
+    finally:
+        await calculatorServer.close()
+
+
+def testTooManyDigits():
+    answers = asyncio.run(runTooManyDigits())
+    assert answers == ["2\n", "Error: " + TOO_MANY_DIGITS_MESSAGE + "\n", "4\n"], \
+        "Only the line with too many digits should be an error."
+
+
+def main():
+    testPipelinedRequests()
+    testWorkerPool()
+    testUnixSocket()
+    testLongLine()
+    testTooManyDigits()
+
+
+if __name__ == "__main__":
+    main()
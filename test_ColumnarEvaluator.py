@@ -0,0 +1,50 @@
+import pytest
+
+from Calculator import Calculator
+from InputParser import InputParser
+
+
+def testEvaluateToFile(tmp_path):
+    numpy = pytest.importorskip("numpy")
+    import ColumnarEvaluator
+
+    numpy.save(tmp_path / "x.npy", numpy.arange(10, dtype=numpy.float64) % 4)
+    numpy.arange(10, dtype=numpy.int32).tofile(tmp_path / "y.bin")
+    columns = {"x": ColumnarEvaluator.openColumn(str(tmp_path / "x.npy")),
+               "y": ColumnarEvaluator.openColumn(str(tmp_path / "y.bin"), "int32"),
+               "z": 0.5}
+    compiledExpression = InputParser().compile("y / x + z")
+    statistics = ColumnarEvaluator.ColumnarEvaluator(chunkSize=3).evaluateToFile(
+        compiledExpression, columns, str(tmp_path / "out.npy"), str(tmp_path / "errors.npy"))
+    assert statistics == {"rows": 10, "chunks": 4, "errors": 3}, "Should evaluate 4 chunks of at most 3 rows."
+    expected, expectedErrors = Calculator().evaluateBatch(
+        compiledExpression, {"x": numpy.arange(10) % 4, "y": numpy.arange(10), "z": 0.5})
+    numpy.testing.assert_array_equal(numpy.load(tmp_path / "out.npy"), expected)
+    assert numpy.load(tmp_path / "errors.npy").tolist() == expectedErrors.tolist(), "Should flag x == 0."
+
+
+def testEvaluateChunks():
+    numpy = pytest.importorskip("numpy")
+    import ColumnarEvaluator
+
+    compiledExpression = InputParser().compile("2 * x")
+    chunks = list(ColumnarEvaluator.ColumnarEvaluator(chunkSize=4).evaluateChunks(
+        compiledExpression, {"x": numpy.arange(6)}))
+    assert [(start, values.tolist()) for start, values, errorMask in chunks] == [(0, [0, 2, 4, 6]), (4, [8, 10])], \
+        "Should evaluate 2 chunks."
+    with pytest.raises(ValueError):
+        list(ColumnarEvaluator.ColumnarEvaluator().evaluateChunks(InputParser().compile("x + y"),
+                                                                  {"x": numpy.arange(3), "y": numpy.arange(4)}))
+
+
+def testMain(tmp_path, capsys):
+    numpy = pytest.importorskip("numpy")
+    import ColumnarEvaluator
+
+    numpy.array([1.5, 2.5, 4.0]).tofile(tmp_path / "price.bin")
+    numpy.save(tmp_path / "quantity.npy", numpy.array([2, 0, 1], dtype=numpy.int64))
+    assert ColumnarEvaluator.main(["price * quantity - discount", "--column", "price=" + str(tmp_path / "price.bin"),
+                                   "--column", "quantity=" + str(tmp_path / "quantity.npy") + ":int64",
+                                   "--column", "discount=0.5", "--output", str(tmp_path / "total.npy")]) == 0
+    assert numpy.load(tmp_path / "total.npy").tolist() == [2.5, -0.5, 3.5], "Should be the totals."
+    assert "Evaluated 3 rows" in capsys.readouterr().out, "Should print a summary."
@@ -0,0 +1,69 @@
+import operator
+import random
+from decimal import Decimal
+
+import pytest
+
+from CalculatorErrors import DivisionByZeroError, UnboundVariableError
+from EvaluationResult import EvaluationResult
+from InputParser import InputParser
+from NumericBackend import getBackend
+from OperatorRegistry import OperatorRegistry
+
+
+def testSharesSubexpressions():
+    batch = InputParser().compileBatch(["(a - b) * c + 1", "(a - b) * c / 2", "c * (a - b)", "a - b"])
+    assert batch.evaluate({"a": 5, "b": 3, "c": 4}) == [9, 4.0, 8, 2], "Should be the values of the formulas."
+    assert batch.statistics() == {"formulas": 4, "operations": 9, "uniqueOperations": 4, "shared": 5}, \
+        "(a - b) * c should only be computed once."
+    assert batch.variables == ("a", "b", "c"), "Should list the variables."
+    assert InputParser().compileBatch(["1 + 1", "1.0 + 1"]).evaluate() == [2, 2.0], "1 and 1.0 are different."
+
+
+def testErrorsOnlyFailTheirFormulas():
+    batch = InputParser().compileBatch(["x / y", "x + 1", "2 * (x / y)", "z"])
+    results = batch.evaluateToResults({"x": 1, "y": 0})
+    assert results[1] == EvaluationResult(2), "Should not be affected by the division by zero."
+    assert (results[0].errorCode, results[0].errorPosition) == ("DIVISION_BY_ZERO", 2), "Should be at the /."
+    assert (results[2].errorCode, results[2].errorPosition) == ("DIVISION_BY_ZERO", 7), \
+        "Should be at the / of its own formula."
+    assert results[3].errorCode == "UNBOUND_VARIABLE", "z has no value."
+    with pytest.raises(DivisionByZeroError):
+        batch.evaluate({"x": 1, "y": 0, "z": 1})
+    with pytest.raises(UnboundVariableError):
+        batch.evaluate({"x": 1, "y": 2})
+
+
+def testSameResultsAsCompile():
+    inputParser = InputParser()
+    randomGenerator = random.Random(0)
+    pieces = ["(a - b)", "(a - b) * c", "c", "sqrt(a)", "max(a, b, c)", "2 ^ b", "1.5", "-a"]
+    formulas = []
+    for i in range(200):
+        formula = randomGenerator.choice(pieces)
+        for j in range(randomGenerator.randint(1, 4)):
+            formula = "(" + formula + ") " + randomGenerator.choice("+-*/") + " " + randomGenerator.choice(pieces)
+        formulas.append(formula)
+    batch = inputParser.compileBatch(formulas)
+    assert batch.uniqueOperationCount < batch.operationCount / 2, "Should share most operations."
+    for bindings in [{"a": 4, "b": 1, "c": 0}, {"a": -2.5, "b": 3, "c": 7}, {"a": 4, "b": 4, "c": 0.5}]:
+        expected = [inputParser.compile(formula).evaluateToResult(bindings) for formula in formulas]
+        assert batch.evaluateToResults(bindings) == expected, "Should be the same as compiling every formula."
+
+
+def testBackend():
+    batch = InputParser(backend=getBackend("decimal")).compileBatch(["0.1 + x", "(0.1 + x) * 3"])
+    assert list(batch.evaluateMany([{"x": Decimal("0.2")}])) == [[Decimal("0.3"), Decimal("0.9")]], \
+        "Should be exact."
+
+
+def testCommutativeOperators():
+    registry = OperatorRegistry()
+    registry.registerOperator("#", operator.sub, 2)
+    registry.registerOperator("&", operator.add, 2, commutative=True)
+    inputParser = InputParser(registry=registry)
+    batch = inputParser.compileBatch(["a # b", "b # a", "a & b", "b & a"])
+    assert batch.evaluate({"a": 5, "b": 3}) == [2, -2, 8, 8], "Should only swap the operands of commutative operators."
+    assert batch.uniqueOperationCount == 3, "Should share a & b and b & a only."
+    with pytest.raises(TypeError):
+        inputParser.compileBatch(["a # 1"]).evaluate({"a": "text"})
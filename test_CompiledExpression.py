@@ -0,0 +1,128 @@
+import operator
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from CalculatorErrors import CalculatorError, DivisionByZeroError, ExpressionSyntaxError, InvalidInputError, \
+    UnboundVariableError
+from EvaluationResult import EvaluationResult
+from InputParser import InputParser
+from OperatorRegistry import OperatorRegistry
+
+
+def testEvaluate():
+    inputParser = InputParser()
+    assert inputParser.compile("(4-2)*3.5").evaluate() == 7.0, "Should be 7."
+    assert inputParser.compile("calculate \"1 + 2\"").evaluate() == 3, "Should be 3."
+    assert inputParser.compile("4*5/2").evaluate() == 10, "Should be 10."
+    assert inputParser.compile("-5+-8--11*2").evaluate() == 9, "Should be 9."
+    assert inputParser.compile("-.32       /.5").evaluate() == -0.64, "Should be -0.64."
+
+
+def testEvaluateIsRepeatable():
+    compiledExpression = InputParser().compile("(1 + 2) * 3 - 4 / 2")
+    assert [compiledExpression.evaluate() for i in range(3)] == [7.0, 7.0, 7.0], "Should always be 7."
+
+
+def testOperandsAreTyped():
+    compiledExpression = InputParser().compile("1 + 2.5")
+    assert [token[1] for token in compiledExpression.postfix] == [1, 2.5, "+"], "Operands should be numbers."
+    assert type(compiledExpression.postfix[0][1]) is int, "Should be an int."
+
+
+def testIsImmutable():
+    compiledExpression = InputParser().compile("1 + 2")
+    with pytest.raises(AttributeError):
+        compiledExpression.postfix = ()
+
+
+def testErrors():
+    inputParser = InputParser()
+    with pytest.raises(ValueError):
+        inputParser.compile("19 + $")
+    with pytest.raises(SyntaxError):
+        inputParser.compile("2+-+-4")
+    with pytest.raises(ZeroDivisionError):
+        inputParser.compile("1 / (2 - 2)").evaluate()
+
+
+def testTypedErrors():
+    inputParser = InputParser()
+    with pytest.raises(InvalidInputError) as errorInfo:
+        inputParser.compile("19 + cinnamon", allowVariables=False)
+    assert (errorInfo.value.code, errorInfo.value.position) == ("INVALID_INPUT", 5), "Should point at the c."
+    with pytest.raises(ExpressionSyntaxError) as errorInfo:
+        inputParser.compile("(1 + 2")
+    assert (errorInfo.value.code, errorInfo.value.position) == ("SYNTAX_ERROR", 6), "Should point at the end."
+    with pytest.raises(DivisionByZeroError) as errorInfo:
+        inputParser.compile("1 + 4 / (2 - 2)").evaluate()
+    assert (errorInfo.value.code, errorInfo.value.position) == ("DIVISION_BY_ZERO", 6), "Should point at the /."
+    with pytest.raises(UnboundVariableError) as errorInfo:
+        inputParser.compile("2 * x").evaluate()
+    assert (errorInfo.value.code, errorInfo.value.position) == ("UNBOUND_VARIABLE", 4), "Should point at the x."
+    assert isinstance(errorInfo.value, CalculatorError), "Should be a CalculatorError."
+    with pytest.raises(InvalidInputError) as errorInfo:
+        inputParser.compile("1 + " + "9" * 5000)
+    assert errorInfo.value.position == 4, "Should point at the number with too many digits."
+
+
+def testEvaluateToResult():
+    inputParser = InputParser()
+    assert inputParser.compile("4*5/2").evaluateToResult() == EvaluationResult(10.0), "Should be 10."
+    result = inputParser.compile("1/0").evaluateToResult()
+    assert result.isError and result.value is None, "Should be an error."
+    assert (result.errorCode, result.errorPosition, result.errorMessage) == \
+        ("DIVISION_BY_ZERO", 1, "Division by zero."), "Should describe the error."
+
+
+def testVariables():
+    compiledExpression = InputParser().compile("(price - cost) * qty")
+    assert compiledExpression.variables == ("price", "cost", "qty"), "Should list the variables."
+    assert compiledExpression.evaluate({"price": 5, "cost": 3.5, "qty": 4}) == 6.0, "Should be 6."
+    bindingsSequence = [{"price": 2, "cost": 1, "qty": 3}, {"price": 10, "cost": 4, "qty": 0.5}]
+    assert list(compiledExpression.evaluateMany(bindingsSequence)) == [3, 3.0], "Should be 3 for both."
+    with pytest.raises(NameError):
+        compiledExpression.evaluate({"price": 5, "cost": 3.5})
+    with pytest.raises(NameError):
+        compiledExpression.evaluate()
+
+
+def testSharedAcrossThreads():
+    compiledExpression = InputParser().compile("(a - b) * max(a, b, 2) / (b + 1) + -a ^ 2")
+
+    def evaluateRows(a):
+        return [compiledExpression.evaluate({"a": a, "b": b}) for b in range(200)]
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(evaluateRows, range(32)))
+    assert results == [evaluateRows(a) for a in range(32)], "Threads should not see each other's registers."
+    with pytest.raises(ZeroDivisionError):
+        compiledExpression.evaluate({"a": 1, "b": -1})
+    assert compiledExpression.evaluate({"a": 1, "b": 1}) == -1.0, "Should still work after an error."
+
+
+def testReentrant():
+    registry = OperatorRegistry()
+    registry.registerOperator("+", operator.add, 2)
+    expressions = {}
+    # countDown(x) evaluates the same expression again while its registers are in use.
+    registry.registerFunction("countDown", lambda x: expressions["count"].evaluate({"x": x - 1}) if x > 0 else 0)
+    expressions["count"] = InputParser(registry=registry).compile("1 + countDown(x)")
+    assert expressions["count"].evaluate({"x": 3}) == 4, "Should be 4."
+
+
+def main():
+    testEvaluate()
+    testEvaluateIsRepeatable()
+    testOperandsAreTyped()
+    testIsImmutable()
+    testErrors()
+    testTypedErrors()
+    testEvaluateToResult()
+    testVariables()
+    testSharedAcrossThreads()
+    testReentrant()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import random
+
+import DifferentialFuzzer
+
+
+def testToText():
+    tree = ("binary", "^", ("number", "-2"), ("negate", ("number", "1")), True)
+    assert DifferentialFuzzer.toText(tree) == "(-2) ^ -(1)", "The sign should bind less tightly than ^."
+    assert DifferentialFuzzer.toText(tree, python=True) == "(-2) ** -1", "The sign should be an operator."
+    tree = ("binary", "-", ("number", "8"), ("binary", "-", ("number", ".5"), ("number", "2"), False), True)
+    assert DifferentialFuzzer.toText(tree) == "8 - (.5-2)", "Should keep the parentheses of the right operand."
+
+
+def testEvaluatePythonExpression():
+    assert DifferentialFuzzer.evaluatePythonExpression("-.5 * 2 - 3 - 4") == -8.0, "- should be left associative."
+    assert DifferentialFuzzer.evaluatePythonExpression("8 / 4 / 2") == 1.0, "/ should be left associative."
+    assert DifferentialFuzzer.evaluatePythonExpression("max(3)") == 3, "Should be 3."
+    assert DifferentialFuzzer.evaluatePythonExpression("1 // 0") is None, "Should fail."
+    assert DifferentialFuzzer.evaluatePythonExpression("(-8) ** (1 / 3)") is None, "Should not be complex."
+
+
+def testPathsAgree():
+    report = DifferentialFuzzer.fuzz(cases=3000, seed=0)
+    assert report["mismatches"] == 0, DifferentialFuzzer.formatReport(report)
+    assert all([throughput > 0 for throughput in report["throughput"].values()]), "Should report the throughput."
+
+
+def testFindsAndShrinksMismatches():
+    paths = DifferentialFuzzer.getPaths()
+    compiled = paths["compiled"]
+
+    def broken(cases):
+        # Gets every division wrong.
+        return [value + 1 if value is not None and "/" in text else value
+                for value, (text, pythonText) in zip(compiled(cases), cases)]
+
+    paths["broken"] = broken
+    report = DifferentialFuzzer.fuzz(cases=200, seed=1, paths=paths, maxFailures=2)
+    assert report["mismatches"] > 0 and len(report["failures"]) == 2, "Should find the broken divisions."
+    for failure in report["failures"]:
+        assert "/" in failure["expression"] and len(failure["expression"]) <= len(failure["original"]), \
+            "Should shrink the expression."
+        assert failure["values"]["broken"] != failure["values"]["reference"], "Should still fail."
+
+
+def testShrink():
+    randomGenerator = random.Random(2)
+    tree = ("binary", "+", DifferentialFuzzer.generateTree(randomGenerator, 4),
+            ("binary", "%", ("number", "-41.5"), ("number", "12"), True), True)
+    shrunk = DifferentialFuzzer.shrink(tree, lambda tree: "%" in DifferentialFuzzer.toText(tree))
+    assert DifferentialFuzzer.toText(shrunk) == "0 % 0", "Should be the smallest expression with a %."
@@ -0,0 +1,64 @@
+import pytest
+
+from Calculator import Calculator
+from ExpressionCache import ExpressionCache
+from InputParser import InputParser
+
+
+def testNormalize():
+    assert ExpressionCache.normalize(" (4 - 2) *  3.5 ") == "(4-2)*3.5", "Should remove the whitespaces."
+    assert ExpressionCache.normalize("4 / / 2") == "4/ /2" and ExpressionCache.normalize("ab s(-1)") == "ab s(-1)", \
+        "Should keep the whitespaces that separate tokens."
+    inputParser = InputParser(cache=ExpressionCache())
+    for expression in ["4//2", "4 / / 2", "abs(-1)", "ab s(-1)"]:
+        assert inputParser.parseInput(expression) == InputParser().parseInput(expression), \
+            "Should give the same result as without a cache for " + expression
+
+
+def testLeastRecentlyUsedEviction():
+    cache = ExpressionCache(maxSize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1, "Should be 1."
+    cache.put("c", 3)
+    assert "b" not in cache, "Least recently used entry should be evicted."
+    assert cache.get("b") is None, "Should be None."
+    assert cache.get("a") == 1 and cache.get("c") == 3, "Recently used entries should be kept."
+    assert cache.statistics() == {"size": 2, "maxSize": 2, "hits": 3, "misses": 1, "evictions": 1}, \
+        "Counters are wrong."
+    cache.clear()
+    assert len(cache) == 0 and cache.hits == 0, "Cache should be empty."
+
+
+def testInvalidMaxSize():
+    with pytest.raises(ValueError):
+        ExpressionCache(maxSize=0)
+
+
+def testParseInputCache():
+    cache = ExpressionCache()
+    inputParser = InputParser(cache=cache)
+    assert inputParser.parseInput("calculate \"(4-2)*3.5\"") == "4 2 - 3.5 *", "Should be correct."
+    assert inputParser.parseInput("( 4 - 2 ) * 3.5") == "4 2 - 3.5 *", "Should be correct."
+    assert inputParser.parseInput("2+-+-4") is None, "Should be None."
+    assert (cache.hits, cache.misses) == (1, 2), "Whitespace-only differences should hit the cache."
+
+
+def testEvaluatePostfixExpCache():
+    cache = ExpressionCache()
+    calculator = Calculator(cache=cache)
+    assert calculator.evaluatePostfixExp("4 2 - 3.5 *") == 7.0, "Should be 7."
+    assert calculator.evaluatePostfixExp("4 2 - 3.5 *") == 7.0, "Should be 7."
+    assert (cache.hits, cache.misses) == (1, 1), "Second evaluation should hit the cache."
+
+
+def main():
+    testNormalize()
+    testLeastRecentlyUsedEviction()
+    testInvalidMaxSize()
+    testParseInputCache()
+    testEvaluatePostfixExpCache()
+
+
+if __name__ == "__main__":
+    main()
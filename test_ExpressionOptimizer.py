@@ -0,0 +1,50 @@
+import pytest
+
+from Calculator import Calculator
+from CalculatorErrors import DivisionByZeroError
+from ExpressionOptimizer import ExpressionOptimizer
+from InputParser import InputParser
+
+
+def postfixOf(compiledExpression):
+    return " ".join([str(token[1]) for token in compiledExpression.postfix])
+
+
+def testConstantFolding():
+    inputParser = InputParser(optimizer=ExpressionOptimizer(Calculator.operatorFunctions))
+    compiledExpression = inputParser.compile("(2*3.5+1) * x")
+    assert postfixOf(compiledExpression) == "8.0 x *", "Constant group should be folded."
+    assert compiledExpression.evaluate({"x": 2}) == 16.0, "Should be 16.0."
+    assert postfixOf(inputParser.compile("((1 + 2) * (3 - 4)) / 2")) == "-1.5", "Should fold to one number."
+
+
+def testIdentities():
+    optimizer = ExpressionOptimizer(Calculator.operatorFunctions)
+    inputParser = InputParser(optimizer=optimizer)
+    assert postfixOf(inputParser.compile("x * 1 + 0 - 0")) == "x", "Identities should be removed."
+    compiledExpression = inputParser.compile("1 * (0 + x) / 1")
+    assert postfixOf(compiledExpression) == "x 1 /", "Identities should be removed, but not / 1."
+    assert type(compiledExpression.evaluate({"x": 3})) is float, "Should still divide into a float."
+    assert postfixOf(inputParser.compile("x * (3 - 2)")) == "x", "Folded identities should be removed."
+    assert postfixOf(inputParser.compile("x + 0.0")) == "x 0.0 +", "Float identities should be kept."
+    assert postfixOf(inputParser.compile("0 - x")) == "0 x -", "0 - x is not an identity."
+    assert optimizer.statistics() == {"expressions": 5, "operationsBefore": 10, "operationsAfter": 3,
+                                      "eliminated": 7}, "Counters are wrong."
+
+
+def testErrorsAreNotFolded():
+    inputParser = InputParser(optimizer=ExpressionOptimizer(Calculator.operatorFunctions))
+    compiledExpression = inputParser.compile("x + 1 / (2 - 2)")
+    assert postfixOf(compiledExpression) == "x 1 0 / +", "Division by zero should not be folded."
+    with pytest.raises(DivisionByZeroError) as errorInfo:
+        compiledExpression.evaluate({"x": 1})
+    assert errorInfo.value.position == 6, "Should point at the division."
+
+
+def testSameResults():
+    optimizedParser = InputParser(optimizer=ExpressionOptimizer(Calculator.operatorFunctions))
+    inputParser = InputParser()
+    for expression in ["1 + 2 * 3 - 4 / 5", "-.5 * (2 - -3) + 7", "(4-2)*3.5", "10 / 4 * 1 + 0",
+                       "1 - 2 - 3 - 4", "2 * (3 + 4) * (5 - 6 / 3)"]:
+        assert optimizedParser.compile(expression).evaluate() == inputParser.compile(expression).evaluate(), \
+            "Should give the same result for " + expression
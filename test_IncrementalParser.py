@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from CalculatorErrors import ExpressionSyntaxError, UnboundVariableError
+from EvaluationResult import EvaluationResult
+from IncrementalParser import IncrementalParser
+from InputParser import InputParser
+
+
+def fullResult(inputParser, text):
+    try:
+        compiledExpression = inputParser.compile(text)
+    except Exception as error:
+        return EvaluationResult.fromError(error), None
+    return compiledExpression.evaluateToResult(), compiledExpression.postfix
+
+
+def testEdit():
+    incrementalParser = IncrementalParser()
+    state = incrementalParser.parse("(1 + 2) * 3.5")
+    assert state.evaluate() == 10.5, "Should be 10.5."
+    newState = incrementalParser.edit(state, 5, 1, "4")
+    assert (newState.text, newState.evaluate()) == ("(1 + 4) * 3.5", 17.5), "Should be 17.5."
+    assert state.evaluate() == 10.5, "The old state should not change."
+    assert newState.postfix() == InputParser().compile("(1 + 4) * 3.5").postfix, "Should be the same postfix."
+    assert incrementalParser.update(newState, "(1 + 4) * 3.5 / (2 - 2)").result == \
+        EvaluationResult(None, "DIVISION_BY_ZERO", 14, "Division by zero."), "Should be a division by zero."
+    with pytest.raises(ValueError):
+        incrementalParser.edit(state, 10, 5, "")
+
+
+def testEditErrorsAndRecovery():
+    incrementalParser = IncrementalParser()
+    state = incrementalParser.parse("1 + 2 * 3")
+    state = incrementalParser.edit(state, 9, 0, " +")
+    with pytest.raises(ExpressionSyntaxError) as errorInfo:
+        state.evaluate()
+    assert errorInfo.value.position == 11, "Should point at the end."
+    state = incrementalParser.edit(state, 11, 0, " 4")
+    assert state.evaluate() == 11, "Should be 11."
+    state = incrementalParser.update(state, "(1 + 2 * 3 + 4")
+    assert state.result.errorCode == "SYNTAX_ERROR", "Parentheses are not balanced."
+    state = incrementalParser.update(state, "(1 + 2) * 3 + 4")
+    assert state.evaluate() == 13, "Should be 13."
+    state = incrementalParser.update(state, "(1 + 2) * x + 4")
+    with pytest.raises(UnboundVariableError):
+        state.evaluate()
+    assert state.evaluate({"x": 2}) == 10, "Should be 10."
+    assert incrementalParser.update(state, "").result.errorCode == "EMPTY_EXPRESSION", "Should be empty."
+
+
+def testDeepNesting():
+    incrementalParser = IncrementalParser()
+    # Far deeper than the recursion limit, so every step has to be iterative.
+    depth = 20000
+    state = incrementalParser.parse("(" * depth + "1" + " + 1)" * depth)
+    assert state.evaluate() == depth + 1, "Should be correct."
+    state = incrementalParser.edit(state, depth, 1, "5")
+    assert state.evaluate() == depth + 5, "Should be correct."
+    assert len(state.postfix()) == 2 * depth + 1, "Should have every operand and operator."
+
+
+def testSameResultsAsCompile():
+    inputParser = InputParser()
+    incrementalParser = IncrementalParser(inputParser)
+    randomGenerator = random.Random(0)
+    alphabet = "0123456789" * 3 + "+-*/" * 3 + "()" * 2 + " .x"
+    for trial in range(300):
+        terms = [randomGenerator.choice(["", "-"]) + str(randomGenerator.randint(0, 20)) for i in range(5)]
+        text = "(" + terms[0] + "+" + terms[1] + ")*" + terms[2] + "/x-" + terms[3] + "*(" + terms[4] + ")"
+        state = incrementalParser.parse(text)
+        for step in range(8):
+            offset = randomGenerator.randint(0, len(state.text))
+            deletedLength = randomGenerator.randint(0, min(3, len(state.text) - offset))
+            insertedText = "".join(randomGenerator.choice(alphabet) for i in range(randomGenerator.randint(0, 2)))
+            state = incrementalParser.edit(state, offset, deletedLength, insertedText)
+            result, postfix = fullResult(inputParser, state.text)
+            assert state.result == result, "Should be the same as compiling " + repr(state.text)
+            if postfix is not None:
+                assert state.postfix() == postfix, "Should be the same postfix as compiling " + repr(state.text)
@@ -0,0 +1,66 @@
+from BatchEvaluator import BatchEvaluator
+from Calculator import Calculator
+from InputParser import InputParser
+from Instrumentation import Instrumentation
+
+
+def testRecord():
+    instrumentation = Instrumentation(buckets=[0.001, 0.01])
+    instrumentation.record("tokenize", 0.0005)
+    instrumentation.record("tokenize", 0.005)
+    instrumentation.record("tokenize", 0.5)
+    instrumentation.recordError("tokenize", "SYNTAX_ERROR")
+    assert instrumentation.toDict() == {
+        "stages": {"tokenize": {"count": 3, "sum": 0.5055, "buckets": {"0.001": 1, "0.01": 2, "+Inf": 3}}},
+        "errors": {"tokenize": {"SYNTAX_ERROR": 1}}}, "Histogram buckets should be cumulative."
+    instrumentation.reset()
+    assert instrumentation.toDict() == {"stages": {}, "errors": {}}, "Should be empty."
+
+
+def testParseAndEvaluateStages():
+    instrumentation = Instrumentation()
+    inputParser = InputParser(instrumentation=instrumentation)
+    calculator = Calculator(instrumentation=instrumentation)
+    calculator.evaluatePostfixExp(inputParser.parseInput("(4-2)*3.5"))
+    assert inputParser.parseInput("2+-+-4") is None, "Should be None."
+    assert calculator.evaluatePostfixExp("1 0 /") is None, "Should be None."
+    metrics = instrumentation.toDict()
+    assert {stage: statistics["count"] for stage, statistics in metrics["stages"].items()} == \
+        {"tokenize": 2, "toPostfix": 1, "evaluate": 2}, "Every stage should be counted."
+    assert metrics["errors"] == {"tokenize": {"SYNTAX_ERROR": 1}, "evaluate": {"DIVISION_BY_ZERO": 1}}, \
+        "Errors should be counted by stage and code."
+
+
+def testBatchEvaluatorStages():
+    instrumentation = Instrumentation()
+    batchEvaluator = BatchEvaluator(InputParser(instrumentation=instrumentation))
+    list(batchEvaluator.evaluate(["1 + 2", "x * 2"]))
+    assert instrumentation.toDict()["errors"] == {"evaluate": {"UNBOUND_VARIABLE": 1}}, "Should count the error."
+    assert instrumentation.toDict()["stages"]["evaluate"]["count"] == 2, "Should count both evaluations."
+
+
+def testToPrometheus():
+    instrumentation = Instrumentation(buckets=[0.001])
+    instrumentation.record("evaluate", 0.0001)
+    instrumentation.recordError("evaluate", "DIVISION_BY_ZERO")
+    assert instrumentation.toPrometheus().splitlines() == [
+        "# HELP calculator_stage_duration_seconds Time spent in each stage of the calculator.",
+        "# TYPE calculator_stage_duration_seconds histogram",
+        'calculator_stage_duration_seconds_bucket{stage="evaluate",le="0.001"} 1',
+        'calculator_stage_duration_seconds_bucket{stage="evaluate",le="+Inf"} 1',
+        'calculator_stage_duration_seconds_sum{stage="evaluate"} 0.0001',
+        'calculator_stage_duration_seconds_count{stage="evaluate"} 1',
+        "# HELP calculator_stage_errors_total Errors raised in each stage of the calculator.",
+        "# TYPE calculator_stage_errors_total counter",
+        'calculator_stage_errors_total{stage="evaluate",code="DIVISION_BY_ZERO"} 1'], "Wrong exposition format."
+
+
+def main():
+    testRecord()
+    testParseAndEvaluateStages()
+    testBatchEvaluatorStages()
+    testToPrometheus()
+
+
+if __name__ == "__main__":
+    main()
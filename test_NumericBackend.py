@@ -0,0 +1,84 @@
+import decimal
+import fractions
+import io
+import json
+
+import pytest
+
+from BatchEvaluator import BatchEvaluator
+from Calculator import Calculator
+from CalculatorErrors import ArithmeticEvaluationError, DivisionByZeroError
+from ExpressionOptimizer import ExpressionOptimizer
+from InputParser import InputParser
+from NumericBackend import DecimalBackend, FractionBackend, NumericBackend, getBackend
+from PostfixBytecode import PostfixBytecode
+
+
+def testDecimalBackend():
+    inputParser = InputParser(backend=DecimalBackend())
+    assert inputParser.compile("0.1 + 0.2").evaluate() == decimal.Decimal("0.3"), "Should be exact."
+    assert inputParser.compile("(price - .05) * qty").evaluate({"price": decimal.Decimal("19.99"), "qty": 3}) \
+        == decimal.Decimal("59.82"), "Should be exact."
+    assert inputParser.compile("1 / 3").evaluate() == decimal.Decimal(1) / decimal.Decimal(3), \
+        "Should have 28 digits."
+    assert InputParser().compile("2 / 3", backend=DecimalBackend(decimal.Context(prec=4))).evaluate() \
+        == decimal.Decimal("0.6667"), "Should use the given context."
+    for expression in ["1 / 0", "0 / 0", "1.5 / (2 - 2)", "0 ^ -1", "0.0 ^ -0.5"]:
+        with pytest.raises(DivisionByZeroError):
+            inputParser.compile(expression).evaluate()
+
+
+def testFractionBackend():
+    inputParser = InputParser(backend=FractionBackend())
+    assert inputParser.compile("1 / 3 * 3").evaluate() == 1, "Should be exact."
+    assert inputParser.compile("0.1 + 0.2").evaluate() == fractions.Fraction(3, 10), "Should be exact."
+
+
+def testBackendsAgree():
+    backends = [NumericBackend(), DecimalBackend(), FractionBackend()]
+    for expression in ["-7 % 3", "7 % -3", "-6 % 3", "7.5 % -2", "-7 // 2", "7 // -2", "-7.5 // 2", "7.5 // 2",
+                       "0 ^ 0", "0.0 ^ 0", "2 ^ -2"]:
+        values = [InputParser().compile(expression, backend=backend).evaluate() for backend in backends]
+        assert values[0] == values[1] == values[2], expression + " should be the same with every backend."
+
+
+def testErrorMessages():
+    for backend in [NumericBackend(), DecimalBackend()]:
+        for expression, message in [("sqrt(0 - 1)", "Math domain error."), ("(0 - 8) ^ 0.5", "Math domain error."),
+                                    ("10.0 ^ 999999 * 10", "Numerical result out of range.")]:
+            compiledExpression = InputParser().compile(expression, backend=backend)
+            for evaluate in [compiledExpression.evaluate,
+                             PostfixBytecode.fromCompiledExpression(compiledExpression).evaluate]:
+                with pytest.raises(ArithmeticEvaluationError) as errorInfo:
+                    evaluate()
+                assert str(errorInfo.value) == message, "Should have a readable message with " + repr(backend)
+
+
+def testIntegerFastPath():
+    for backend in [NumericBackend(), DecimalBackend(), FractionBackend()]:
+        compiledExpression = InputParser().compile("-12 * (3 + 4)", backend=backend)
+        assert [token[1] for token in compiledExpression.postfix if token[0] == "number"] == [-12, 3, 4], \
+            "Integral numbers should be ints."
+        assert compiledExpression.evaluate() == -84, "Should be -84."
+    assert type(InputParser().compile("10 / 4").evaluate()) is float, "Should still divide into a float."
+
+
+def testOptimizerUsesBackend():
+    inputParser = InputParser(optimizer=ExpressionOptimizer(Calculator.operatorFunctions), backend=DecimalBackend())
+    compiledExpression = inputParser.compile("(0.1 + 0.2) * x")
+    assert compiledExpression.postfix[0][1] == decimal.Decimal("0.3"), "Should fold with decimals."
+
+
+def testCalculatorBackend():
+    calculator = Calculator(backend=DecimalBackend())
+    assert calculator.evaluatePostfixExp("0.1 0.2 +") == decimal.Decimal("0.3"), "Should be exact."
+    assert calculator.evaluatePostfixExp("1 0 /") is None, "Should be None."
+    assert Calculator().evaluatePostfixExp("0.1 0.2 +") == 0.1 + 0.2, "Floats should be the default."
+
+
+def testBatchJsonLines():
+    output = io.StringIO()
+    BatchEvaluator(InputParser(backend=getBackend("decimal"))).run(["0.1 + 0.2\n"], output, jsonLines=True)
+    assert json.loads(output.getvalue())["value"] == "0.3", "Decimals should be written as strings."
+    with pytest.raises(ValueError):
+        getBackend("complex")
@@ -0,0 +1,95 @@
+import math
+from decimal import Decimal
+
+import numpy
+import pytest
+
+from Calculator import Calculator
+from CalculatorErrors import ArithmeticEvaluationError, CalculatorError, DivisionByZeroError, ExpressionSyntaxError
+from ExpressionOptimizer import ExpressionOptimizer
+from IncrementalParser import IncrementalParser
+from InputParser import NUMBER, InputParser
+from NumericBackend import getBackend
+from OperatorRegistry import OperatorRegistry, defaultRegistry
+from PostfixBytecode import PostfixBytecode
+
+
+def testPrecedenceAndAssociativity():
+    inputParser = InputParser()
+    assert inputParser.compile("2 ^ 3 ^ 2").evaluate() == 512, "^ should be right associative."
+    assert inputParser.compile("-x ^ 2").evaluate({"x": 3}) == -9, "^ should be applied before the minus."
+    assert inputParser.compile("-2 ^ 2").evaluate() == -4, "^ should be applied before the minus, like in Python."
+    assert inputParser.compile("2 * 3 ^ 2").evaluate() == 18, "^ should be applied before *."
+    assert inputParser.compile("7 // 2 * 2 + 7 % 2").evaluate() == 7, "Should be 7."
+    assert inputParser.compile("--(1 - 3)").evaluate() == -2, "Should be -2."
+
+
+def testFunctions():
+    inputParser = InputParser()
+    assert inputParser.compile("max(1, 5, 3)").evaluate() == 5, "Should be 5."
+    assert inputParser.compile("min(x, 2) + max(x)").evaluate({"x": 7}) == 9, "Should be 9."
+    assert inputParser.compile("sqrt(abs(-16)) * 2").evaluate() == 8.0, "Should be 8."
+    for invalidExpression in ["sqrt(1, 2)", "max()", "abs", "1, 2", "sqrt 4", "(1, 2)"]:
+        with pytest.raises(ExpressionSyntaxError):
+            inputParser.compile(invalidExpression)
+    with pytest.raises(ArithmeticEvaluationError):
+        inputParser.compile("sqrt(-1)").evaluate()
+    with pytest.raises(DivisionByZeroError):
+        inputParser.compile("1 % 0").evaluate()
+
+
+def testCustomRegistry():
+    registry = OperatorRegistry()
+    registry.registerOperator("+", lambda a, b: a + b, 2)
+    registry.registerOperator("**", lambda a, b: a ** b, 5, associativity="right")
+    registry.registerFunction("hypot", math.hypot, arity=2)
+    inputParser = InputParser(registry=registry)
+    assert inputParser.compile("hypot(3, 4) + 2 ** 2").evaluate() == 9.0, "Should be 9."
+    with pytest.raises(CalculatorError):
+        inputParser.compile("2 * 3")
+    with pytest.raises(ValueError):
+        registry.registerFunction("2x", abs)
+    assert "hypot" not in defaultRegistry.functions, "The default registry should not change."
+
+
+def testBackends():
+    decimalParser = InputParser(backend=getBackend("decimal"))
+    assert decimalParser.compile("7.5 // 2 + 7.5 % 2 + -x").evaluate({"x": Decimal(1)}) == Decimal("3.5"), \
+        "Should be exact."
+    assert decimalParser.compile("sqrt(2.25) ^ 2").evaluate() == Decimal("2.25"), "Should be exact."
+    calculator = Calculator(backend=getBackend("decimal"))
+    assert calculator.evaluatePostfixExp(decimalParser.parseInput("0.5 ^ 2 + max(0.1, 0.2)")) == Decimal("0.45"), \
+        "Should be exact."
+
+
+def testEvaluators():
+    inputParser = InputParser()
+    calculator = Calculator()
+    assert calculator.evaluatePostfixExp(inputParser.parseInput("-(2) ^ 2 + 7 // 2")) == -1, "Should be -1."
+    assert calculator.evaluatePostfixExp(inputParser.parseInput("sqrt(-1)")) is None, "Should fail."
+    compiledExpression = inputParser.compile("max(x, 0) // y + -sqrt(x)")
+    values, errorMask = calculator.evaluateBatch(compiledExpression, {"x": numpy.array([4.0, 9.0]),
+                                                                      "y": numpy.array([3.0, 0.0])})
+    assert values[0] == -1.0 and errorMask.tolist() == [False, True], "Should flag the integer division by zero."
+    bytecode = PostfixBytecode.fromBuffer(PostfixBytecode.fromCompiledExpression(compiledExpression).toBytes())
+    assert bytecode.toPostfix() == compiledExpression.postfix, "Should round trip."
+    assert bytecode.evaluate({"x": 16, "y": 5}) == -1.0, "Should be -1."
+
+
+def testOptimizerFoldsFunctions():
+    optimizer = ExpressionOptimizer(Calculator.operatorFunctions)
+    postfix = InputParser(optimizer=optimizer).compile("sqrt(16) * x + 2 ^ 3 + max(1, 2, -3)").postfix
+    assert [token[1] for token in postfix if token[0] == NUMBER] == [4.0, 8, 2], "Should fold the constants."
+    assert InputParser(optimizer=optimizer).compile("sqrt(-1) + x").postfix[1][1] == "sqrt", "Should not fold errors."
+
+
+def testIncrementalParserFallsBack():
+    incrementalParser = IncrementalParser()
+    state = incrementalParser.parse("(1 + 2) * 3")
+    state = incrementalParser.update(state, "(1 + 2) ^ 3")
+    assert state.evaluate() == 27, "Should be 27."
+    assert state.postfix() == InputParser().compile("(1 + 2) ^ 3").postfix, "Should be the same postfix."
+    state = incrementalParser.update(state, "(1 + 2) ^ 3 + max(")
+    assert state.result.errorCode == "SYNTAX_ERROR", "Should be a syntax error."
+    state = incrementalParser.update(state, "(1 + 2) * 4")
+    assert state.evaluate() == 12, "Should be 12."
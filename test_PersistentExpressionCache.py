@@ -0,0 +1,86 @@
+import decimal
+import operator
+import struct
+
+import pytest
+
+from Calculator import Calculator
+from CalculatorErrors import DivisionByZeroError, ExpressionSyntaxError, InvalidInputError
+from InputParser import InputParser
+from NumericBackend import DecimalBackend
+from OperatorRegistry import OperatorRegistry
+from PersistentExpressionCache import PersistentExpressionCache
+
+
+def testBuildAndGet(tmp_path):
+    path = str(tmp_path / "formulas.cache")
+    expressions = ["1 + 2", "(price - cost) * qty", "2.5 / (x - 1)", "1 +", "1 + 2", "10000000000000000.0 * 3"]
+    assert PersistentExpressionCache.build(path, expressions) == 4, "Should leave out errors and duplicates."
+    inputParser = InputParser()
+    with PersistentExpressionCache(path) as persistentCache:
+        assert len(persistentCache) == 4, "Should have every valid expression."
+        assert persistentCache.get("(price - cost) * qty").evaluate({"price": 5, "cost": 3, "qty": 2}) == 4, \
+            "Should find the expression."
+        assert persistentCache.get("1 +") is None and persistentCache.get("1+2") is None, \
+            "Should only find the cached expressions."
+        assert persistentCache.statistics() == {"size": 4, "hits": 1, "misses": 2}, "Should count the lookups."
+
+        cachedParser = InputParser(persistentCache=persistentCache)
+        for expression in expressions + ["3 * 3"]:
+            for method in ["parseInput", "compile"]:
+                try:
+                    expected = getattr(inputParser, method)(expression)
+                    expected = expected if method == "parseInput" else expected.postfix
+                except ExpressionSyntaxError:
+                    expected = ExpressionSyntaxError
+                try:
+                    result = getattr(cachedParser, method)(expression)
+                    result = result if method == "parseInput" else result.postfix
+                except ExpressionSyntaxError:
+                    result = ExpressionSyntaxError
+                if method == "parseInput" and result is not None:
+                    assert Calculator().evaluatePostfixExp(result) == Calculator().evaluatePostfixExp(expected), \
+                        "Should give the same result as parsing " + expression
+                else:
+                    assert result == expected, "Should give the same program as parsing " + expression
+
+        with pytest.raises(DivisionByZeroError) as error:
+            cachedParser.compile("2.5 / (x - 1)").evaluate({"x": 1})
+        assert error.value.position == 4, "Should keep the positions."
+        with pytest.raises(InvalidInputError):
+            cachedParser.compile("(price - cost) * qty", allowVariables=False)
+
+
+def testVersions(tmp_path):
+    path = str(tmp_path / "formulas.cache")
+    PersistentExpressionCache.build(path, ["0.1 + 0.2"], DecimalBackend())
+    with PersistentExpressionCache(path) as persistentCache:
+        assert persistentCache.backendName == "decimal", "Should keep the backend."
+        assert InputParser(backend=DecimalBackend(), persistentCache=persistentCache).compile("0.1 + 0.2") \
+            .evaluate() == decimal.Decimal("0.3"), "Should be exact."
+        assert persistentCache.hits == 1, "Should use the cache for the same backend."
+        assert InputParser(persistentCache=persistentCache).compile("0.1 + 0.2").evaluate() == 0.1 + 0.2, \
+            "Should not use the cache for another backend."
+        assert persistentCache.hits == 1, "Should not look up other backends."
+
+    with open(path, "r+b") as file:
+        file.seek(8)
+        file.write(struct.pack("<I", 0))
+    with pytest.raises(ValueError):
+        PersistentExpressionCache(path)
+    (tmp_path / "empty.cache").write_bytes(b"")
+    with pytest.raises(ValueError):
+        PersistentExpressionCache(str(tmp_path / "empty.cache"))
+
+
+def testRegistry(tmp_path):
+    path = str(tmp_path / "formulas.cache")
+    registry = OperatorRegistry()
+    registry.registerOperator("+", operator.add, 2)
+    registry.registerOperator("#", operator.sub, 2)
+    assert PersistentExpressionCache.build(path, ["5 # 3 + 1", "5 * 3"], registry=registry) == 1, \
+        "Should compile with the registry."
+    with PersistentExpressionCache(path) as persistentCache:
+        inputParser = InputParser(persistentCache=persistentCache, registry=registry)
+        assert inputParser.compile("5 # 3 + 1").evaluate() == 3, "Should find the expression."
+        assert persistentCache.hits == 1, "Should use the cache."
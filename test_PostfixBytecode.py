@@ -0,0 +1,91 @@
+import decimal
+import fractions
+import io
+
+import pytest
+
+from CalculatorErrors import ArithmeticEvaluationError, DivisionByZeroError, InvalidInputError, UnboundVariableError
+from CompiledExpression import CompiledExpression
+from ExpressionOptimizer import ExpressionOptimizer
+from InputParser import NUMBER, InputParser
+from NumericBackend import DecimalBackend, FractionBackend
+from OperatorRegistry import OperatorRegistry, defaultRegistry
+from PostfixBytecode import PostfixBytecode
+
+
+def testRoundTrip():
+    inputParser = InputParser()
+    bindings = {"price": 5, "cost": 3, "qty": 2, "x": 4}
+    for expression in ["1 + 2", "(price - cost) * qty", "2.5 / x - -7", "123456789012345678901234567890 * x",
+                       "x * x * x / (qty + .5)"]:
+        compiledExpression = inputParser.compile(expression)
+        bytecode = PostfixBytecode.fromCompiledExpression(compiledExpression)
+        data = bytecode.toBytes()
+        assert len(data) == bytecode.nbytes and len(data) % 8 == 0, "Should be padded to 8 bytes."
+        for result in [bytecode, PostfixBytecode.fromBuffer(data)]:
+            assert result.evaluate(bindings) == compiledExpression.evaluate(bindings), \
+                "Should give the same result as " + expression
+            assert result.toCompiledExpression().postfix == compiledExpression.postfix, "Should be the same program."
+
+
+def testBackends():
+    for backend, expected in [(DecimalBackend(), decimal.Decimal("0.3")), (FractionBackend(), fractions.Fraction(3, 10))]:
+        bytecode = PostfixBytecode.fromCompiledExpression(InputParser(backend=backend).compile("0.1 + 0.2 * y"))
+        loaded = PostfixBytecode.fromBuffer(bytecode.toBytes())
+        assert loaded.backendName == backend.name, "Should keep the backend."
+        assert loaded.evaluate({"y": 1}) == expected, "Should be exact."
+
+
+def testBackendAndRegistry():
+    backend = DecimalBackend(decimal.Context(prec=50))
+    compiledExpression = InputParser(backend=backend).compile("1 / 3.0")
+    bytecode = PostfixBytecode.fromCompiledExpression(compiledExpression)
+    loaded = PostfixBytecode.fromBuffer(bytecode.toBytes())
+    for result in [bytecode, loaded, loaded.toCompiledExpression()]:
+        assert result.evaluate() == compiledExpression.evaluate(), "Should keep the precision of 50 digits."
+    assert loaded.backend is loaded.backend and bytecode.backend is backend, "Should create the backend once."
+    registry = OperatorRegistry()
+    registry.registerOperator("+", lambda a, b: a + b, 2)
+    registry.registerFunction("double", lambda value: 2 * value)
+    compiledExpression = InputParser(registry=registry).compile("double(x) + 1")
+    bytecode = PostfixBytecode.fromCompiledExpression(compiledExpression)
+    assert bytecode.evaluate({"x": 4}) == 9, "Should use the registry of the expression."
+    loaded = PostfixBytecode.fromBuffer(bytecode.toBytes(), registry=registry)
+    assert loaded.toCompiledExpression().evaluate({"x": 4}) == 9, "Should use the given registry."
+
+
+def testErrors():
+    inputParser = InputParser()
+    bytecode = PostfixBytecode.fromBuffer(PostfixBytecode.fromCompiledExpression(inputParser.compile("1+1/(2-2)"))
+                                          .toBytes())
+    with pytest.raises(DivisionByZeroError) as error:
+        bytecode.evaluate()
+    assert error.value.position == 3, "Should point at the division."
+    with pytest.raises(UnboundVariableError) as error:
+        PostfixBytecode.fromCompiledExpression(inputParser.compile("2 * rate")).evaluate({})
+    assert error.value.position == 4, "Should point at the variable."
+    with pytest.raises(ValueError):
+        PostfixBytecode.fromBuffer(b"\0" * 32)
+    optimizingParser = InputParser(optimizer=ExpressionOptimizer(defaultRegistry.operatorFunctions))
+    with pytest.raises(ArithmeticEvaluationError):
+        PostfixBytecode.fromCompiledExpression(optimizingParser.compile("10 ^ 5000 * x"))
+    with pytest.raises(InvalidInputError) as error:
+        PostfixBytecode.fromCompiledExpression(CompiledExpression(((NUMBER, 1j, 0),), defaultRegistry.operatorFunctions))
+    assert error.value.position == 0, "Should point at the number."
+
+
+def testManyPrograms():
+    inputParser = InputParser()
+    expressions = ["x%d * %d + %d.5" % (index, index, index) for index in range(100)]
+    output = io.BytesIO()
+    offsets = []
+    for expression in expressions:
+        offsets.append(output.tell())
+        PostfixBytecode.fromCompiledExpression(inputParser.compile(expression)).writeTo(output)
+    view = memoryview(output.getvalue())
+    bindings = {"x%d" % index: index for index in range(100)}
+    for offset, expression in zip(offsets, expressions):
+        bytecode = PostfixBytecode.fromBuffer(view, offset)
+        assert bytecode.integers.obj is view.obj, "Should not copy the arrays."
+        assert bytecode.evaluate(bindings) == inputParser.compile(expression).evaluate(bindings), \
+            "Should read every program."
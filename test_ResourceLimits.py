@@ -0,0 +1,86 @@
+import pickle
+import time
+
+import pytest
+
+from BatchEvaluator import BatchEvaluator
+from Calculator import Calculator
+from CalculatorErrors import ResourceLimitError
+from ExpressionCache import ExpressionCache
+from IncrementalParser import IncrementalParser
+from InputParser import InputParser
+from PersistentExpressionCache import PersistentExpressionCache
+from ResourceLimits import ResourceLimits
+
+
+def raisedError(inputParser, inputExpression):
+    with pytest.raises(ResourceLimitError) as errorInfo:
+        inputParser.compile(inputExpression).evaluate()
+    assert errorInfo.value.code == "RESOURCE_LIMIT_EXCEEDED", "Should have the code of the limit errors."
+    return errorInfo.value.limit, errorInfo.value.position
+
+
+def testTokenLimits():
+    inputParser = InputParser(limits=ResourceLimits(maxLength=20, maxTokens=10, maxDepth=2, maxLiteralDigits=5,
+                                                    maxOperations=3))
+    assert raisedError(inputParser, "1" + " " * 20) == ("maxLength", 20), "Should be too long."
+    assert raisedError(inputParser, "1+1+1+1+1+1") == ("maxTokens", 10), "Should have too many tokens."
+    assert raisedError(inputParser, "(((1)))") == ("maxDepth", 2), "Should be nested too deep."
+    assert raisedError(inputParser, "1 + 123456") == ("maxLiteralDigits", 4), "Should have too many digits."
+    assert raisedError(inputParser, "-(1)-1-1-1") == ("maxOperations", 8), "Should have too many operations."
+    assert inputParser.compile("-1234.5 + ((2)) - 1").evaluate() == -1233.5, "Should be within the limits."
+
+
+def testMagnitude():
+    inputParser = InputParser(limits=ResourceLimits(maxMagnitude=10 ** 6))
+    assert raisedError(inputParser, "1000 * 1001") == ("maxMagnitude", 5), "Should be too big."
+    assert raisedError(inputParser, "2 + 10 ^ 7") == ("maxMagnitude", 7), "Should be too big."
+    assert inputParser.compile("x * x").evaluate({"x": 1000}) == 10 ** 6, "Should be within the limit."
+    started = time.perf_counter()
+    for inputExpression in ["9 ^ 9 ^ 9", "2 ^ 10 ^ 400", "0.5 ^ -(10 ^ 5)"]:
+        assert raisedError(inputParser, inputExpression)[0] == "maxMagnitude", "Should be too big."
+    assert time.perf_counter() - started < 1, "Should not compute the powers."
+    assert inputParser.compile("0 ^ 10 ^ 5 + 0.5 ^ 10 ^ 5").evaluate() == 0, "Should be small enough."
+
+
+def testNoLimits():
+    limits = ResourceLimits(maxLength=None, maxTokens=None, maxDepth=None, maxLiteralDigits=None, maxMagnitude=None,
+                            maxOperations=None)
+    inputExpression = "(" * 200 + "1" * 200 + ")" * 200 + " ^ 2"
+    assert InputParser(limits=limits).compile(inputExpression).evaluate() == int("1" * 200) ** 2, \
+        "Should not limit anything."
+
+
+def testCalculatorAndParsers():
+    limits = ResourceLimits(maxOperations=2)
+    assert InputParser(limits=limits).parseInput("1+2+3+4") is None, "Should reject the expression."
+    assert Calculator(limits=limits).evaluatePostfixExp("9 99 2 ^ ^") is None, "Should be too big."
+    incrementalParser = IncrementalParser(InputParser(limits=limits))
+    result = incrementalParser.update(incrementalParser.parse("1+2+3"), "1+2+3+4").result
+    assert (result.errorCode, result.errorPosition) == ("RESOURCE_LIMIT_EXCEEDED", 5), "Should be an error result."
+    errors = InputParser(limits=ResourceLimits(maxMagnitude=100)).compileBatch(["x * 10", "x + 1"]) \
+        .evaluateToResults({"x": 20})
+    assert [(result.errorCode, result.value) for result in errors] == \
+        [("RESOURCE_LIMIT_EXCEEDED", None), (None, 21)], "Should fail the first formula only."
+
+
+def testCaches(tmp_path):
+    limits = ResourceLimits(maxOperations=2)
+    PersistentExpressionCache.build(str(tmp_path / "formulas.cache"), ["1+2+3+4"])
+    inputParser = InputParser(persistentCache=PersistentExpressionCache(str(tmp_path / "formulas.cache")),
+                              limits=limits)
+    assert raisedError(inputParser, "1+2+3+4") == ("maxOperations", 5), "Should check the cached expressions."
+    assert inputParser.parseInput("1+2+3+4") is None, "Should check the cached expressions."
+    cache = ExpressionCache()
+    assert InputParser(cache=cache).parseInput("1+2+3+4") == "1 2 + 3 + 4 +", "Should be cached without limits."
+    assert InputParser(cache=cache, limits=limits).parseInput("1+2+3+4") is None, \
+        "Should not use what was cached without limits."
+
+
+def testWorkers():
+    limits = pickle.loads(pickle.dumps(ResourceLimits(maxTokens=3)))
+    assert limits.maxTokens == 3, "Should be picklable."
+    batchEvaluator = BatchEvaluator(InputParser(limits=limits), workers=2, chunkSize=2)
+    statistics = batchEvaluator.aggregate(["1+2", "1+2+3", "4", "(5)"])
+    assert (statistics.count, statistics.sum, statistics.errorCounts) == (3, 12, {"RESOURCE_LIMIT_EXCEEDED": 1}), \
+        "The workers should check the limits."
@@ -0,0 +1,76 @@
+import random
+import statistics
+from decimal import Decimal
+from fractions import Fraction
+
+from EvaluationResult import EvaluationResult
+from RunningStatistics import RunningStatistics
+
+
+def testAdd():
+    runningStatistics = RunningStatistics()
+    assert runningStatistics.toDict() == {"count": 0, "sum": 0, "min": None, "max": None, "mean": None,
+                                          "variance": None, "errors": 0, "errorCounts": {}}, "Should be empty."
+    randomGenerator = random.Random(0)
+    values = [randomGenerator.uniform(-1e6, 1e6) + 1e9 for i in range(1000)]
+    for value in values:
+        runningStatistics.add(value)
+    runningStatistics.addResult(EvaluationResult(None, "DIVISION_BY_ZERO", 1, "Division by zero."))
+    runningStatistics.addError("DIVISION_BY_ZERO")
+    assert (runningStatistics.count, runningStatistics.min, runningStatistics.max) == (1000, min(values), max(values))
+    assert abs(runningStatistics.mean - statistics.fmean(values)) < 1e-6, "Should be the mean."
+    assert abs(runningStatistics.variance / statistics.pvariance(values) - 1) < 1e-9, "Should not lose precision."
+    assert abs(runningStatistics.sampleVariance / statistics.variance(values) - 1) < 1e-9, "Should be unbiased."
+    assert runningStatistics.errorCounts == {"DIVISION_BY_ZERO": 2}, "Should count the errors."
+
+
+def testMerge():
+    randomGenerator = random.Random(1)
+    values = [randomGenerator.gauss(5, 3) for i in range(300)]
+    whole = RunningStatistics()
+    parts = [RunningStatistics() for i in range(3)]
+    for index, value in enumerate(values):
+        whole.add(value)
+        if index < 250:
+            parts[index % 2].add(value)
+    parts[1].addError("SYNTAX_ERROR")
+    merged = RunningStatistics().merge(parts[0]).merge(parts[1]).merge(parts[2])
+    for value in values[250:]:
+        merged.add(value)
+    assert (merged.count, merged.min, merged.max) == (whole.count, whole.min, whole.max), "Should be the same."
+    assert abs(merged.mean - whole.mean) < 1e-12 and abs(merged.variance - whole.variance) < 1e-9, \
+        "Should be the same mean and variance."
+    assert merged.errorCounts == {"SYNTAX_ERROR": 1}, "Should add the errors."
+
+
+def testDecimals():
+    runningStatistics = RunningStatistics()
+    for value in ["0.1", "0.2", "0.3"]:
+        runningStatistics.add(Decimal(value))
+    assert (runningStatistics.sum, runningStatistics.mean) == (Decimal("0.6"), Decimal("0.2")), "Should be exact."
+
+
+def testIntegers():
+    values = [3, Decimal("0.5"), 2, Decimal("-1.25")]
+    runningStatistics = RunningStatistics()
+    for value in values:
+        runningStatistics.add(value)
+    assert (runningStatistics.mean, runningStatistics.variance) == (Decimal("1.0625"), statistics.pvariance(values)), \
+        "Should stay exact with integers among the Decimals."
+    assert isinstance(runningStatistics.mean, Decimal), "Should be a Decimal."
+    values = [3, 4, Fraction(1, 2), 1]
+    runningStatistics = RunningStatistics()
+    for value in values:
+        runningStatistics.add(value)
+    assert (runningStatistics.mean, runningStatistics.variance) == (statistics.mean(values),
+                                                                    statistics.pvariance(values)), \
+        "Should stay exact with integers among the Fractions."
+    assert isinstance(runningStatistics.variance, Fraction), "Should be a Fraction."
+    integers = RunningStatistics()
+    for value in [1, 2, 4]:
+        integers.add(value)
+    assert (integers.mean, integers.sampleVariance) == (7 / 3, 7 / 3), "Should divide the integers like floats."
+    merged = RunningStatistics().merge(integers)
+    merged.merge(RunningStatistics().merge(runningStatistics))
+    assert merged.mean == statistics.mean(values + [1, 2, 4]) and isinstance(merged.mean, Fraction), \
+        "Should merge integers and Fractions exactly."
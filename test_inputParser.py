@@ -1,4 +1,10 @@
-from InputParser import InputParser
+import contextlib
+import io
+
+import pytest
+
+from CalculatorErrors import ExpressionSyntaxError
+from InputParser import InputParser, NUMBER, VARIABLE, OPERATOR, LEFT_PARENTHESIS, RIGHT_PARENTHESIS
 
 
 def testCheckForInvalidInput():
@@ -58,6 +64,76 @@ def testInfixToPostfix():
     assert inputParser.infixToPostfix("-5 + -8 - -11 * 2") == "-5 -8 + -11 2 * -", "Should be correct."
     assert inputParser.infixToPostfix("4 * 5 / 2") == "4 5 * 2 /", "Should be correct."
     assert inputParser.infixToPostfix("4 * 5 / 2") != "4 5 * / 2 ", "Should be correct."
+    assert inputParser.infixToPostfix("( price - cost ) * qty") == "price cost - qty *", "Should be correct."
+
+
+def testTokenize():
+    inputParser = InputParser()
+    assert inputParser.tokenize("(4-2)*3.5") == [(LEFT_PARENTHESIS, "(", 0), (NUMBER, "4", 1), (OPERATOR, "-", 2),
+                                                 (NUMBER, "2", 3), (RIGHT_PARENTHESIS, ")", 4), (OPERATOR, "*", 5),
+                                                 (NUMBER, "3.5", 6)], "Did not tokenize correctly."
+    assert inputParser.tokenize("-5+-8--11*2") == [(NUMBER, "-5", 0), (OPERATOR, "+", 2), (NUMBER, "-8", 3),
+                                                   (OPERATOR, "-", 5), (NUMBER, "-11", 6), (OPERATOR, "*", 9),
+                                                   (NUMBER, "2", 10)], "Did not tokenize correctly."
+    assert inputParser.tokenize("- .32   / .5") == [(NUMBER, "-.32", 0), (OPERATOR, "/", 8),
+                                                   (NUMBER, ".5", 10)], "Did not tokenize correctly."
+    assert inputParser.tokenize("(-5)") == [(LEFT_PARENTHESIS, "(", 0), (NUMBER, "-5", 1),
+                                            (RIGHT_PARENTHESIS, ")", 3)], "Did not tokenize correctly."
+    for invalidExpression in ["19 + cinnamon", "2 & 3"]:
+        with pytest.raises(ValueError):
+            inputParser.tokenize(invalidExpression)
+    for wrongExpression in ["2+-+-4", "       ", "+-+-4", "1.5.5", "1.", "2(3)", "()", ")1+2(", "(1+2", "1+2)"]:
+        with pytest.raises(SyntaxError):
+            inputParser.tokenize(wrongExpression)
+
+
+def testTokenizeVariables():
+    inputParser = InputParser()
+    assert inputParser.tokenize("(price - cost)*qty_2", allowVariables=True) == [
+        (LEFT_PARENTHESIS, "(", 0), (VARIABLE, "price", 1), (OPERATOR, "-", 7), (VARIABLE, "cost", 9),
+        (RIGHT_PARENTHESIS, ")", 13), (OPERATOR, "*", 14), (VARIABLE, "qty_2", 15)], "Did not tokenize correctly."
+    with pytest.raises(SyntaxError):
+        inputParser.tokenize("price cost", allowVariables=True)
+    with pytest.raises(SyntaxError):
+        inputParser.tokenize("2price", allowVariables=True)
+
+
+def testTokensToPostfix():
+    inputParser = InputParser()
+    postfixTokens = inputParser.tokensToPostfix(inputParser.tokenize("(4-2)*3.5"))
+    assert [token[1] for token in postfixTokens] == ["4", "2", "-", "3.5", "*"], "Should be correct."
+    postfixTokens = inputParser.tokensToPostfix(inputParser.tokenize("1+2*(3-4)/5"))
+    assert [token[1] for token in postfixTokens] == ["1", "2", "3", "4", "-", "*", "5", "/", "+"], \
+        "Should be correct."
+
+
+def testMalformedParentheses():
+    inputParser = InputParser()
+    assert inputParser.checkForSyntaxError("") == True, "Should be incorrect syntax."
+    assert inputParser.checkForSyntaxError(")1 + 2(") == True, "Should be incorrect syntax."
+    assert inputParser.checkForSyntaxError("(1 + 2))(") == True, "Should be incorrect syntax."
+    for expression, position in [(")1 + 2(", 0), ("(1 + 2))(", 7), ("((1)", 4), ("(1))", 3)]:
+        with pytest.raises(ExpressionSyntaxError) as errorInfo:
+            inputParser.tokenize(expression)
+        assert errorInfo.value.position == position, "Should point at the offending character."
+    with pytest.raises(ExpressionSyntaxError):
+        inputParser.infixToPostfix("1 + 2 )")
+
+
+def testDeepNesting():
+    inputParser = InputParser()
+    depth = 10 ** 6
+    assert inputParser.compile("(" * depth + "7" + ")" * depth).evaluate() == 7, "Should be 7."
+    depth = 10 ** 5
+    assert inputParser.compile("(" * depth + "1" + "+1)" * depth).evaluate() == depth + 1, "Should be correct."
+    assert inputParser.compile("1" + "*(1" * depth + ")" * depth).evaluate() == 1, "Should be correct."
+    assert inputParser.parseInput("(" * depth + "2" + ")" * depth) == "2", "Should be correct."
+    for expression, position in [("(" * depth + "1" + ")" * (depth - 1), 2 * depth),
+                                 ("(" * depth + "1" + ")" * (depth + 1), 2 * depth + 1),
+                                 ("(" * depth + ")" * depth, depth)]:
+        with pytest.raises(ExpressionSyntaxError) as errorInfo:
+            inputParser.compile(expression)
+        assert errorInfo.value.position == position, "Should point at the offending character."
 
 
 def testParseInput():
@@ -69,6 +145,12 @@ def testParseInput():
     assert inputParser.parseInput("calculate \"-.32       /.5\"") == "-.32 .5 /", "Should be correct."
     assert inputParser.parseInput("calculate \"2+-+-4\"") is None, "Should be None."
     assert inputParser.parseInput("calculate \"19 + cinnamon\"") is None, "Should be None."
+    assert inputParser.parseInput("calculate \"(-5)\"") == "-5", "Should be correct."
+    assert inputParser.parseInput("calculate \"2(3)\"") is None, "Should be None."
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        inputParser.parseInput("calculate \"2+-+-4\"")
+    assert output.getvalue() == "", "Errors should not be printed."
 
 
 def main():
@@ -77,6 +159,11 @@ def main():
     testPrettifyInputExpression()
     testIsOperand()
     testInfixToPostfix()
+    testTokenize()
+    testTokenizeVariables()
+    testTokensToPostfix()
+    testMalformedParentheses()
+    testDeepNesting()
     testParseInput()
 
 